@@ -0,0 +1,272 @@
+# analytic.py
+# Inferência Mamdani escalar em forma fechada, direto das definições de
+# Fuzzy/rules.json (sem skfuzzy).
+#
+# O skfuzzy amostra cada conjunto de saída no universo (101 a 351 pontos),
+# corta, agrega com max e tira o centroide da curva amostrada em todo
+# compute(). Aqui as saídas são trimf/trapmf, ou seja, poligonais: cortar
+# no grau de ativação e agregar com max continua dando uma poligonal, cujos
+# vértices são os das funções, os pontos de corte e os cruzamentos entre
+# funções. O centroide sai das integrais exatas de cada trecho linear, sem
+# grade. As entradas são avaliadas pelas fórmulas das funções de
+# pertinência (trimf, trapmf, zmf, smf, pimf, gaussmf, gbellmf).
+#
+# A diferença para o skfuzzy é só o erro de amostragem dele: quinas dos
+# cortes e cruzamentos que caem entre dois pontos do universo.
+import ast
+import math
+
+try:
+    from Fuzzy import rulebase as rulebase_mod
+except Exception:
+    import rulebase as rulebase_mod
+
+# Funções de saída aceitas: poligonais (as demais exigiriam integrar curvas)
+LINEAR_OUTPUTS = ('trimf', 'trapmf')
+
+
+def _trimf(x, a, b, c):
+    if x < a or x > c:
+        return 0.0
+    if x < b:
+        return (x - a) / (b - a)
+    if x > b:
+        return (c - x) / (c - b)
+    return 1.0
+
+
+def _trapmf(x, a, b, c, d):
+    if x < a or x > d:
+        return 0.0
+    if x < b:
+        return (x - a) / (b - a)
+    if x > c:
+        return (d - x) / (d - c)
+    return 1.0
+
+
+def _smf(x, a, b):
+    if x <= a:
+        return 0.0
+    if x >= b:
+        return 1.0
+    if x <= (a + b) / 2.0:
+        return 2.0 * ((x - a) / (b - a)) ** 2
+    return 1.0 - 2.0 * ((x - b) / (b - a)) ** 2
+
+
+def _zmf(x, a, b):
+    return 1.0 - _smf(x, a, b)
+
+
+def _pimf(x, a, b, c, d):
+    return _smf(x, a, b) * _zmf(x, c, d)
+
+
+def _gaussmf(x, mean, sigma):
+    return math.exp(-((x - mean) ** 2) / (2.0 * sigma ** 2))
+
+
+def _gbellmf(x, a, b, c):
+    return 1.0 / (1.0 + abs((x - c) / a) ** (2.0 * b))
+
+
+MEMBERSHIP = {
+    'trimf': _trimf, 'trapmf': _trapmf, 'zmf': _zmf, 'smf': _smf,
+    'pimf': _pimf, 'gaussmf': _gaussmf, 'gbellmf': _gbellmf,
+}
+
+
+def _segments(function, params, low, high):
+    """Trechos (x0, y0, x1, y1) da poligonal de um trimf/trapmf dentro do universo."""
+    if function == 'trimf':
+        a, b, c = params
+        points = [(a, 0.0), (b, 1.0), (c, 0.0)]
+    else:
+        a, b, c, d = params
+        points = [(a, 0.0), (b, 1.0), (c, 1.0), (d, 0.0)]
+    segments = []
+    for (x0, y0), (x1, y1) in zip(points, points[1:]):
+        # trechos verticais (ombros, a == b) não têm área
+        if x1 <= x0 or x1 <= low or x0 >= high:
+            continue
+        if x0 < low:
+            y0 += (y1 - y0) * (low - x0) / (x1 - x0)
+            x0 = low
+        if x1 > high:
+            y1 = y0 + (y1 - y0) * (high - x0) / (x1 - x0)
+            x1 = high
+        segments.append((x0, y0, x1, y1))
+    return segments
+
+
+def _clip(segments, level):
+    """Poligonal min(mf, level): divide os trechos que cruzam o nível do corte."""
+    clipped = []
+    for x0, y0, x1, y1 in segments:
+        if y0 <= level and y1 <= level:
+            clipped.append((x0, y0, x1, y1))
+        elif y0 >= level and y1 >= level:
+            clipped.append((x0, level, x1, level))
+        else:
+            xc = x0 + (level - y0) * (x1 - x0) / (y1 - y0)
+            if y0 < level:
+                clipped += [(x0, y0, xc, level), (xc, level, x1, level)]
+            else:
+                clipped += [(x0, level, xc, level), (xc, level, x1, y1)]
+    return clipped
+
+
+def _line(segments, lo, hi):
+    """(valor em lo, valor em hi) da poligonal em [lo, hi], que não contém nenhum vértice dela."""
+    for x0, y0, x1, y1 in segments:
+        if x0 <= lo and hi <= x1:
+            slope = (y1 - y0) / (x1 - x0)
+            return y0 + slope * (lo - x0), y0 + slope * (hi - x0)
+    return 0.0, 0.0
+
+
+def _envelope(lines, lo, hi, out):
+    """
+    Trechos (x0, y0, x1, y1) do máximo de retas em [lo, hi]. O máximo de
+    retas é convexo: se a maior em lo não é a maior em hi, as duas se
+    cruzam dentro do intervalo e cada lado é resolvido de novo.
+    """
+    # empate numa ponta: vale a reta que continua maior (o cruzamento é na ponta)
+    left = max(lines, key=lambda line: (line[0], line[1]))
+    right = max(lines, key=lambda line: (line[1], line[0]))
+    if left is right:
+        out.append((lo, left[0], hi, left[1]))
+        return
+    # cruzamento de left e right: (left - right) muda de sinal em [lo, hi]
+    d0 = left[0] - right[0]
+    d1 = left[1] - right[1]
+    t = d0 / (d0 - d1)
+    x = lo + t * (hi - lo)
+    # cruzamento numa ponta (arredondamento): uma reta só no intervalo todo
+    if x <= lo:
+        out.append((lo, right[0], hi, right[1]))
+        return
+    if x >= hi:
+        out.append((lo, left[0], hi, left[1]))
+        return
+    at = [(y0 + t * (y1 - y0)) for y0, y1 in lines]
+    _envelope([(y0, y) for (y0, _), y in zip(lines, at)], lo, x, out)
+    _envelope([(y, y1) for (_, y1), y in zip(lines, at)], x, hi, out)
+
+
+def centroid(sets):
+    """
+    Centroide do max de poligonais cortadas: sets é [(trechos, nível do corte)].
+    None se a área é zero (nenhuma regra disparou).
+    """
+    clipped = [_clip(segments, level) for segments, level in sets if level > 0.0]
+    if not clipped:
+        return None
+    xs = sorted({x for segments in clipped for s in segments for x in (s[0], s[2])})
+    pieces = []
+    for lo, hi in zip(xs, xs[1:]):
+        lines = [line for line in (_line(segments, lo, hi) for segments in clipped) if line != (0.0, 0.0)]
+        if lines:
+            _envelope(lines, lo, hi, pieces)
+    area = 0.0
+    moment = 0.0
+    for x0, y0, x1, y1 in pieces:
+        dx = x1 - x0
+        area += dx * (y0 + y1) / 2.0
+        moment += dx * (x0 * (2.0 * y0 + y1) + x1 * (y0 + 2.0 * y1)) / 6.0
+    if area <= 0.0:
+        return None
+    return moment / area
+
+
+def _condition(tree, index):
+    """Função (graus de pertinência) -> grau de ativação de um antecedente (min, max, 1 - x)."""
+    if isinstance(tree, ast.BinOp):
+        left, right = _condition(tree.left, index), _condition(tree.right, index)
+        if isinstance(tree.op, ast.BitAnd):
+            return lambda m: min(left(m), right(m))
+        return lambda m: max(left(m), right(m))
+    if isinstance(tree, ast.UnaryOp):
+        operand = _condition(tree.operand, index)
+        return lambda m: 1.0 - operand(m)
+    i = index[rulebase_mod.rule_term(tree, '')]
+    return lambda m: m[i]
+
+
+class AnalyticSimulation:
+    """
+    Substituto de ctrl.ControlSystemSimulation (input[label] = valor,
+    compute(), output[label]) montado de uma definição de Fuzzy/rules.json.
+    Como no skfuzzy (lenient=True), uma saída sem nenhuma regra disparando
+    não aparece em self.output.
+
+    mfs: {'variável.termo': parâmetros} substitui os da definição, como em
+    rulebase.build_simulation().
+    """
+
+    def __init__(self, spec, mfs=None):
+        mfs = mfs or {}
+        self.ctrl = None  # sem ControlSystem do skfuzzy
+        self.labels = list(spec['inputs'])
+        self.input = {}
+        self.output = {}
+
+        # entradas: (label, início, fim, [(função, parâmetros)]) e o índice de cada termo
+        self._inputs = []
+        index = {}
+        for label, variable in spec['inputs'].items():
+            low, high, _ = variable['universe']
+            terms = []
+            for term, mf in variable['terms'].items():
+                (function, params), = mf.items()
+                index[(label, term)] = len(index)
+                terms.append((MEMBERSHIP[function], tuple(mfs.get(f"{label}.{term}", params))))
+            self._inputs.append((label, float(low), float(high), terms))
+
+        # saídas: trechos de cada termo
+        self._outputs = []
+        outputs = {}
+        for label, variable in spec['outputs'].items():
+            low, high, _ = variable['universe']
+            terms = {}
+            for term, mf in variable['terms'].items():
+                (function, params), = mf.items()
+                if function not in LINEAR_OUTPUTS:
+                    raise NotImplementedError(f"Saída {label}[{term}]: só {LINEAR_OUTPUTS} têm centroide em forma fechada")
+                outputs[(label, term)] = (len(self._outputs), len(terms))
+                terms[term] = _segments(function, mfs.get(f"{label}.{term}", params), float(low), float(high))
+            self._outputs.append((label, list(terms.values())))
+
+        # regras: (ativação, saída, termo)
+        self._rules = []
+        for text in rulebase_mod.rules(spec):
+            tree, consequent = rulebase_mod.parse_rule(text)
+            self._rules.append((_condition(tree, index), *outputs[consequent]))
+
+    def evaluate(self, values):
+        """Saídas para uma sequência de entradas (na ordem de self.labels)."""
+        memberships = []
+        for x, (_, low, high, terms) in zip(values, self._inputs):
+            x = min(max(x, low), high)
+            memberships += [function(x, *params) for function, params in terms]
+
+        levels = [[0.0] * len(terms) for _, terms in self._outputs]
+        for condition, output, term in self._rules:
+            firing = condition(memberships)
+            if firing > levels[output][term]:
+                levels[output][term] = firing
+
+        result = {}
+        for (label, terms), cuts in zip(self._outputs, levels):
+            value = centroid(zip(terms, cuts))
+            if value is not None:
+                result[label] = value
+        return result
+
+    def compute(self):
+        try:
+            values = [float(self.input[label]) for label in self.labels]
+        except KeyError:
+            raise ValueError("All antecedents must have input values!")
+        self.output = self.evaluate(values)
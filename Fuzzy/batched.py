@@ -0,0 +1,157 @@
+# batched.py
+import numpy as np
+from skfuzzy.control.term import Term, TermAggregate
+
+# Sobreamostragem do universo de saída na defuzzificação vetorizada
+OUTPUT_UPSAMPLE = 4
+# Linhas avaliadas por vez (limita a memória das matrizes N x universo)
+CHUNK_SIZE = 8192
+
+
+def _firing(node, memberships, and_func, or_func):
+    """
+    Percorre a árvore do antecedente de uma regra (Term / TermAggregate)
+    e devolve o grau de ativação para todas as linhas de uma vez.
+    """
+    if isinstance(node, Term):
+        return memberships[node]
+    if isinstance(node, TermAggregate):
+        a = _firing(node.term1, memberships, and_func, or_func)
+        if node.kind == 'not':
+            return 1.0 - a
+        b = _firing(node.term2, memberships, and_func, or_func)
+        if node.kind == 'and':
+            return and_func(a, b)
+        return or_func(a, b)
+    raise NotImplementedError(f"Antecedente não suportado: {node!r}")
+
+
+def _centroid_weights(x):
+    """
+    Pesos (área, momento) tais que y @ área e y @ momento são as integrais
+    exatas de y(x) e x*y(x) para y linear por partes sobre x.
+    """
+    dx = np.diff(x)
+    area = np.zeros_like(x)
+    area[:-1] += dx / 2.0
+    area[1:] += dx / 2.0
+    moment = np.zeros_like(x)
+    moment[:-1] += dx * (2 * x[:-1] + x[1:]) / 6.0
+    moment[1:] += dx * (x[:-1] + 2 * x[1:]) / 6.0
+    return area, moment
+
+
+def _centroid(y, weights):
+    """
+    Centroide de cada linha de y (N, M). Linhas sem área retornam NaN
+    (equivalente ao EmptyMembershipError).
+    """
+    area = y @ weights[0]
+    moment = y @ weights[1]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(area > 0, moment / area, np.nan)
+
+
+def _upsample(universe, factor):
+    universe = np.asarray(universe, dtype=float)
+    if factor <= 1 or len(universe) < 2:
+        return universe
+    steps = np.linspace(0.0, 1.0, factor, endpoint=False)
+    x = universe[:-1, None] + np.diff(universe)[:, None] * steps[None, :]
+    return np.append(x.ravel(), universe[-1])
+
+
+class BatchedSystem:
+    """
+    Motor Mamdani vetorizado para as mesmas definições de antecedentes,
+    consequentes e regras usadas em Interpretation/ e Actions/.
+
+    Avalia N quadros de uma vez: fuzzificação (np.interp), agregação das
+    regras (min/max, ou o and_func/or_func da regra), acumulação e
+    defuzzificação por centroide, tudo como operações de array.
+
+    Entradas fora do universo são cortadas nos limites (clip_to_bounds do
+    skfuzzy). Linhas onde nenhuma regra dispara retornam NaN, que é o caso
+    em que o skfuzzy (lenient=True) omite a saída.
+    """
+
+    def __init__(self, system, upsample=OUTPUT_UPSAMPLE, chunk_size=CHUNK_SIZE):
+        # aceita ControlSystem, ControlSystemSimulation ou CompiledSimulation
+        system = getattr(system, 'ctrl', system)
+        self.ctrl = system
+        self.chunk_size = chunk_size
+        self.antecedents = list(system.antecedents)
+        self.consequents = list(system.consequents)
+        self.rules = list(system.rules)
+        self.labels = [a.label for a in self.antecedents]
+        self.outputs = [c.label for c in self.consequents]
+
+        # Universos de saída sobreamostrados com as mfs já interpoladas
+        self._output_sets = []
+        for cons in self.consequents:
+            if cons.defuzzify_method != 'centroid':
+                raise NotImplementedError(f"Defuzzificação '{cons.defuzzify_method}' não suportada")
+            universe = _upsample(cons.universe, upsample)
+            terms = [(term, np.interp(universe, cons.universe, term.mf)) for term in cons.terms.values()]
+            self._output_sets.append((cons.label, universe, terms, _centroid_weights(universe)))
+
+    def _evaluate_chunk(self, columns, n):
+        memberships = {}
+        for ant in self.antecedents:
+            x = np.clip(np.asarray(columns[ant.label], dtype=float), ant.universe.min(), ant.universe.max())
+            for term in ant.terms.values():
+                memberships[term] = np.interp(x, ant.universe, term.mf)
+
+        cuts = {}
+        for rule in self.rules:
+            firing = _firing(rule.antecedent, memberships, rule.and_func, rule.or_func)
+            for weighted in rule.consequent:
+                activation = firing * weighted.weight
+                term = weighted.term
+                if term in cuts:
+                    cuts[term] = term.parent.accumulation_method(activation, cuts[term])
+                else:
+                    cuts[term] = activation
+
+        outputs = {}
+        for label, universe, term_sets, weights in self._output_sets:
+            active = [(cuts[term], mf) for term, mf in term_sets if term in cuts]
+            if not active:
+                outputs[label] = np.full(n, np.nan)
+                continue
+            # a saída só depende do vetor de cortes: defuzzifica cada vetor distinto uma vez
+            levels = np.stack([np.broadcast_to(cut, (n,)) for cut, _ in active], axis=1)
+            unique, inverse = np.unique(levels, axis=0, return_inverse=True)
+            aggregated = np.zeros((unique.shape[0], universe.size))
+            clipped = np.empty_like(aggregated)
+            for j, (_, mf) in enumerate(active):
+                np.minimum(unique[:, j, None], mf[None, :], out=clipped)
+                np.maximum(aggregated, clipped, out=aggregated)
+            outputs[label] = _centroid(aggregated, weights)[inverse.ravel()]
+        return outputs
+
+    def evaluate_columns(self, columns):
+        """
+        columns: dict label -> array (N,). Retorna dict label -> array (N,).
+        """
+        columns = {label: np.atleast_1d(np.asarray(columns[label], dtype=float)) for label in self.labels}
+        n = max(c.shape[0] for c in columns.values())
+        columns = {label: np.broadcast_to(c, (n,)) for label, c in columns.items()}
+        outputs = {label: np.empty(n) for label in self.outputs}
+        for lo in range(0, n, self.chunk_size):
+            hi = min(lo + self.chunk_size, n)
+            chunk = self._evaluate_chunk({label: c[lo:hi] for label, c in columns.items()}, hi - lo)
+            for label, values in chunk.items():
+                outputs[label][lo:hi] = values
+        return outputs
+
+    def evaluate(self, inputs):
+        """
+        inputs: array (N, len(self.labels)), colunas na ordem de self.labels.
+        Retorna array (N, len(self.outputs)).
+        """
+        inputs = np.atleast_2d(np.asarray(inputs, dtype=float))
+        if inputs.shape[1] != len(self.labels):
+            raise ValueError(f"Esperado (N, {len(self.labels)}) com colunas {self.labels}, recebido {inputs.shape}")
+        outputs = self.evaluate_columns({label: inputs[:, i] for i, label in enumerate(self.labels)})
+        return np.stack([outputs[label] for label in self.outputs], axis=1)
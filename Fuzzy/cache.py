@@ -0,0 +1,125 @@
+# cache.py
+# Cache em disco dos controladores compilados (CompiledSimulation).
+#
+# A chave é um hash das definições dos modelos (funções de pertinência e
+# regras de Fuzzy/rules.json), de quem as monta e compila (rulebase.py,
+# compiled.py, batched.py, lidos com ast), da resolução, da versão do skfuzzy
+# e dos vértices trocados via TorcsDriver(mfs=...). Com o cache válido o
+# driver carrega as tabelas direto e não importa o skfuzzy (nem networkx/scipy).
+import ast
+import hashlib
+import json
+import os
+import time
+from importlib import metadata
+
+import numpy as np
+
+from log import logger
+
+try:
+    from Fuzzy.compiled import CompiledSimulation
+    from Fuzzy import rulebase as rulebase_mod
+except Exception:
+    from compiled import CompiledSimulation
+    import rulebase as rulebase_mod
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Diretório do cache (FUZZY_CACHE_DIR sobrescreve)
+CACHE_DIR = os.environ.get('FUZZY_CACHE_DIR', os.path.join(ROOT, '.fuzzy_cache'))
+# Muda quando o formato do arquivo muda
+FORMAT_VERSION = 2
+
+# O resultado da compilação também depende de quem monta os modelos e do próprio compilador
+COMPILER_SOURCES = ('Fuzzy/rulebase.py', 'Fuzzy/compiled.py', 'Fuzzy/batched.py')
+
+
+def _source_tree(path):
+    """ast.dump do arquivo: ignora comentários e formatação."""
+    with open(os.path.join(ROOT, path), encoding='utf-8') as f:
+        return ast.dump(ast.parse(f.read()))
+
+
+def _skfuzzy_version():
+    try:
+        return metadata.version('scikit-fuzzy')
+    except metadata.PackageNotFoundError:
+        return None
+
+
+def cache_key(resolution, mfs=None, models=None):
+    """models: definições (rulebase.load()); sem elas, as do arquivo de regras."""
+    digest = hashlib.sha256()
+    parts = [FORMAT_VERSION, _skfuzzy_version(), np.__version__, repr(resolution)]
+    if mfs:
+        parts.append(json.dumps(mfs, sort_keys=True))
+    parts.append(rulebase_mod.digest(models if models is not None else rulebase_mod.load()))
+    parts += [_source_tree(path) for path in COMPILER_SOURCES]
+    for part in parts:
+        digest.update(str(part).encode())
+        digest.update(b'\x00')
+    return digest.hexdigest()
+
+
+def cache_path(key, directory=None):
+    return os.path.join(directory or CACHE_DIR, f"compiled-{key[:24]}.npz")
+
+
+def save(compiled, resolution, directory=None, mfs=None, models=None):
+    """Grava os modelos compilados ({atributo: CompiledSimulation}); retorna o caminho."""
+    key = cache_key(resolution, mfs, models)
+    path = cache_path(key, directory)
+    arrays = {}
+    meta = {'key': key, 'models': {}}
+    for attr, model in compiled.items():
+        outputs = list(model.tables)
+        meta['models'][attr] = {
+            'labels': model.labels,
+            'outputs': outputs,
+            'max_error': model.max_error,
+            'error': model.error,
+            'mismatches': model.mismatches,
+        }
+        for i, nodes in enumerate(model.nodes):
+            arrays[f'{attr}.node{i}'] = np.asarray(nodes, dtype=float)
+        for j, label in enumerate(outputs):
+            arrays[f'{attr}.table{j}'] = np.asarray(model.tables[label], dtype=float)
+    arrays['meta'] = np.array(json.dumps(meta))
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # escreve num temporário e renomeia: outro processo nunca lê um arquivo pela metade
+    temp = f"{path}.{os.getpid()}.tmp"
+    with open(temp, 'wb') as f:
+        np.savez(f, **arrays)
+    os.replace(temp, path)
+    logger.info(f"Controladores compilados gravados em {path}")
+    return path
+
+
+def load(resolution, directory=None, mfs=None, models=None):
+    """{atributo: CompiledSimulation} do cache, ou None se não houver um válido."""
+    start = time.perf_counter()
+    try:
+        key = cache_key(resolution, mfs, models)
+    except (OSError, SyntaxError, ValueError) as e:
+        logger.warning(f"Cache de controladores indisponível: {e}")
+        return None
+    path = cache_path(key, directory)
+    if not os.path.exists(path):
+        return None
+    try:
+        with np.load(path, allow_pickle=False) as data:
+            meta = json.loads(str(data['meta']))
+            if meta['key'] != key:
+                return None
+            models = {}
+            for attr, info in meta['models'].items():
+                nodes = [data[f'{attr}.node{i}'] for i in range(len(info['labels']))]
+                tables = {label: data[f'{attr}.table{j}'] for j, label in enumerate(info['outputs'])}
+                models[attr] = CompiledSimulation(info['labels'], nodes, tables,
+                                                  info['max_error'], info['mismatches'], error=info['error'])
+    except (OSError, ValueError, KeyError) as e:
+        logger.warning(f"Cache de controladores inválido ({path}): {e}")
+        return None
+    logger.info(f"Controladores compilados carregados de {path} em {time.perf_counter() - start:.3f}s")
+    return models
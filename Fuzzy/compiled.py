@@ -0,0 +1,185 @@
+# compiled.py
+import bisect
+import time
+
+import numpy as np
+
+from log import logger
+
+# Pontos por eixo da tabela (além das quinas das funções de pertinência)
+DEFAULT_RESOLUTION = 21
+# Limite de pontos por tabela; a resolução é reduzida até caber
+DEFAULT_MAX_POINTS = 250_000
+# Pontos aleatórios em que a tabela é comparada com o motor vetorizado (Fuzzy/batched.py,
+# a ~1e-3 do skfuzzy) para medir o erro
+DEFAULT_VALIDATION_SAMPLES = 4096
+# Quantil do erro comparado com MAX_ERROR: a interpolação suaviza os saltos da saída onde
+# uma regra começa a disparar, e ali o erro máximo só cresce com o número de amostras
+ERROR_QUANTILE = 0.99
+# Erro aceito no ERROR_QUANTILE (unidades da saída); acima disso build_models() usa o motor analítico
+MAX_ERROR = 0.1
+
+
+def _grid_nodes(antecedent, resolution):
+    """
+    Nós da tabela num eixo: grade uniforme + quinas das funções de pertinência,
+    para que a interpolação linear não "corte" os vértices dos trimf.
+    """
+    universe = np.asarray(antecedent.universe, dtype=float)
+    if isinstance(resolution, dict):
+        resolution = resolution.get(antecedent.label, DEFAULT_RESOLUTION)
+    if len(universe) <= resolution:
+        return universe
+
+    nodes = [np.linspace(universe[0], universe[-1], resolution)]
+    for term in antecedent.terms.values():
+        kinks = np.nonzero(np.abs(np.diff(term.mf, 2)) > 1e-9)[0] + 1
+        # zmf/smf/pimf são curvas: todos os pontos viram "quina", ignorar
+        if len(kinks) <= 4:
+            nodes.append(universe[kinks])
+    return np.unique(np.concatenate(nodes))
+
+
+class CompiledSimulation:
+    """
+    Substituto direto de ctrl.ControlSystemSimulation: mesma interface
+    (input[label] = valor, compute(), output[label]), mas a inferência é uma
+    interpolação multilinear numa tabela N-dimensional pré-calculada.
+
+    Assim como o skfuzzy (lenient=True), uma saída indefinida (nenhuma regra
+    dispara) simplesmente não aparece em self.output.
+    """
+
+    def __init__(self, labels, nodes, tables, max_error=None, mismatches=None, ctrl=None, error=None):
+        self.ctrl = ctrl  # ControlSystem de origem (para BatchedSystem, revalidação...)
+        self.labels = list(labels)
+        self.nodes = [[float(v) for v in n] for n in nodes]
+        self.shape = tuple(len(n) for n in self.nodes)
+        self.strides = [int(np.prod(self.shape[i + 1:], dtype=np.int64)) for i in range(len(self.shape))]
+        self.tables = {label: np.asarray(t, dtype=float).ravel().tolist() for label, t in tables.items()}
+        self.max_error = max_error or {}
+        self.error = error or {}  # erro no ERROR_QUANTILE
+        self.mismatches = mismatches or {}
+        self.input = {}
+        self.output = {}
+
+    def evaluate(self, values):
+        """Interpola todas as saídas para uma sequência de entradas (na ordem de self.labels)."""
+        base = 0
+        axes = []
+        for x, nodes, stride in zip(values, self.nodes, self.strides):
+            if x <= nodes[0]:
+                i, w = 0, 0.0
+            elif x >= nodes[-1]:
+                i, w = len(nodes) - 1, 0.0
+            else:
+                i = bisect.bisect_right(nodes, x) - 1
+                w = (x - nodes[i]) / (nodes[i + 1] - nodes[i])
+            base += i * stride
+            if w > 0.0:
+                axes.append((stride, w))
+
+        corners = [(base, 1.0)]
+        for stride, w in axes:
+            corners = [c for off, cw in corners for c in ((off, cw * (1.0 - w)), (off + stride, cw * w))]
+
+        output = {}
+        for label, table in self.tables.items():
+            acc = 0.0
+            weight = 0.0
+            for off, cw in corners:
+                v = table[off]
+                if v == v:  # ignora vértices indefinidos (NaN)
+                    acc += v * cw
+                    weight += cw
+            # indefinido só quando todos os vértices com peso são indefinidos
+            if weight > 0.0:
+                output[label] = acc / weight
+        return output
+
+    def compute(self):
+        try:
+            values = [float(self.input[label]) for label in self.labels]
+        except KeyError:
+            raise ValueError("All antecedents must have input values!")
+        self.output = self.evaluate(values)
+
+
+def _validate(batched, compiled, samples, seed):
+    """
+    Compara a tabela com o motor vetorizado (a mesma inferência do skfuzzy)
+    em pontos aleatórios do domínio. Retorna ({saída: erro absoluto máximo},
+    {saída: erro no ERROR_QUANTILE}, {saída: nº de divergências}), onde
+    divergência é um lado definir a saída e o outro não (borda da região
+    onde nenhuma regra dispara).
+    """
+    rng = np.random.default_rng(seed)
+    columns = {a.label: rng.uniform(a.universe.min(), a.universe.max(), samples) for a in batched.antecedents}
+    expected = batched.evaluate_columns(columns)
+    got = [compiled.evaluate(values) for values in zip(*(columns[label] for label in compiled.labels))]
+    max_error, error, mismatches = {}, {}, {}
+    for label, want in expected.items():
+        actual = np.array([g.get(label, np.nan) for g in got])
+        defined, table_defined = ~np.isnan(want), ~np.isnan(actual)
+        mismatches[label] = int(np.count_nonzero(defined != table_defined))
+        diff = np.abs(actual - want)[defined & table_defined]
+        max_error[label] = float(diff.max()) if diff.size else 0.0
+        error[label] = float(np.quantile(diff, ERROR_QUANTILE)) if diff.size else 0.0
+    return max_error, error, mismatches
+
+
+def compile_simulation(simulation, resolution=DEFAULT_RESOLUTION,
+                       validation_samples=DEFAULT_VALIDATION_SAMPLES,
+                       max_points=DEFAULT_MAX_POINTS, seed=0):
+    """
+    Compila um ctrl.ControlSystem (ou a ControlSystemSimulation que o envolve)
+    numa CompiledSimulation.
+    Parâmetros:
+        - resolution: pontos por eixo (int ou dict label -> int)
+        - max_points: tamanho máximo da tabela; se uma resolution inteira
+          estourar o limite ela é reduzida, com aviso (ex.: o modelo de marcha,
+          5 entradas); o erro medido na validação diz se a tabela ainda serve
+        - validation_samples: pontos aleatórios comparados com o motor
+          vetorizado para medir o erro (0 desliga a validação)
+    """
+    # só a compilação precisa do skfuzzy; uma CompiledSimulation carregada do
+    # cache (Fuzzy/cache.py) roda sem ele
+    try:
+        from Fuzzy.batched import BatchedSystem
+    except Exception:
+        from batched import BatchedSystem
+
+    batched = BatchedSystem(simulation)
+    system = batched.ctrl
+    start = time.perf_counter()
+
+    antecedents = batched.antecedents
+    labels = batched.labels
+    nodes = [_grid_nodes(a, resolution) for a in antecedents]
+    shape = tuple(len(n) for n in nodes)
+    total = int(np.prod(shape, dtype=np.int64))
+    requested = resolution
+    while total > max_points and isinstance(resolution, int) and resolution > 2:
+        resolution -= 1
+        nodes = [_grid_nodes(a, resolution) for a in antecedents]
+        shape = tuple(len(n) for n in nodes)
+        total = int(np.prod(shape, dtype=np.int64))
+    if resolution != requested:
+        logger.warning(f"Fuzzy {labels}: resolução reduzida de {requested} para {resolution} pontos por eixo "
+                       f"(limite de {max_points} pontos)")
+
+    grid = np.meshgrid(*nodes, indexing='ij')
+    tables = batched.evaluate_columns({label: g.ravel() for label, g in zip(labels, grid)})
+
+    compiled = CompiledSimulation(labels, nodes, tables, ctrl=system)
+    build_time = time.perf_counter() - start
+    if validation_samples > 0:
+        compiled.max_error, compiled.error, compiled.mismatches = _validate(
+            batched, compiled, validation_samples, seed)
+
+    logger.info(
+        f"Fuzzy compilado {labels} -> {list(tables)}: tabela {shape} ({total} pontos) "
+        f"em {build_time:.2f}s, erro p{ERROR_QUANTILE * 100:g}={compiled.error} máx={compiled.max_error} "
+        f"divergências={compiled.mismatches}"
+    )
+    return compiled
@@ -0,0 +1,77 @@
+# incremental.py
+# Avaliação incremental: só recalcula um sistema fuzzy quando as entradas mudam.
+
+# Variação mínima de cada entrada (label do Antecedent) para recalcular.
+# Entradas sem valor aqui só são reaproveitadas quando exatamente iguais.
+DEFAULT_EPSILONS = {
+    'center_dist': 0.5,    # m
+    'side_diff': 0.5,      # m
+    'speed': 0.5,          # km/h
+    'rpm': 50.0,
+    'turn_severity': 0.005,
+    'severity': 0.005,
+    'intention': 0.005,
+    'dist_to_turn': 0.5,   # m
+    'gear_in': 0.0,
+}
+# Máximo de compute() seguidos reaproveitando a última saída
+MAX_STALENESS = 10
+
+
+class IncrementalSimulation:
+    """
+    Envolve uma ControlSystemSimulation / CompiledSimulation com a mesma
+    interface (input[label] = valor, compute(), output[label]). compute()
+    só chama o modelo quando alguma entrada se afastou mais que seu epsilon
+    dos valores da última avaliação, ou depois de `max_staleness` compute()
+    reaproveitando a saída; senão mantém self.output.
+
+    Guarda o estado de um carro: não compartilhar entre drivers (o modelo
+    envolvido, self.model, pode ser compartilhado).
+    """
+
+    def __init__(self, model, epsilons=None, max_staleness=MAX_STALENESS):
+        self.model = model
+        self.epsilons = dict(DEFAULT_EPSILONS if epsilons is None else epsilons)
+        self.max_staleness = max_staleness
+        self.input = {}
+        self.output = {}
+        self.computes = 0
+        self.skips = 0
+        self._evaluated = None
+        self._stale = 0
+
+    def _changed(self):
+        last = self._evaluated
+        if last is None or last.keys() != self.input.keys():
+            return True
+        epsilons = self.epsilons
+        for label, value in self.input.items():
+            if abs(value - last[label]) > epsilons.get(label, 0.0):
+                return True
+        return False
+
+    def compute(self):
+        if self._stale < self.max_staleness and not self._changed():
+            self._stale += 1
+            self.skips += 1
+            return
+        model = self.model
+        for label, value in self.input.items():
+            model.input[label] = value
+        model.compute()
+        # cópia: o modelo pode ser compartilhado e sobrescrever a própria saída
+        self.output = dict(model.output)
+        self._evaluated = dict(self.input)
+        self._stale = 0
+        self.computes += 1
+
+    def reset(self):
+        """Esquece a última avaliação (o próximo compute() recalcula)."""
+        self._evaluated = None
+        self._stale = 0
+
+    @property
+    def skip_rate(self):
+        total = self.computes + self.skips
+        return self.skips / total if total else 0.0
@@ -0,0 +1,357 @@
+# rulebase.py
+# Bases de regras declarativas dos controladores fuzzy (Fuzzy/rules.json).
+#
+# Cada modelo do driver (turn_classifier, accel_brake_ctrl, gear_ctrl,
+# steering_aggressiveness_ctrl) é descrito no arquivo pelas variáveis de
+# entrada e saída (universo [início, fim, pontos] e termos {nome: {mf:
+# parâmetros}}) e pelas regras, no formato
+#     "rpm[high] & ~gear_in[high] -> gear_adj[up]"
+# com &, |, ~ e parênteses como no skfuzzy (linhas começando com '#' são
+# comentários). build_models() monta (e compila) os modelos a partir do
+# arquivo; RuleWatcher observa o arquivo e recompila numa thread quando ele
+# muda, para o driver trocar os controladores entre dois ticks.
+import ast
+import copy
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+from log import logger
+
+# Arquivo das regras (FUZZY_RULES sobrescreve)
+RULES_PATH = os.environ.get('FUZZY_RULES', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'rules.json'))
+# Funções de pertinência aceitas -> nº de parâmetros
+MEMBERSHIP = {'trimf': 3, 'trapmf': 4, 'zmf': 2, 'smf': 2, 'pimf': 4, 'gaussmf': 2, 'gbellmf': 3}
+# Intervalo (s) entre verificações do arquivo
+POLL_INTERVAL = 0.5
+# Espera (s) depois de ver o arquivo mudar, para não ler uma gravação pela metade
+SETTLE = 0.05
+# Recargas guardadas para o resumo (tempos de compilação e latências até a troca)
+HISTORY = 100
+
+
+def parse_rule(text):
+    """'a[x] & ~b[y] -> c[z]' -> (árvore ast do antecedente, (variável, termo) do consequente)."""
+    if text.count('->') != 1:
+        raise ValueError(f"regra sem '->': {text!r}")
+    condition, consequent = text.split('->')
+    try:
+        tree = ast.parse(condition.strip(), mode='eval').body
+        target = ast.parse(consequent.strip(), mode='eval').body
+    except SyntaxError as e:
+        raise ValueError(f"regra inválida {text!r}: {e.msg}") from None
+    return tree, rule_term(target, text)
+
+
+def rule_term(node, text):
+    # variável[termo] (o termo pode vir com ou sem aspas)
+    if not (isinstance(node, ast.Subscript) and isinstance(node.value, ast.Name)):
+        raise ValueError(f"esperado variável[termo] em {text!r}")
+    key = node.slice
+    if isinstance(key, ast.Name):
+        return node.value.id, key.id
+    if isinstance(key, ast.Constant) and isinstance(key.value, str):
+        return node.value.id, key.value
+    raise ValueError(f"esperado variável[termo] em {text!r}")
+
+
+def _terms(tree, text):
+    """Todos os (variável, termo) citados num antecedente; recusa qualquer outra expressão."""
+    if isinstance(tree, ast.BinOp) and isinstance(tree.op, (ast.BitAnd, ast.BitOr)):
+        return _terms(tree.left, text) + _terms(tree.right, text)
+    if isinstance(tree, ast.UnaryOp) and isinstance(tree.op, ast.Invert):
+        return _terms(tree.operand, text)
+    return [rule_term(tree, text)]
+
+
+def rules(spec):
+    """Regras do modelo, sem os comentários."""
+    return [rule for rule in spec['rules'] if not rule.lstrip().startswith('#')]
+
+
+def validate(models):
+    """Confere a estrutura do arquivo sem importar o skfuzzy; ValueError no primeiro erro."""
+    if not isinstance(models, dict) or not models:
+        raise ValueError("o arquivo de regras deve ser um objeto {modelo: definição}")
+    for name, spec in models.items():
+        try:
+            _validate_model(spec)
+        except (KeyError, TypeError, ValueError) as e:
+            raise ValueError(f"{name}: {e}") from None
+    return models
+
+
+def _validate_model(spec):
+    variables = {}
+    for kind in ('inputs', 'outputs'):
+        for label, variable in spec.get(kind, {}).items():
+            start, stop, points = variable['universe']
+            if not stop > start or int(points) < 2:
+                raise ValueError(f"universo inválido em {label}")
+            terms = variable['terms']
+            for term, mf in terms.items():
+                (function, params), = mf.items()
+                if MEMBERSHIP.get(function) != len(params):
+                    raise ValueError(f"{label}[{term}] deve ser uma de {sorted(MEMBERSHIP)} "
+                                     f"com o nº certo de parâmetros")
+            variables[label] = (kind, set(terms))
+    if not spec.get('outputs'):
+        raise ValueError("nenhuma saída")
+    if not rules(spec):
+        raise ValueError("nenhuma regra")
+    for text in rules(spec):
+        tree, consequent = parse_rule(text)
+        for kind, (label, term) in [('inputs', t) for t in _terms(tree, text)] + [('outputs', consequent)]:
+            if label not in variables or variables[label][0] != kind or term not in variables[label][1]:
+                raise ValueError(f"{label}[{term}] não é um termo de {kind} em {text!r}")
+
+
+def load(path=None):
+    """Definições de todos os modelos ({atributo do driver: definição}), já validadas."""
+    with open(path or RULES_PATH, encoding='utf-8') as f:
+        return validate(json.load(f))
+
+
+def digest(models):
+    """Hash das definições (ignora formatação e ordem das chaves), para a chave do cache."""
+    return hashlib.sha256(json.dumps(models, sort_keys=True).encode()).hexdigest()
+
+
+def breakpoints(models, name):
+    """[(chave 'variável.termo', vértices, início, fim do universo)] dos trimf de um modelo (tuning.py)."""
+    spec = models[name]
+    found = []
+    for kind in ('inputs', 'outputs'):
+        for label, variable in spec[kind].items():
+            start, stop, _ = variable['universe']
+            for term, mf in variable['terms'].items():
+                if 'trimf' in mf:
+                    found.append((f"{label}.{term}", [float(p) for p in mf['trimf']], float(start), float(stop)))
+    return found
+
+
+def build_simulation(spec, mfs=None):
+    """
+    ControlSystemSimulation de uma definição.
+    mfs: {'variável.termo': parâmetros} substitui os da definição (ver tuning.py).
+    """
+    import skfuzzy as fuzz
+    from skfuzzy import control as ctrl
+
+    mfs = mfs or {}
+    variables = {}
+    for kind, cls in (('inputs', ctrl.Antecedent), ('outputs', ctrl.Consequent)):
+        for label, variable in spec[kind].items():
+            start, stop, points = variable['universe']
+            var = variables[label] = cls(np.linspace(start, stop, int(points)), label)
+            for term, mf in variable['terms'].items():
+                (function, params), = mf.items()
+                params = mfs.get(f"{label}.{term}", params)
+                # trimf/trapmf recebem os vértices numa lista, as demais um a um
+                if function in ('trimf', 'trapmf'):
+                    var[term] = getattr(fuzz, function)(var.universe, params)
+                else:
+                    var[term] = getattr(fuzz, function)(var.universe, *params)
+
+    def condition(tree, text):
+        if isinstance(tree, ast.BinOp):
+            left, right = condition(tree.left, text), condition(tree.right, text)
+            return left & right if isinstance(tree.op, ast.BitAnd) else left | right
+        if isinstance(tree, ast.UnaryOp):
+            return ~condition(tree.operand, text)
+        label, term = rule_term(tree, text)
+        return variables[label][term]
+
+    fuzzy_rules = []
+    for text in rules(spec):
+        tree, (label, term) = parse_rule(text)
+        fuzzy_rules.append(ctrl.Rule(condition(tree, text), variables[label][term]))
+    return ctrl.ControlSystemSimulation(ctrl.ControlSystem(fuzzy_rules))
+
+
+def build_models(models, compiled=True, resolution=None, mfs=None, cache=True, analytic=False):
+    """
+    {atributo do driver: modelo} a partir das definições. Com analytic, os
+    modelos de Fuzzy/analytic.py (centroide em forma fechada, sem skfuzzy
+    nem compilação). Senão, do cache de tabelas (Fuzzy/cache.py) quando
+    válido; ou monta as simulações e, com compiled, compila (e grava no cache).
+    """
+    mfs = mfs or {}
+    if analytic:
+        try:
+            from Fuzzy.analytic import AnalyticSimulation
+        except Exception:
+            from analytic import AnalyticSimulation
+        return {name: AnalyticSimulation(spec, mfs.get(name)) for name, spec in models.items()}
+
+    try:
+        from Fuzzy import compiled as compiled_mod
+        from Fuzzy import cache as cache_mod
+    except Exception:
+        import compiled as compiled_mod
+        import cache as cache_mod
+
+    resolution = compiled_mod.DEFAULT_RESOLUTION if resolution is None else resolution
+    if compiled and cache:
+        loaded = cache_mod.load(resolution, mfs=mfs, models=models)
+        if loaded is not None:
+            return _accurate(loaded, models, mfs, compiled_mod.MAX_ERROR, compiled_mod.ERROR_QUANTILE)
+
+    built = {name: build_simulation(spec, mfs.get(name)) for name, spec in models.items()}
+    if compiled:
+        built = {name: compiled_mod.compile_simulation(model, resolution) for name, model in built.items()}
+        if cache:
+            try:
+                cache_mod.save(built, resolution, mfs=mfs, models=models)
+            except OSError as e:
+                logger.warning(f"Não foi possível gravar o cache de controladores: {e}")
+        built = _accurate(built, models, mfs, compiled_mod.MAX_ERROR, compiled_mod.ERROR_QUANTILE)
+    return built
+
+
+def _accurate(built, models, mfs, max_error, quantile):
+    """
+    Troca pelo motor analítico as tabelas cujo erro no quantil `quantile`,
+    medido contra o skfuzzy, passa de max_error. A interpolação suaviza os
+    saltos da saída nas bordas das regras; no modelo de marcha (5 entradas,
+    resolução reduzida) isso chega a ~0.2 em gear_adj em 1% do domínio e
+    muda a troca perto dos limiares ±0.4.
+    """
+    try:
+        from Fuzzy.analytic import AnalyticSimulation
+    except Exception:
+        from analytic import AnalyticSimulation
+
+    for name, model in built.items():
+        error = max((getattr(model, 'error', None) or {}).values(), default=0.0)
+        if error <= max_error:
+            continue
+        try:
+            built[name] = AnalyticSimulation(models[name], mfs.get(name))
+        except NotImplementedError as e:
+            logger.warning(f"{name}: tabela com erro p{quantile * 100:g} {error:.3f} mantida ({e})")
+            continue
+        logger.warning(f"{name}: tabela com erro p{quantile * 100:g} {error:.3f} (> {max_error}), "
+                       f"usando o centroide em forma fechada")
+    return built
+
+
+def instance(model):
+    """
+    Cópia de um modelo com input/output próprios, para outro carro usar ao
+    mesmo tempo (ex.: threads de torcs_fleet): compute() escreve em
+    model.input e model.output, então um modelo compartilhado entre threads
+    mistura as entradas de um carro com a saída de outro. As tabelas e
+    regras continuam compartilhadas.
+    """
+    if hasattr(model, 'evaluate'):
+        # CompiledSimulation / AnalyticSimulation: evaluate() só lê as tabelas
+        clone = copy.copy(model)
+        clone.input = {}
+        clone.output = {}
+        return clone
+    # ControlSystemSimulation: o estado de cada simulação fica separado no ControlSystem
+    from skfuzzy import control as ctrl
+    return ctrl.ControlSystemSimulation(model.ctrl)
+
+
+class RuleWatcher:
+    """
+    Thread que observa o arquivo de regras e, quando ele muda, monta e
+    compila de novo os modelos cuja definição mudou (build_models). O
+    resultado fica em self.latest = (geração, {atributo: modelo}, mtime do
+    arquivo), trocado numa atribuição só: cada driver compara a geração no
+    começo do tick e troca os controladores entre dois ticks
+    (TorcsDriver.apply_rules()). O dicionário traz todos os modelos
+    recompilados desde o início, não só os da última geração: um driver que
+    pula gerações (sem ticks entre duas recargas) recebe todas as mudanças.
+    Um arquivo inválido ou que não compila é registrado e ignorado: os
+    controladores atuais continuam.
+
+    Pode ser compartilhado por vários drivers (TorcsDriver(watch_rules=watcher)).
+    """
+
+    def __init__(self, path=None, compiled=True, resolution=None, mfs=None, cache=True, analytic=False,
+                 poll_interval=POLL_INTERVAL, name='rule-watcher'):
+        self.path = path or RULES_PATH
+        self.options = {'compiled': compiled, 'resolution': resolution, 'mfs': mfs, 'cache': cache,
+                        'analytic': analytic}
+        self.poll_interval = poll_interval
+        self.latest = (0, None, None)
+        self.reloads = 0
+        self.failures = 0
+        self.compile_times = deque(maxlen=HISTORY)
+        self.latencies = deque(maxlen=HISTORY)
+        # modelos recompilados até agora (os demais continuam os que cada driver montou)
+        self._models = {}
+        self._mtime = self._stat()
+        self._digests = {}
+        try:
+            self._digests = {name: digest(spec) for name, spec in load(self.path).items()}
+        except (OSError, ValueError) as e:
+            logger.warning(f"Regras em {self.path} inválidas: {e}")
+        self._stop = threading.Event()
+        self.thread = threading.Thread(target=self._run, name=name, daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self.thread.join()
+
+    def _stat(self):
+        try:
+            return os.stat(self.path).st_mtime_ns
+        except OSError:
+            return None
+
+    def _run(self):
+        while not self._stop.wait(self.poll_interval):
+            mtime = self._stat()
+            if mtime is None or mtime == self._mtime:
+                continue
+            time.sleep(SETTLE)
+            self._mtime = self._stat()
+            self.reload(self._mtime)
+
+    def reload(self, mtime=None):
+        """Recompila os modelos alterados no arquivo; True se publicou novos modelos."""
+        start = time.perf_counter()
+        try:
+            models = load(self.path)
+            changed = {name: spec for name, spec in models.items() if digest(spec) != self._digests.get(name)}
+            if not changed:
+                return False  # só salvou de novo (ou voltou ao que já roda)
+            built = build_models(changed, **self.options)
+        except Exception as e:
+            self.failures += 1
+            logger.error(f"Regras em {self.path} não recarregadas, mantendo os controladores atuais: {e}")
+            return False
+        elapsed = time.perf_counter() - start
+        self._digests.update({name: digest(spec) for name, spec in changed.items()})
+        self.compile_times.append(elapsed)
+        self.reloads += 1
+        self._models.update(built)
+        self.latest = (self.latest[0] + 1, dict(self._models), mtime)
+        logger.info(f"Regras recarregadas de {self.path} (geração {self.reloads}, {sorted(changed)}) em {elapsed:.2f}s")
+        return True
+
+    def swapped(self, mtime):
+        """Chamado pelo driver ao trocar os controladores: latência desde a gravação do arquivo."""
+        if mtime is not None:
+            self.latencies.append(time.time() - mtime / 1e9)
+
+    def summary(self):
+        parts = [f"reloads={self.reloads} failed={self.failures}"]
+        if self.compile_times:
+            parts.append(f"compile last {self.compile_times[-1]:.2f}s max {max(self.compile_times):.2f}s")
+        if self.latencies:
+            parts.append(f"file -> swap last {self.latencies[-1]:.2f}s max {max(self.latencies):.2f}s")
+        return ', '.join(parts)
@@ -0,0 +1,168 @@
+# features.py
+# Características da pista extraídas uma vez por tick dos sensores 'track'.
+#
+# São só 19 leituras: as contas são feitas numa lista Python, com os senos e
+# cossenos dos ângulos pré-calculados. Com arrays numpy desse tamanho quase
+# todo o tempo vai no custo fixo de cada operação.
+import math
+
+# Alcance dos sensores de pista (m): leitura igual a isso = nada à vista
+SENSOR_RANGE = 200.0
+# Tolerância (m) para um ponto de borda ainda "pertencer" à reta: fixa + proporcional à distância
+EDGE_TOLERANCE = 1.0
+EDGE_TOLERANCE_RATIO = 0.03
+# Raio (m) assumido quando só um ponto da borda foge da reta e não dá para extrapolar
+TYPICAL_RADIUS = 50.0
+
+_trig = {}
+
+
+def _angles(n):
+    """(cos, sin) dos n sensores, igualmente espaçados de -90 a +90 graus (como em build_init_request())."""
+    trig = _trig.get(n)
+    if trig is None:
+        angles = [math.radians(-90.0 + 180.0 * i / (n - 1)) for i in range(n)]
+        trig = _trig[n] = ([math.cos(a) for a in angles], [math.sin(a) for a in angles])
+    return trig
+
+
+def _median(values):
+    values = sorted(values)
+    mid = len(values) // 2
+    return values[mid] if len(values) % 2 else (values[mid - 1] + values[mid]) / 2.0
+
+
+class TrackFeatures:
+    """
+    Tudo o que os controladores usam de sensors['track'], calculado uma vez:
+        - center: leitura do sensor central (m)
+        - left_mean / right_mean: média de cada metade (classificador de curva)
+        - left_median / right_median: mediana das leituras positivas de cada
+          metade, ou center se não houver (steering)
+        - dist_to_turn: distância estimada até o início da próxima curva (m)
+        - size: número de sensores (0 sem leituras)
+        - valid: False sem leituras ou fora da pista (-1)
+    """
+    __slots__ = ('tick', 'size', 'valid', 'center', 'left_mean', 'right_mean', 'side_diff',
+                 'left_median', 'right_median', 'dist_to_turn')
+
+    def __init__(self, tick=None):
+        self.tick = tick
+        self.size = 0
+        self.valid = False
+        self.center = 0.0
+        self.left_mean = self.right_mean = self.side_diff = 0.0
+        self.left_median = self.right_median = 0.0
+        self.dist_to_turn = SENSOR_RANGE
+
+
+def _edge_turn_start(points):
+    """
+    Início da curva numa borda, a partir dos pontos (x, desvio lateral,
+    tolerância) ordenados por x. Perto do início uma curva se afasta da
+    reta como uma parábola (desvio ~ d²/2R), então sqrt(desvio) cresce
+    linearmente com a distância d desde o início: extrapola a reta pelos
+    dois primeiros pontos fora da tolerância até desvio zero, sem voltar
+    antes do último ponto ainda na reta (com um só ponto fora, usa
+    TYPICAL_RADIUS como raio). None se a borda inteira está na reta.
+    """
+    lower = 0.0
+    for k, (x, deviation, tolerance) in enumerate(points):
+        if deviation <= tolerance:
+            lower = x
+            continue
+        root = math.sqrt(deviation)
+        if k + 1 < len(points) and points[k + 1][0] > x and math.sqrt(points[k + 1][1]) > root:
+            x1, deviation1, _ = points[k + 1]
+            start = x - root * (x1 - x) / (math.sqrt(deviation1) - root)
+        else:
+            # um único ponto fora (ex.: o sensor central na borda externa lá na frente)
+            start = x - math.sqrt(2.0 * TYPICAL_RADIUS * deviation)
+        return min(max(start, lower, 0.0), x)
+    return None
+
+
+def estimate_distance_to_turn(track, angle=0.0):
+    """
+    Distância (m, ao longo da pista) até onde a reta à frente termina.
+
+    Cada sensor vira um ponto da borda no referencial da pista (girado pelo
+    `angle` do carro). Numa reta os pontos de cada borda ficam à mesma
+    distância lateral que os sensores de ±90 graus; a curva começa onde a
+    borda passa a fugir disso (a externa entrando no caminho, a interna se
+    afastando), ver _edge_turn_start. Sem nenhum ponto fora, a reta vai
+    pelo menos até onde os sensores alcançaram.
+    """
+    t = [float(v) for v in track]
+    n = len(t)
+    if n < 3 or min(t) < 0.0:
+        return SENSOR_RANGE  # sem dados / fora da pista → desconhecida, tratar como longe
+    cos, sin = _angles(n)
+    # referencial da pista: angle = direção da pista - direção do carro; no do
+    # carro x aponta para a frente e y para a esquerda (sensor -90 à esquerda)
+    c, s = math.cos(angle), math.sin(angle)
+    mid = n // 2
+    left_width = -t[0] * (sin[0] * c + cos[0] * s)
+    right_width = t[-1] * (sin[-1] * c + cos[-1] * s)
+
+    left, right = [], []
+    reach = t[mid]
+    for i in range(1, n - 1):  # os sensores laterais definem as larguras
+        r = t[i]
+        x = r * (cos[i] * c - sin[i] * s)
+        reach = max(reach, x)
+        if r >= SENSOR_RANGE or x <= 0.0:
+            continue
+        y = -r * (sin[i] * c + cos[i] * s)
+        left_dev = abs(y - left_width)
+        right_dev = abs(-y - right_width)
+        tolerance = EDGE_TOLERANCE + EDGE_TOLERANCE_RATIO * x
+        # o ponto é da borda mais próxima (com o carro torto, sensores de um lado veem a outra borda)
+        if left_dev <= right_dev:
+            left.append((x, left_dev, tolerance))
+        else:
+            right.append((x, right_dev, tolerance))
+
+    starts = [start for start in (_edge_turn_start(sorted(left)), _edge_turn_start(sorted(right)))
+              if start is not None]
+    if starts:
+        return min(starts)
+    # tudo na reta: ela vai pelo menos até onde os sensores alcançaram
+    return min(reach, SENSOR_RANGE)
+
+
+def extract(track, angle=0.0, tick=None):
+    """TrackFeatures de uma leitura dos sensores de pista."""
+    f = TrackFeatures(tick)
+    if track is None or len(track) == 0:
+        return f
+    t = [float(v) for v in track]
+    f.size = n = len(t)
+    mid = n // 2
+    left = t[:mid]
+    right = t[mid + 1:]
+    f.center = t[mid]
+    f.left_mean = sum(left) / len(left) if left else f.center
+    f.right_mean = sum(right) / len(right) if right else f.center
+    f.side_diff = abs(f.left_mean - f.right_mean)
+    positive = [v for v in left if v > 0]
+    f.left_median = _median(positive) if positive else f.center
+    positive = [v for v in right if v > 0]
+    f.right_median = _median(positive) if positive else f.center
+    f.dist_to_turn = estimate_distance_to_turn(t, angle)
+    f.valid = f.center >= 0.0
+    return f
+
+
+def track_features(self, sensors):
+    """
+    Características do tick atual do driver: calculadas na primeira chamada
+    do tick (TorcsDriver.drive faz isso antes dos controladores) e reusadas
+    pelas seguintes.
+    """
+    f = getattr(self, 'features', None)
+    tick = getattr(self, 'tick', None)
+    if f is None or f.tick != tick or tick is None:
+        f = self.features = extract(sensors.get('track', None), float(sensors.get('angle', 0.0)), tick)
+        self._dist_to_turn = f.dist_to_turn
+    return f
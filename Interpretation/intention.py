@@ -36,5 +36,5 @@ def intention_interpreter(self, sensors):
     # normaliza para -1..1
     intention = float(np.clip(intention, -1.0, 1.0))
     self._last_intention = intention
-    logger.debug(f"Intention interp -> cls={cls} sev={sev:.2f} speed={speed:.1f} intention={intention:.2f}")
+    logger.debug("Intention interp -> cls=%s sev=%.2f speed=%.1f intention=%.2f", cls, sev, speed, intention)
     return intention
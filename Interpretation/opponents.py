@@ -0,0 +1,223 @@
+# opponents.py
+# Leitura do tráfego a partir de sensors['opponents'].
+#
+# O scr_server manda 36 distâncias: para cada setor de 10 graus em volta do
+# carro, a do adversário mais próximo nele (200 = ninguém). Os setores vão
+# de -180 (atrás) no sentido horário, como os sensores de pista: negativo é
+# à esquerda. Tudo aqui é feito nos 36 setores de uma vez com numpy, sem
+# laço por setor: carro mais próximo à frente na nossa linha, velocidade de
+# aproximação, lado livre e posição na pista para ultrapassar, e quanto
+# frear quando não há por onde passar. Depois do teste de pista livre (o
+# caso comum), só os setores ocupados entram nas contas.
+#
+# A etapa roda em TorcsDriver.drive() logo depois das características da
+# pista; steering_controller puxa o carro para target_pos e
+# accel_brake_controller aplica brake.
+import time
+
+import numpy as np
+
+SECTORS = 36
+# Alcance dos sensores de adversários (m)
+OPPONENT_RANGE = 200.0
+# Bordas e centro de cada setor (rad, horário a partir da frente). Um adversário
+# pode estar em qualquer ponto do setor: a posição lateral dele é um intervalo
+_EDGES = np.radians(-180.0 + 10.0 * np.arange(SECTORS + 1))
+_COS = np.cos((_EDGES[:-1] + _EDGES[1:]) / 2.0)
+# lateral (à esquerda) por metro de distância nas duas bordas do setor
+_Y_LOW = np.minimum(-np.sin(_EDGES[:-1]), -np.sin(_EDGES[1:]))
+_Y_HIGH = np.maximum(-np.sin(_EDGES[:-1]), -np.sin(_EDGES[1:]))
+# setor seguinte (o anterior é sector - 1, que já dá a volta)
+_NEXT = (np.arange(SECTORS) + 1) % SECTORS
+# Tempo entre ticks do scr_server (s), para a velocidade de aproximação
+DT = 0.02
+# Aproximação (m/s) acima da qual a diferença entre ticks não é o mesmo carro
+MAX_CLOSING = 60.0
+# Dimensões assumidas de um carro (m)
+CAR_LENGTH = 4.5
+CAR_WIDTH = 2.0
+# Espaço (m) mantido atrás do carro da frente quando não dá para passar
+MIN_GAP = 5.0
+# Até onde à frente (m) um adversário conta para a ultrapassagem
+LOOKAHEAD = 60.0
+# Até onde à frente (m) um adversário de lado bloqueia o lado da ultrapassagem
+SIDE_WINDOW = 20.0
+# trackPos da ultrapassagem pela esquerda (pela direita, o negativo)
+PASS_POS = 0.6
+# Meia largura (m) assumida quando os sensores de pista não servem
+DEFAULT_HALF_WIDTH = 6.0
+# Severidade de curva a partir da qual não se ultrapassa (CORNER_SEVERITY em track_map.py)
+PASS_MAX_SEVERITY = 0.45
+# Reta (m) à frente necessária para ultrapassar enquanto o mapa da pista não está pronto
+PASS_ROOM = 40.0
+# Tempo até a colisão (s) abaixo do qual começa a ultrapassagem
+TTC_PASS = 3.0
+# Tempo até a colisão (s) abaixo do qual o carro da frente faz frear (sem lado livre; com um, só na metade disso)
+TTC_BRAKE = 1.5
+# Correção de direção, além de centrar em target_pos, por unidade de trackPos que falta até ele
+OVERTAKE_GAIN = 0.5
+# Limite da correção toda: abrir para o lado sem sair da pista
+OVERTAKE_MAX_STEER = 0.5
+_PASS = np.array([PASS_POS, -PASS_POS])
+# Custo máximo da etapa por tick (µs); update() conta as vezes que passou disso
+STAGE_BUDGET_US = 100.0
+
+
+class Traffic:
+    """
+    Resultado de um tick:
+        - count: adversários dentro do alcance
+        - ahead: distância (m, à frente) do carro mais próximo na nossa linha,
+          ou OPPONENT_RANGE se ninguém
+        - closing: velocidade (m/s) com que nos aproximamos dele (> 0 aproximando)
+        - ttc: tempo (s) até chegar a MIN_GAP dele (inf se não está se aproximando)
+        - target_pos: trackPos do lado escolhido para ultrapassar, ou None
+        - brake: 0..1, frenagem pedida pelo carro da frente
+    """
+    __slots__ = ('tick', 'count', 'ahead', 'closing', 'ttc', 'target_pos', 'brake')
+
+    def __init__(self, tick=None):
+        self.tick = tick
+        self.count = 0
+        self.ahead = OPPONENT_RANGE
+        self.closing = 0.0
+        self.ttc = float('inf')
+        self.target_pos = None
+        self.brake = 0.0
+
+
+class OpponentTracker:
+    """
+    update(sensors, tick) uma vez por tick; guarda as leituras anteriores (e
+    o tick delas) para a velocidade de aproximação e mede o próprio custo
+    contra `budget_us`. Ticks em que a etapa não rodou (orçamento do tick,
+    deadline.py) entram no intervalo: a variação é dividida pelo tempo real.
+    """
+
+    def __init__(self, budget_us=STAGE_BUDGET_US):
+        self.budget_us = budget_us
+        self.calls = 0
+        self.overruns = 0
+        self.total_us = 0.0
+        self.traffic = Traffic()
+        self._prev = np.full(SECTORS, OPPONENT_RANGE)
+        self._prev_tick = None
+        self._target = None
+
+    def reset(self):
+        self._prev = np.full(SECTORS, OPPONENT_RANGE)
+        self._prev_tick = None
+        self._target = None
+        self.traffic = Traffic()
+
+    def update(self, sensors, tick=None, room=True):
+        """Traffic do tick; `room` diz se a pista à frente deixa ultrapassar (passing_room())."""
+        start = time.perf_counter()
+        traffic = self.traffic = self._update(sensors, tick, room)
+        elapsed = (time.perf_counter() - start) * 1e6
+        self.calls += 1
+        self.total_us += elapsed
+        if elapsed > self.budget_us:
+            self.overruns += 1
+        return traffic
+
+    def _update(self, sensors, tick, room):
+        traffic = Traffic(tick)
+        opponents = sensors.get('opponents', None)
+        if opponents is None or len(opponents) != SECTORS:
+            return traffic
+        d = np.asarray(opponents, dtype=float)
+        prev = self._prev
+        self._prev = d.copy()
+        # tempo desde a leitura anterior: mais de um tick se a etapa foi pulada
+        ticks = 1
+        if tick is not None and self._prev_tick is not None and tick > self._prev_tick:
+            ticks = tick - self._prev_tick
+        self._prev_tick = tick
+        # só os setores com alguém (poucos, mesmo no tráfego denso) seguem daqui
+        sector = (d < OPPONENT_RANGE).nonzero()[0]
+        traffic.count = len(sector)
+        if not traffic.count:
+            self._target = None
+            return traffic  # pista livre: o caso comum sai aqui
+
+        dist = d[sector]
+        x = dist * _COS[sector]
+        y_low = dist * _Y_LOW[sector]
+        y_high = dist * _Y_HIGH[sector]
+        # aproximação por setor contra a leitura anterior mais próxima no mesmo
+        # setor ou nos vizinhos (um carro muda de setor conforme passamos por ele);
+        # acima de MAX_CLOSING é outro carro entrando no setor, não aproximação
+        before = np.minimum(np.minimum(prev[sector], prev[sector - 1]), prev[_NEXT[sector]])
+        closing = (before - dist) / (DT * ticks)
+        closing[(before >= OPPONENT_RANGE) | (np.abs(closing) > MAX_CLOSING)] = 0.0
+
+        # carro mais próximo à frente que pode estar na nossa linha
+        in_line = (x > 0.0) & (y_low < CAR_WIDTH) & (y_high > -CAR_WIDTH)
+        ahead = np.where(in_line, x, np.inf)
+        k = ahead.argmin()
+        if ahead[k] < np.inf:
+            traffic.ahead = float(x[k])
+            traffic.closing = float(closing[k])
+            if traffic.closing > 0.0:
+                traffic.ttc = max(traffic.ahead - CAR_LENGTH - MIN_GAP, 0.0) / traffic.closing
+
+        # lado da ultrapassagem: escolhido ao alcançar o carro da frente e mantido
+        # enquanto houver alguém por perto. Com setores de 10 graus a posição
+        # lateral de um carro longe é imprecisa demais para escolher faixa a
+        # faixa (a 50 m um setor tem 8.7 m de largura)
+        target = self._target
+        near = (x > -CAR_LENGTH) & (x < SIDE_WINDOW)
+        chasing = traffic.ahead < LOOKAHEAD and traffic.closing > 0.0 and traffic.ttc < TTC_PASS
+        if target is not None:
+            if not near.any():
+                target = None  # passou
+            elif not room and not (near & (x < CAR_LENGTH)).any():
+                target = None  # curva chegando e ninguém do lado: desiste e segue o da frente
+        elif chasing and room:
+            # lado livre: nenhum carro por perto (fora o da frente) cobrindo a posição da ultrapassagem
+            track_pos = float(sensors.get('trackPos', 0.0))
+            half = _half_width(sensors)
+            side = near & ~in_line
+            low = track_pos + (y_low[side] - CAR_WIDTH) / half
+            high = track_pos + (y_high[side] + CAR_WIDTH) / half
+            blocked = ((_PASS[:, None] > low) & (_PASS[:, None] < high)).any(axis=1)
+            # prefere o lado mais perto; trocar de lado no meio da ultrapassagem joga
+            # o carro para fora da pista, então se o lado escolhido não abrir, freia
+            for i in ((0, 1) if track_pos >= 0.0 else (1, 0)):
+                if not blocked[i]:
+                    target = float(_PASS[i])
+                    break
+        self._target = target
+        traffic.target_pos = target
+        if chasing and traffic.ttc < TTC_BRAKE and (target is None or traffic.ttc < TTC_BRAKE / 2.0):
+            traffic.brake = min((TTC_BRAKE - traffic.ttc) / TTC_BRAKE, 1.0)
+        return traffic
+
+    def summary(self):
+        mean = self.total_us / self.calls if self.calls else 0.0
+        return f"mean {mean:.1f}us, {self.overruns}/{self.calls} over {self.budget_us:.0f}us"
+
+
+def passing_room(self, sensors):
+    """
+    True se a pista à frente deixa ultrapassar: fora de curva fechada e sem
+    precisar frear para a próxima (pelo mapa da pista, se pronto; senão pela
+    reta estimada nos sensores). Abrir para o lado perto de uma curva lenta
+    joga o carro para fora da pista.
+    """
+    if float(getattr(self, '_last_severity', 0.0)) >= PASS_MAX_SEVERITY:
+        return False
+    track_map = getattr(self, 'track_map', None)
+    if track_map is not None and track_map.ready:
+        speed = float(sensors.get('speedX', 0.0))
+        return track_map.upcoming(float(sensors.get('distFromStart', 0.0)), speed) == 0.0
+    return float(getattr(self, '_dist_to_turn', OPPONENT_RANGE)) >= PASS_ROOM
+
+
+def _half_width(sensors):
+    # sensores de ±90 graus: distância às duas bordas
+    track = sensors.get('track', None)
+    if track is None or len(track) < 2 or track[0] < 0.0 or track[-1] < 0.0:
+        return DEFAULT_HALF_WIDTH
+    return max((float(track[0]) + float(track[-1])) / 2.0, CAR_WIDTH)
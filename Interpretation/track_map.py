@@ -0,0 +1,283 @@
+# track_map.py
+# Mapa da pista indexado por distFromStart, montado durante a primeira volta.
+#
+# A pista é dividida em trechos de BIN_SIZE metros. Enquanto o mapa não está
+# pronto, cada tick soma no seu trecho a severidade dada pelo classificador
+# fuzzy e a curvatura medida (variação da direção da pista, yaw + angle, por
+# metro percorrido). Quando uma volta inteira foi coberta, o mapa é fechado:
+# cada trecho guarda severidade, curvatura, direção e a distância e
+# severidade da próxima curva, então olhar à frente é uma indexação só.
+#
+# Com um nome de pista (TorcsDriver(track_name=...)) o mapa fechado é gravado
+# em MAP_DIR/<nome>.npy e aberto com mmap nas corridas seguintes: pronto
+# desde o primeiro tick.
+import math
+import os
+
+import numpy as np
+
+from log import logger
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Diretório dos mapas gravados (TRACK_MAP_DIR sobrescreve)
+MAP_DIR = os.environ.get('TRACK_MAP_DIR', os.path.join(ROOT, '.track_maps'))
+# Tamanho de cada trecho (m)
+BIN_SIZE = 5.0
+# Fração dos trechos que precisa ter amostras para fechar o mapa
+MIN_COVERAGE = 0.95
+# Trechos além do fim do mapa ainda tratados como o último: o fim da volta gravada
+# é o último tick antes da linha, e a volta seguinte pode passar um pouco dele
+OVERFLOW_BINS = 2
+# Severidade a partir da qual um trecho conta como curva (medium_turn em turn_classifier_controller)
+CORNER_SEVERITY = 0.45
+# Curvatura (1/m) abaixo da qual o trecho é reto (raio maior que 500 m)
+STRAIGHT_CURVATURE = 1.0 / 500.0
+# Curvatura (1/m) a partir da qual o trecho conta como curva (raio menor que 250 m)
+CORNER_CURVATURE = 1.0 / 250.0
+# Aceleração lateral (m/s²) aceita numa curva: dá a velocidade de entrada, sqrt(grip * raio)
+LATERAL_GRIP = 25.0
+# Desaceleração (m/s²) usada para a distância de frenagem até a próxima curva
+PLANNING_DECEL = 8.0
+# Severidade mínima passada ao accel/brake quando é preciso frear para a próxima curva
+BRAKE_SEVERITY = 0.6
+
+# Registro de cada trecho no arquivo
+MAP_DTYPE = np.dtype([
+    ('severity', '<f4'),      # severidade média (0..1)
+    ('curvature', '<f4'),     # 1/m, positiva para a esquerda
+    ('direction', 'i1'),      # +1 esquerda, -1 direita, 0 reta
+    ('next_corner', '<f4'),   # m do início do trecho até a próxima curva (0 se já é curva)
+    ('next_severity', '<f4'), # severidade máxima dessa curva
+    ('next_curvature', '<f4'),# |curvatura| máxima dessa curva (1/m)
+])
+
+
+def map_path(name, directory=None):
+    return os.path.join(directory or MAP_DIR, f"{name}.npy")
+
+
+class TrackMap:
+    """
+    observe() a cada tick até `ready`; depois lookup()/upcoming() em tempo
+    constante. Sem `name` o mapa só vive na memória (serve da segunda volta
+    em diante, e nas corridas seguintes do mesmo processo).
+    """
+
+    def __init__(self, name=None, directory=None, bin_size=BIN_SIZE):
+        self.name = name
+        self.directory = directory
+        self.bin_size = bin_size
+        self.bins = None
+        self.size = 0
+        self._clear()
+        if name is not None:
+            self.load()
+
+    @property
+    def ready(self):
+        return self.bins is not None
+
+    def _clear(self):
+        # somas por trecho da volta sendo gravada (crescem conforme a pista aparece)
+        self._severity = np.zeros(64)
+        self._curvature = np.zeros(64)
+        self._side = np.zeros(64)
+        self._samples = np.zeros(64, dtype=int)
+        self._curvature_samples = np.zeros(64, dtype=int)
+        self._max_dist = 0.0
+        self.reset()
+
+    def reset(self):
+        """Nova corrida: esquece o tick anterior (o mapa fica)."""
+        self._prev_dist = None
+        self._prev_heading = None
+
+    def load(self, path=None):
+        """Abre o mapa gravado da pista (ou o arquivo `path`); False se não há um válido."""
+        path = path or map_path(self.name, self.directory)
+        if not os.path.exists(path):
+            return False
+        try:
+            bins = np.load(path, mmap_mode='r')
+        except (OSError, ValueError) as e:
+            logger.warning("Mapa da pista inválido (%s): %s", path, e)
+            return False
+        if bins.dtype != MAP_DTYPE or bins.ndim != 1 or not len(bins):
+            logger.warning("Mapa da pista com formato diferente, ignorado: %s", path)
+            return False
+        self.bins = bins
+        self.size = len(bins)
+        logger.info("Mapa da pista carregado de %s (%d trechos de %g m)", path, self.size, self.bin_size)
+        return True
+
+    def save(self, path=None):
+        """Grava o mapa fechado em MAP_DIR/<nome>.npy (ou em `path`)."""
+        path = path or map_path(self.name, self.directory)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # escreve num temporário e renomeia: outro processo nunca abre um arquivo pela metade
+        temp = f"{path}.{os.getpid()}.tmp"
+        out = np.lib.format.open_memmap(temp, mode='w+', dtype=MAP_DTYPE, shape=(self.size,))
+        out[:] = self.bins
+        out.flush()
+        del out
+        os.replace(temp, path)
+        logger.info("Mapa da pista gravado em %s", path)
+        return path
+
+    def _grow(self, i):
+        n = len(self._samples)
+        while n <= i:
+            n *= 2
+        for attr in ('_severity', '_curvature', '_side', '_samples', '_curvature_samples'):
+            old = getattr(self, attr)
+            new = np.zeros(n, dtype=old.dtype)
+            new[:len(old)] = old
+            setattr(self, attr, new)
+
+    def observe(self, sensors, features, severity):
+        """Soma o tick ao trecho atual; fecha o mapa quando uma volta inteira foi vista."""
+        if self.ready:
+            return
+        dist = float(sensors.get('distFromStart', 0.0))
+        prev_dist, prev_heading = self._prev_dist, self._prev_heading
+        heading = None
+        if 'yaw' in sensors:
+            heading = float(sensors['yaw']) + float(sensors.get('angle', 0.0))
+        self._prev_dist, self._prev_heading = dist, heading
+
+        if prev_dist is not None and dist < prev_dist - 0.5 * self._max_dist:
+            # passou pela linha de chegada: fecha se a volta foi coberta
+            self._finish(self._max_dist)
+            if self.ready:
+                return
+        self._max_dist = max(self._max_dist, dist)
+        # fora da pista os sensores não descrevem a pista
+        if not features.valid or abs(float(sensors.get('trackPos', 0.0))) > 1.0:
+            return
+
+        i = int(dist // self.bin_size)
+        if i >= len(self._samples):
+            self._grow(i)
+        self._samples[i] += 1
+        self._severity[i] += severity
+        # lado mais aberto: indica para onde a pista vira quando não há yaw
+        self._side[i] += features.left_mean - features.right_mean
+        if heading is not None and prev_heading is not None and prev_dist is not None:
+            ds = dist - prev_dist
+            if 0.05 < ds < self.bin_size:
+                turn = (heading - prev_heading + math.pi) % (2.0 * math.pi) - math.pi
+                self._curvature[i] += turn / ds
+                self._curvature_samples[i] += 1
+
+    def _finish(self, length):
+        # trecho de `length` incluso (o fim exato da volta fica depois do último tick)
+        n = int(length // self.bin_size) + 1
+        if n < 2:
+            return
+        samples = self._samples[:n]
+        seen = samples > 0
+        if seen.mean() < MIN_COVERAGE:
+            logger.debug("Mapa da pista: volta com %.0f%% dos trechos, continua gravando", seen.mean() * 100)
+            return
+
+        index = np.arange(n)
+        seen_index = np.flatnonzero(seen)
+
+        def mean(total, count):
+            count = count[:n]
+            values = np.divide(total[:n], count, out=np.zeros(n), where=count > 0)
+            have = np.flatnonzero(count > 0)
+            if not have.size:
+                return values
+            # trechos sem amostra: interpola entre os vizinhos (volta fechada)
+            return np.interp(index, have, values[have], period=n)
+
+        bins = np.zeros(n, dtype=MAP_DTYPE)
+        bins['severity'] = np.clip(mean(self._severity, self._samples), 0.0, 1.0)
+        curvature = mean(self._curvature, self._curvature_samples)
+        bins['curvature'] = curvature
+        if self._curvature_samples[:n].any():
+            bins['direction'] = np.where(np.abs(curvature) < STRAIGHT_CURVATURE, 0, np.sign(curvature))
+        else:
+            side = np.interp(index, seen_index, (self._side[:n] / np.maximum(samples, 1))[seen_index], period=n)
+            bins['direction'] = np.where(bins['severity'] < CORNER_SEVERITY, 0, np.sign(side))
+
+        # próxima curva de cada trecho: varredura de trás para frente, duas voltas (pista fechada)
+        severity = bins['severity']
+        bend = np.abs(curvature)
+        corner = (severity >= CORNER_SEVERITY) | (bend >= CORNER_CURVATURE)
+        next_corner = np.full(n, np.inf)
+        next_severity = np.zeros(n)
+        next_curvature = np.zeros(n)
+        if corner.any():
+            distance, peak, peak_bend = np.inf, 0.0, 0.0
+            for k in range(2 * n - 1, -1, -1):
+                i = k % n
+                if corner[i]:
+                    # pico da curva inteira: se o trecho seguinte ainda é curva, acumula
+                    inside = distance == 0.0
+                    peak = max(severity[i], peak if inside else 0.0)
+                    peak_bend = max(bend[i], peak_bend if inside else 0.0)
+                    distance = 0.0
+                else:
+                    distance += self.bin_size
+                next_corner[i] = distance
+                next_severity[i] = peak
+                next_curvature[i] = peak_bend
+        bins['next_corner'] = np.minimum(next_corner, np.finfo(np.float32).max)
+        bins['next_severity'] = next_severity
+        bins['next_curvature'] = next_curvature
+
+        self.bins = bins
+        self.size = n
+        logger.info("Mapa da pista pronto: %d trechos de %g m, %d em curva", n, self.bin_size, int(corner.sum()))
+        if self.name is not None:
+            try:
+                self.save()
+            except OSError as e:
+                logger.warning("Não foi possível gravar o mapa da pista: %s", e)
+
+    def _index(self, dist):
+        i = int(dist // self.bin_size)
+        if i >= self.size:
+            if i < self.size + OVERFLOW_BINS:
+                # mesma pista, um pouco além do último tick da volta gravada
+                return self.size - 1
+            # mapa de outra pista (mais curta): descarta e grava de novo
+            logger.warning("Mapa da pista não corresponde a esta pista (distFromStart %.0f m), gravando de novo", dist)
+            self.bins = None
+            self.size = 0
+            self._clear()
+            return None
+        return i
+
+    def lookup(self, dist):
+        """Registro do trecho em `dist` (ou None se o mapa não está pronto)."""
+        if not self.ready:
+            return None
+        i = self._index(dist)
+        return None if i is None else self.bins[i]
+
+    def upcoming(self, dist, speed):
+        """
+        Severidade a considerar agora pela próxima curva: se `speed` (km/h)
+        passa da velocidade de entrada dela, sqrt(LATERAL_GRIP * raio), e a
+        curva já está dentro da distância de frenagem até essa velocidade,
+        a severidade da curva (pelo menos BRAKE_SEVERITY); senão 0. Sem
+        curvatura medida (sensores sem yaw) usa a distância de frenagem até
+        parar.
+        """
+        record = self.lookup(dist)
+        if record is None:
+            return 0.0
+        v = speed / 3.6
+        bend = float(record['next_curvature'])
+        v_corner = math.sqrt(LATERAL_GRIP / bend) if bend > 0.0 else 0.0
+        if v <= v_corner:
+            return 0.0
+        braking = (v * v - v_corner * v_corner) / (2.0 * PLANNING_DECEL)
+        # distância até a curva a partir da posição dentro do trecho
+        to_corner = max(float(record['next_corner']) - dist % self.bin_size, 0.0)
+        if to_corner > braking:
+            return 0.0
+        return max(float(record['next_severity']), BRAKE_SEVERITY)
@@ -0,0 +1,190 @@
+# car.py
+# Deterministic kinematic car for the headless scr_server stand-in.
+#
+# The car lives in track coordinates (distance along the centreline s,
+# lateral offset d, heading relative to the track psi) and is advanced with
+# a kinematic bicycle model plus a simple gearbox/drag longitudinal model.
+# Same controls in, same sensors out: there is no randomness anywhere.
+
+import math
+
+import numpy as np
+
+# Simulation step, seconds (scr_server's 20 ms game tick)
+DT = 0.02
+# Range of the track/opponent range finders, meters
+SENSOR_RANGE = 200.0
+# Default range finder angles (degrees), as sent by build_init_request()
+DEFAULT_ANGLES = tuple(range(-90, 91, 10))
+# Opponent sensors: 36 sectors of 10 degrees, clockwise from -180 (behind, on the left)
+OPPONENT_SECTORS = 36
+
+WHEELBASE = 2.7
+STEER_LOCK = 0.366  # radians at steer = +-1
+WHEEL_RADIUS = 0.33
+# gear -> ratio (engine revs per wheel rev); 0 is neutral
+GEAR_RATIOS = {-1: -12.0, 0: 0.0, 1: 12.0, 2: 8.6, 3: 6.6, 4: 5.4, 5: 4.6, 6: 4.0}
+MAX_RPM = 10000.0
+IDLE_RPM = 800.0
+MAX_ACCEL = 16.0  # m/s^2 at the wheels in first gear, scaled by ratio
+MAX_BRAKE = 14.0  # m/s^2
+DRAG = 0.0004  # 1/m, aerodynamic (v^2 term)
+ROLLING = 0.2  # m/s^2
+OFFTRACK_DRAG = 3.0  # m/s^2 extra on the grass
+# Lateral acceleration above which the car slides (steering loses authority)
+MAX_LATERAL = 25.0
+FUEL_PER_METER = 0.0003
+# Meters beyond the edge after which the car is put back on the centreline,
+# stopped (so a driver that leaves the track does not end the run)
+RECOVERY_DISTANCE = 10.0
+
+
+class CarModel:
+    """
+    One car on a Track. `step(control)` advances DT seconds with a control
+    dict {'accel', 'brake', 'gear', 'steer'}; `sensors(others)` returns the
+    values scr_server would send for the current state, with the cars in
+    `others` (other CarModels on the same track) seen by the opponent sensors.
+    Cars do not collide.
+    """
+
+    def __init__(self, track, angles=DEFAULT_ANGLES, start_offset=0.0):
+        self.track = track
+        self.set_angles(angles)
+        self.start_offset = start_offset
+        self.reset()
+
+    def set_angles(self, angles):
+        # scr sensor angles are clockwise-positive: -90 looks left, +90 right
+        self.angles = np.radians(-np.asarray(angles, dtype=float))
+
+    def reset(self):
+        self.s = 0.0  # along the centreline, unbounded (distRaced before wrapping)
+        self.d = self.start_offset  # meters, left positive
+        self.psi = 0.0  # car heading minus track heading, left positive
+        self.v = 0.0  # m/s
+        self.gear = 0
+        self.rpm = IDLE_RPM
+        self.fuel = 94.0
+        self.time = 0.0
+        self.lap_start = 0.0
+        self.last_lap_time = 0.0
+        self.laps = 0
+        self.recoveries = 0
+
+    @property
+    def on_track(self):
+        return abs(self.d) <= self.track.width / 2.0
+
+    def step(self, control):
+        accel = min(max(float(control.get('accel', 0.0)), 0.0), 1.0)
+        brake = min(max(float(control.get('brake', 0.0)), 0.0), 1.0)
+        steer = min(max(float(control.get('steer', 0.0)), -1.0), 1.0)
+        gear = int(control.get('gear', self.gear))
+        self.gear = gear if gear in GEAR_RATIOS else self.gear
+
+        ratio = GEAR_RATIOS[self.gear]
+        v = self.v
+        self.rpm = max(IDLE_RPM, abs(v) / WHEEL_RADIUS * abs(ratio) * 60.0 / (2.0 * math.pi))
+        drive = 0.0
+        if ratio and self.rpm < MAX_RPM:
+            drive = math.copysign(accel * MAX_ACCEL * abs(ratio) / GEAR_RATIOS[1], ratio)
+        resist = DRAG * v * v + ROLLING + (0.0 if self.on_track else OFFTRACK_DRAG) + brake * MAX_BRAKE
+        direction = math.copysign(1.0, v if v else drive)
+        v += (drive - direction * resist) * DT
+        if v * direction < 0.0 and abs(drive) < resist:
+            v = 0.0  # resistance stops the car, it never pushes it backwards
+        self.rpm = min(MAX_RPM, max(IDLE_RPM, abs(v) / WHEEL_RADIUS * abs(ratio) * 60.0 / (2.0 * math.pi)))
+
+        # kinematic bicycle in the track (Frenet) frame; the yaw rate is capped
+        # by the available grip so fast steering inputs make the car slide
+        yaw_rate = v / WHEELBASE * math.tan(steer * STEER_LOCK)
+        grip = MAX_LATERAL / max(abs(v), 1.0)
+        yaw_rate = min(max(yaw_rate, -grip), grip)
+        k = self.track.curvature_at(self.s)
+        ds = v * math.cos(self.psi) / max(1.0 - self.d * k, 0.1)
+        self.d += v * math.sin(self.psi) * DT
+        self.psi += (yaw_rate - k * ds) * DT
+        self.psi = (self.psi + math.pi) % (2.0 * math.pi) - math.pi
+        self.s += ds * DT
+        self.v = v
+        self.fuel = max(0.0, self.fuel - abs(ds) * DT * FUEL_PER_METER)
+        if abs(self.d) > self.track.width / 2.0 + RECOVERY_DISTANCE:
+            self.d = 0.0
+            self.psi = 0.0
+            self.v = 0.0
+            self.recoveries += 1
+
+        self.time += DT
+        laps = int(self.s // self.track.length) if self.s > 0 else 0
+        if laps > self.laps:
+            self.laps = laps
+            self.last_lap_time = self.time - self.lap_start
+            self.lap_start = self.time
+
+    def _opponents(self, x, y, heading, others):
+        ranges = np.full(OPPONENT_SECTORS, SENSOR_RANGE)
+        if not others:
+            return ranges
+        poses = np.array([self.track.pose(other.s, other.d)[:2] for other in others])
+        dx = poses[:, 0] - x
+        dy = poses[:, 1] - y
+        distance = np.hypot(dx, dy)
+        # bearing relative to the heading, clockwise-positive like the scr sensors
+        bearing = -(np.arctan2(dy, dx) - heading)
+        bearing = (bearing + np.pi) % (2.0 * np.pi) - np.pi
+        sector = np.minimum((np.degrees(bearing) + 180.0) // (360.0 / OPPONENT_SECTORS),
+                            OPPONENT_SECTORS - 1).astype(int)
+        near = distance < SENSOR_RANGE
+        np.minimum.at(ranges, sector[near], distance[near])
+        return ranges
+
+    def _range_finders(self, x, y, heading):
+        if not self.on_track:
+            return np.full(len(self.angles), -1.0)
+        x0, y0, dx, dy = self.track.edges(self.s, 20.0, SENSOR_RANGE)
+        direction = heading + self.angles
+        ux = np.cos(direction)[:, None, None]
+        uy = np.sin(direction)[:, None, None]
+        qx = x0 - x
+        qy = y0 - y
+        # solve t * u = q + w * e for every (ray, edge segment) pair
+        denom = ux * dy - uy * dx
+        with np.errstate(divide='ignore', invalid='ignore'):
+            t = (qx * dy - qy * dx) / denom
+            w = (qx * uy - qy * ux) / denom
+        t[~((t >= 0.0) & (w >= 0.0) & (w <= 1.0))] = SENSOR_RANGE
+        return np.minimum(t.min(axis=(1, 2)), SENSOR_RANGE)
+
+    def sensors(self, others=()):
+        track = self.track
+        x, y, track_heading = track.pose(self.s, self.d)
+        heading = track_heading + self.psi
+        return {
+            'angle': -self.psi,
+            'curLapTime': self.time - self.lap_start,
+            'damage': 0.0,
+            'distFromStart': self.s % track.length,
+            'distRaced': self.s,
+            'fuel': self.fuel,
+            'gear': float(self.gear),
+            'lastLapTime': self.last_lap_time,
+            'opponents': self._opponents(x, y, heading, others),
+            'racePos': 1.0,
+            'rpm': self.rpm,
+            'speedX': self.v * math.cos(self.psi) * 3.6,
+            'speedY': 0.0,
+            'speedZ': 0.0,
+            'track': self._range_finders(x, y, heading),
+            'trackPos': self.d / (track.width / 2.0),
+            'wheelSpinVel': np.full(4, self.v / WHEEL_RADIUS),
+            'z': 0.34,
+            'focus': np.full(5, -1.0),
+            'x': x,
+            'y': y,
+            'roll': 0.0,
+            'pitch': 0.0,
+            'yaw': heading,
+            'speedGlobalX': self.v * math.cos(heading) * 3.6,
+            'speedGlobalY': self.v * math.sin(heading) * 3.6,
+        }
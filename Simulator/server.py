@@ -0,0 +1,247 @@
+# server.py
+# Headless stand-in for TORCS' scr_server: speaks the UDP protocol to a
+# client (TorcsClient, torcs_async, torcs_fleet) and drives a CarModel on a
+# synthetic track, as fast as the client answers.
+#
+#   python -m Simulator.server --track oval --laps 3 [--races 2] [--cars 4] [--shm]
+#
+# With --shm the frames go through a shared-memory ring per port
+# (transports.ring_path(port)) in the fixed binary layouts instead of UDP
+# text; drive it with TorcsClient(transport=transports.ShmTransport(path)).
+
+import argparse
+import re
+import socket
+import threading
+import time
+
+from log import logger
+from car_state import SCALAR_FIELDS, VECTOR_FIELDS, SENSOR_FRAME, SENSOR_FRAME_KIND
+from control_command import CONTROL_FRAME, CONTROL_FRAME_KIND
+from transports import ShmChannel, ShmEndpoint, ring_path
+
+try:
+    from Simulator.track import get_track, TRACKS
+    from Simulator.car import CarModel, DEFAULT_ANGLES, DT
+except Exception:
+    from track import get_track, TRACKS
+    from car import CarModel, DEFAULT_ANGLES, DT
+
+# Seconds to wait for a control reply before reusing the last one (like TORCS)
+REPLY_TIMEOUT = 1.0
+# Order of the fields in a sensor message (see info/car_state_example.json)
+SENSOR_ORDER = (
+    'angle', 'curLapTime', 'damage', 'distFromStart', 'distRaced', 'fuel',
+    'gear', 'lastLapTime', 'opponents', 'racePos', 'rpm', 'speedX', 'speedY',
+    'speedZ', 'track', 'trackPos', 'wheelSpinVel', 'z', 'focus', 'x', 'y',
+    'roll', 'pitch', 'yaw', 'speedGlobalX', 'speedGlobalY',
+)
+
+_INIT = re.compile(rb'^(\S*?)\(init([^)]*)\)')
+_CONTROL = re.compile(rb'\((\w+) ([^)]*)\)')
+
+
+def encode_sensors(sensors):
+    """Sensor dict -> NUL-terminated scr_server message bytes."""
+    parts = []
+    for key in SENSOR_ORDER:
+        value = sensors[key]
+        if hasattr(value, '__len__'):
+            text = ' '.join('%.6g' % v for v in value)
+        else:
+            text = '%.6g' % value
+        parts.append('(%s %s)' % (key, text))
+    return ''.join(parts).encode() + b'\x00'
+
+
+def pack_sensors(sensors):
+    """Sensor dict -> binary sensor frame (car_state.SENSOR_FRAME) for the shared-memory transport."""
+    numbers = [sensors[key] for key in SCALAR_FIELDS]
+    for key, size in VECTOR_FIELDS.items():
+        vector = sensors[key]
+        if len(vector) != size:
+            raise ValueError(f"{key} has {len(vector)} values, the binary frame holds {size}")
+        numbers.extend(vector)
+    return SENSOR_FRAME.pack(SENSOR_FRAME_KIND, *numbers)
+
+
+def decode_control(message, previous):
+    """Control reply bytes -> dict; fields missing from the reply keep their previous value."""
+    control = dict(previous)
+    for key, value in _CONTROL.findall(message):
+        try:
+            control[key.decode()] = float(value)
+        except ValueError:
+            pass
+    return control
+
+
+def decode_control_frame(message, previous):
+    """Binary control frame (control_command.CONTROL_FRAME) -> dict; anything else is read as text."""
+    if len(message) != CONTROL_FRAME.size or message[:1] != CONTROL_FRAME_KIND:
+        return decode_control(message, previous)
+    _, gear, meta, accel, brake, steer = CONTROL_FRAME.unpack(message)
+    return dict(previous, accel=accel, brake=brake, gear=gear, steer=steer, meta=meta)
+
+
+def parse_init(message):
+    """Range finder angles of an 'SCR(init a1 a2 ...)' request, or None if it is not one."""
+    match = _INIT.match(message.strip(b' \x00\r\n'))
+    if match is None:
+        return None
+    angles = [float(a) for a in match.group(2).split()]
+    return angles or list(DEFAULT_ANGLES)
+
+
+class RaceStats:
+    def __init__(self):
+        self.ticks = 0
+        self.timeouts = 0
+        self.laps = 0
+        self.recoveries = 0
+        self.elapsed = 0.0
+
+    @property
+    def ticks_per_second(self):
+        return self.ticks / self.elapsed if self.elapsed > 0 else 0.0
+
+    def summary(self):
+        laps_per_minute = self.laps / self.elapsed * 60.0 if self.elapsed > 0 else 0.0
+        return (
+            f"{self.ticks} ticks in {self.elapsed:.2f}s ({self.ticks_per_second:.0f} ticks/s, "
+            f"{self.ticks * DT / max(self.elapsed, 1e-9):.0f}x real time), "
+            f"{self.laps} laps ({laps_per_minute:.1f}/min), {self.recoveries} off-track recoveries, "
+            f"{self.timeouts} reply timeouts"
+        )
+
+
+class SimServer:
+    """
+    One simulated scr_server port. For each race: wait for SCR(init ...),
+    answer ***identified***, then alternate sensor message -> control reply
+    until `laps` laps (or `max_ticks` ticks) are done, and end with
+    ***restart*** (more races to go) or ***shutdown***.
+
+    With `shm` (a file path), the port is served through a shared-memory
+    ring (transports.ShmChannel) with binary sensor and control frames
+    instead of a UDP socket.
+    """
+
+    def __init__(self, track, host='localhost', port=3001, laps=1, races=1,
+                 max_ticks=None, reply_timeout=REPLY_TIMEOUT, shm=None):
+        self.track = get_track(track) if isinstance(track, str) else track
+        self.host = host
+        self.port = port
+        self.laps = laps
+        self.races = races
+        self.max_ticks = max_ticks
+        self.reply_timeout = reply_timeout
+        self.car = CarModel(self.track)
+        self.stats = []
+        self.sock = None
+        self.shm = shm
+        self.encode_sensors = pack_sensors if shm else encode_sensors
+        self.decode_control = decode_control_frame if shm else decode_control
+
+    def serve(self):
+        if self.shm:
+            channel = ShmChannel(self.shm, create=True)
+            self.sock = ShmEndpoint(channel, channel.to_server, channel.to_client)
+            where = self.shm
+        else:
+            self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            self.sock.bind((self.host, self.port))
+            where = f"{self.host}:{self.port}"
+        logger.info(f"[sim {self.port}] Waiting for a client on {where}, track '{self.track.name}' "
+                    f"({self.track.length:.0f} m)")
+        try:
+            for race in range(1, self.races + 1):
+                address = self.wait_for_init()
+                stats = self.run_race(address)
+                self.stats.append(stats)
+                logger.info(f"[sim {self.port}] Race {race}/{self.races}: {stats.summary()}")
+                notice = b'***restart***' if race < self.races else b'***shutdown***'
+                self.sock.sendto(notice, address)
+        finally:
+            self.sock.close()
+        return self.stats
+
+    def wait_for_init(self):
+        self.sock.settimeout(None)
+        while True:
+            message, address = self.sock.recvfrom(1024)
+            angles = parse_init(message)
+            if angles is not None:
+                self.identify(address, angles)
+                return address
+
+    def identify(self, address, angles):
+        self.car.set_angles(angles)
+        self.car.reset()
+        self.sock.sendto(b'***identified***', address)
+
+    def run_race(self, address):
+        car = self.car
+        sock = self.sock
+        sock.settimeout(self.reply_timeout)
+        stats = RaceStats()
+        control = {'accel': 0.0, 'brake': 0.0, 'gear': 0, 'steer': 0.0, 'meta': 0}
+        max_ticks = self.max_ticks
+        start = time.perf_counter()
+
+        while car.laps < self.laps and (max_ticks is None or stats.ticks < max_ticks):
+            sock.sendto(self.encode_sensors(car.sensors()), address)
+            try:
+                message, sender = sock.recvfrom(1024)
+            except socket.timeout:
+                stats.timeouts += 1
+                message = None
+            if message is not None:
+                angles = parse_init(message)
+                if angles is not None:
+                    # the client (re)started mid-race: start over
+                    address = sender
+                    self.identify(address, angles)
+                    continue
+                control = self.decode_control(message, control)
+                if control.get('meta'):
+                    break  # the client asked for a restart
+            car.step(control)
+            stats.ticks += 1
+
+        stats.elapsed = time.perf_counter() - start
+        stats.laps = car.laps
+        stats.recoveries = car.recoveries
+        return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless scr_server stand-in.")
+    parser.add_argument('--host', default='localhost')
+    parser.add_argument('--port', type=int, default=3001, help="first port")
+    parser.add_argument('--cars', type=int, default=1, help="independent servers on port, port + 1, ...")
+    parser.add_argument('--track', default='oval', choices=sorted(TRACKS))
+    parser.add_argument('--laps', type=int, default=1)
+    parser.add_argument('--races', type=int, default=1)
+    parser.add_argument('--max-ticks', type=int, default=None, help="end each race after this many ticks")
+    parser.add_argument('--shm', action='store_true',
+                        help="serve each port through a shared-memory ring (transports.ring_path(port)) instead of UDP")
+    args = parser.parse_args()
+
+    servers = [
+        SimServer(args.track, args.host, args.port + i, args.laps, args.races, args.max_ticks,
+                  shm=ring_path(args.port + i) if args.shm else None)
+        for i in range(args.cars)
+    ]
+    threads = [threading.Thread(target=s.serve, daemon=True) for s in servers]
+    for t in threads:
+        t.start()
+    try:
+        for t in threads:
+            t.join()
+    except KeyboardInterrupt:
+        logger.info("User interrupted. Shutting down.")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,155 @@
+# track.py
+# Track geometries for the headless scr_server stand-in.
+#
+# A track is a closed centreline built from straights and circular arcs,
+# sampled every STEP meters into arrays (position, heading, curvature and
+# both edges) that the car model and the range finders index by distance.
+
+import math
+
+import numpy as np
+
+# Sampling step of the centreline, in meters
+STEP = 2.0
+# Default track width, in meters
+DEFAULT_WIDTH = 12.0
+
+
+class Straight:
+    def __init__(self, length):
+        self.length = float(length)
+
+    def curvature(self):
+        return 0.0
+
+
+class Arc:
+    """Circular arc; positive `angle` (degrees) turns left, negative turns right."""
+
+    def __init__(self, radius, angle):
+        self.radius = float(radius)
+        self.angle = float(angle)
+        self.length = self.radius * math.radians(abs(self.angle))
+
+    def curvature(self):
+        return math.copysign(1.0 / self.radius, self.angle)
+
+
+class Track:
+    """
+    Sampled closed track. Arrays are indexed by i = distFromStart // STEP:
+    `x`, `y`, `heading` (radians, counter-clockwise), `curvature` (1/m,
+    positive to the left) and the `left`/`right` edge points (N, 2).
+    """
+
+    def __init__(self, name, segments, width=DEFAULT_WIDTH, step=STEP):
+        self.name = name
+        self.segments = list(segments)
+        self.width = float(width)
+        self.step = float(step)
+
+        curvature = []
+        for segment in self.segments:
+            n = max(1, int(round(segment.length / self.step)))
+            # spread rounding over the segment so the total turn angle is exact
+            curvature.extend([segment.curvature() * segment.length / (n * self.step)] * n)
+        self.curvature = np.array(curvature)
+        self.size = len(self.curvature)
+        self.length = self.size * self.step
+
+        # integrate the centreline (heading at the start of each sample)
+        turn = self.curvature * self.step
+        self.heading = np.concatenate(([0.0], np.cumsum(turn)[:-1]))
+        mid = self.heading + turn / 2.0
+        chord = np.where(np.abs(turn) > 1e-12, np.sinc(turn / (2.0 * np.pi)), 1.0) * self.step
+        x = np.cumsum(chord * np.cos(mid))
+        y = np.cumsum(chord * np.sin(mid))
+        # segment lengths are rounded to whole samples: spread the small gap
+        # left at the finish line over the lap so the loop closes exactly
+        self.closing_error = math.hypot(x[-1], y[-1])
+        ramp = np.arange(1, self.size + 1) / self.size
+        x -= x[-1] * ramp
+        y -= y[-1] * ramp
+        self.x = np.concatenate(([0.0], x[:-1]))
+        self.y = np.concatenate(([0.0], y[:-1]))
+
+        normal = np.stack([-np.sin(self.heading), np.cos(self.heading)], axis=1)
+        centre = np.stack([self.x, self.y], axis=1)
+        self.left = centre + normal * (self.width / 2.0)
+        self.right = centre - normal * (self.width / 2.0)
+
+        # Edge segments as (x0, y0, dx, dy) x (left, right) x sample, with the
+        # start of the lap appended at the end so any window is a plain slice
+        edges = np.stack([self.left, self.right])  # (2, N, 2)
+        delta = np.roll(edges, -1, axis=1) - edges
+        table = np.stack([edges[..., 0], edges[..., 1], delta[..., 0], delta[..., 1]])  # (4, 2, N)
+        self._pad = self.size
+        self._edges = np.concatenate([table, table], axis=2)
+
+    def index(self, s):
+        return int(s // self.step) % self.size
+
+    def curvature_at(self, s):
+        return self.curvature[self.index(s)]
+
+    def pose(self, s, offset):
+        """Global (x, y, heading) of the point `offset` meters left of the centreline at s."""
+        i = self.index(s)
+        ds = s % self.length - i * self.step
+        heading = self.heading[i] + self.curvature[i] * ds
+        x = self.x[i] + ds * math.cos(heading) - offset * math.sin(heading)
+        y = self.y[i] + ds * math.sin(heading) + offset * math.cos(heading)
+        return x, y, heading
+
+    def edges(self, s, behind, ahead):
+        """
+        Edge segments between s - behind and s + ahead: a view of shape
+        (4, 2, M) holding x0, y0, dx, dy for the left and right edges.
+        """
+        lo = self.index(s) - int(behind // self.step) - 1
+        hi = lo + int((behind + ahead) // self.step) + 3
+        if lo < 0:
+            lo += self.size
+            hi += self.size
+        return self._edges[:, :, lo:min(hi, lo + self._pad)]
+
+
+def oval(straight=400.0, radius=100.0, width=DEFAULT_WIDTH):
+    return Track('oval', [
+        Straight(straight), Arc(radius, 180),
+        Straight(straight), Arc(radius, 180),
+    ], width)
+
+
+def _chicane(radius, angle):
+    # left, right, left: no net heading change and no net lateral offset
+    return [Arc(radius, angle), Arc(radius, -2 * angle), Arc(radius, angle)]
+
+
+def technical(width=DEFAULT_WIDTH):
+    """Oval-like loop with a chicane on each straight and tighter 90-degree corners."""
+    half = [Straight(250), *_chicane(40, 30), Straight(150), Arc(60, 90), Straight(40), Arc(30, 90)]
+    return Track('technical', half + half, width)
+
+
+def hairpin(straight=500.0, width=DEFAULT_WIDTH):
+    """Two long straights joined by a 15 m hairpin and two 10 m corners."""
+    return Track('hairpin', [
+        Straight(straight), Arc(15, 180),
+        Straight(straight), Arc(10, 90), Straight(10), Arc(10, 90),
+    ], width)
+
+
+# Geometries selectable by name (server --track); add yours here
+TRACKS = {
+    'oval': oval,
+    'technical': technical,
+    'hairpin': hairpin,
+}
+
+
+def get_track(name):
+    try:
+        return TRACKS[name]()
+    except KeyError:
+        raise ValueError(f"Unknown track {name!r}, expected one of {sorted(TRACKS)}")
@@ -0,0 +1,117 @@
+# centroid.py
+# Per-compute() cost and accuracy of the closed-form engine (Fuzzy/analytic.py).
+#
+#   python benchmarks/centroid.py [samples] [--seed 0]
+#
+# For each model of Fuzzy/rules.json, the same random inputs (gear_in drawn
+# as an integer gear) go through the skfuzzy simulation, the closed-form
+# engine and the compiled table. Reported: mean microseconds per compute()
+# and the speedup over skfuzzy, then the error of the closed-form outputs
+# against skfuzzy and against skfuzzy on a REFINE times finer output
+# universe. skfuzzy takes the centroid of the sampled output universe, so
+# its error is that of the sampling: it shrinks on the finer universe, while
+# the closed-form integral has none.
+
+import argparse
+import copy
+import logging
+import os
+import sys
+import time
+
+import numpy as np
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+
+from log import logger
+from Fuzzy import analytic as analytic_mod
+from Fuzzy import compiled as compiled_mod
+from Fuzzy import rulebase as rulebase_mod
+
+# Random input vectors per model
+SAMPLES = 500
+# Points of the reference output universe, relative to the file's
+REFINE = 50
+
+
+def _inputs(spec, samples, rng):
+    columns = []
+    for label, variable in spec['inputs'].items():
+        low, high, _ = variable['universe']
+        if label == 'gear_in':
+            columns.append(rng.integers(int(low), int(high) + 1, samples).astype(float))
+        else:
+            columns.append(rng.uniform(low, high, samples))
+    return list(zip(*columns))
+
+
+def _refined(spec):
+    spec = copy.deepcopy(spec)
+    for variable in spec['outputs'].values():
+        low, high, points = variable['universe']
+        variable['universe'] = [low, high, (int(points) - 1) * REFINE + 1]
+    return spec
+
+
+def _outputs(model, labels, rows):
+    """Outputs of every row ({label: value}, missing when no rule fired) and mean seconds per compute()."""
+    results = []
+    elapsed = 0.0
+    for row in rows:
+        for label, value in zip(labels, row):
+            model.input[label] = value
+        start = time.perf_counter()
+        try:
+            model.compute()
+            output = dict(model.output)
+        except ValueError:
+            output = {}  # skfuzzy raises when nothing fires (a crisp output can't be defuzzified)
+        elapsed += time.perf_counter() - start
+        results.append(output)
+    return results, elapsed / len(rows)
+
+
+def _errors(results, reference):
+    errors = []
+    mismatches = 0
+    for got, want in zip(results, reference):
+        if got.keys() != want.keys():
+            mismatches += 1
+            continue
+        errors += [abs(got[label] - want[label]) for label in want]
+    errors = np.array(errors or [0.0])
+    return errors.max(), errors.mean(), mismatches
+
+
+def main(samples=SAMPLES, seed=0):
+    logger.setLevel(logging.ERROR)
+    rng = np.random.default_rng(seed)
+    models = rulebase_mod.load()
+    print(f"{'model':<30} {'skfuzzy':>10} {'analytic':>10} {'compiled':>10} {'speedup':>8}"
+          f" {'max err':>9} {'mean err':>9} {'mismatch':>8} {'vs fine':>9}")
+    for name, spec in models.items():
+        analytic = analytic_mod.AnalyticSimulation(spec)
+        skfuzzy = rulebase_mod.build_simulation(spec)
+        fine = rulebase_mod.build_simulation(_refined(spec))
+        table = compiled_mod.compile_simulation(rulebase_mod.build_simulation(spec), validation_samples=0)
+        rows = _inputs(spec, samples, rng)
+
+        exact, analytic_time = _outputs(analytic, analytic.labels, rows)
+        sampled, skfuzzy_time = _outputs(skfuzzy, analytic.labels, rows)
+        reference, _ = _outputs(fine, analytic.labels, rows)
+        _, compiled_time = _outputs(table, analytic.labels, rows)
+
+        max_error, mean_error, mismatches = _errors(exact, sampled)
+        fine_error, _, _ = _errors(exact, reference)
+        print(f"{name:<30} {skfuzzy_time * 1e6:8.1f}us {analytic_time * 1e6:8.1f}us {compiled_time * 1e6:8.1f}us"
+              f" {skfuzzy_time / analytic_time:7.1f}x {max_error:9.2e} {mean_error:9.2e} {mismatches:8d}"
+              f" {fine_error:9.2e}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Closed-form centroid engine against skfuzzy.")
+    parser.add_argument('samples', type=int, nargs='?', default=SAMPLES)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    main(args.samples, args.seed)
@@ -0,0 +1,71 @@
+# startup.py
+# Time-to-first-command benchmark of TorcsDriver.
+#
+#   python benchmarks/startup.py [runs]
+#
+# Each run is a fresh interpreter that imports the driver, builds it and
+# answers the example sensor packet once. "cold" starts from an empty
+# compiled-controller cache (skfuzzy models are built, compiled and saved);
+# "warm" reuses the cache written by the cold run, so skfuzzy is never
+# imported. Reported: import, construction and first drive() times, the
+# wall time from process start to the first command, and whether skfuzzy
+# was loaded.
+
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+
+
+def child():
+    start = time.perf_counter()
+    from car_state import CarState
+    from torcs_driver import TorcsDriver
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    from transport import example_message
+    imported = time.perf_counter()
+
+    driver = TorcsDriver()
+    built = time.perf_counter()
+
+    driver.drive(CarState().parse(example_message()))
+    first = time.perf_counter()
+    print(json.dumps({
+        'import': imported - start,
+        'init': built - imported,
+        'first_drive': first - built,
+        'skfuzzy_loaded': 'skfuzzy' in sys.modules,
+    }))
+
+
+def run(cache_dir):
+    env = dict(os.environ, FUZZY_CACHE_DIR=cache_dir, LOG_LEVEL='WARNING')
+    start = time.perf_counter()
+    out = subprocess.run([sys.executable, os.path.abspath(__file__), '--child'], env=env,
+                         check=True, capture_output=True, text=True).stdout
+    wall = time.perf_counter() - start
+    result = json.loads(out.strip().splitlines()[-1])
+    result['wall'] = wall
+    return result
+
+
+def main(runs=3):
+    with tempfile.TemporaryDirectory() as cache_dir:
+        results = [('cold', run(cache_dir))]
+        results += [('warm', run(cache_dir)) for _ in range(runs)]
+    print(f"{'':>5} {'import':>8} {'init':>8} {'1st tick':>9} {'wall':>8}  skfuzzy")
+    for name, r in results:
+        print(f"{name:>5} {r['import'] * 1e3:7.1f}ms {r['init'] * 1e3:7.1f}ms {r['first_drive'] * 1e3:8.2f}ms "
+              f"{r['wall'] * 1e3:7.1f}ms  {'loaded' if r['skfuzzy_loaded'] else 'not loaded'}")
+
+
+if __name__ == '__main__':
+    if sys.argv[1:] == ['--child']:
+        child()
+    else:
+        main(int(sys.argv[1]) if len(sys.argv) > 1 else 3)
@@ -0,0 +1,272 @@
+# suite.py
+# Latency benchmarks of the parser, the controllers and full driver ticks.
+#
+#   python benchmarks/suite.py [--out results.json] [--baseline benchmarks/baseline.json]
+#                              [--update-baseline] [--repeat 5] [--skfuzzy | --analytic]
+#
+# Inputs are info/car_state_example.json plus four synthetic traces made
+# with the headless simulator (Simulator/): a straight at speed, the
+# approach to a hairpin, a standing start and dense traffic (a car catching
+# a pack of TRAFFIC_CARS slower ones). The traces are driven by a fixed
+# scripted controller (not TorcsDriver), so they stay the same when the
+# controllers change and results are comparable across commits.
+#
+# Every benchmark times each call and reports mean/p50/p99 in microseconds.
+# Results are written as JSON and compared with the baseline file; with
+# --threshold the script exits with 1 when a mean got slower than that.
+
+import argparse
+import json
+import logging
+import os
+import platform
+import sys
+import time
+
+import numpy as np
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+
+from torcs_client import TorcsClient
+from torcs_driver import TorcsDriver
+from Interpretation import features as features_mod
+from Interpretation import track as track_mod
+from Interpretation import intention as intention_mod
+from Interpretation import opponents as opponents_mod
+from Actions import accelaration as accel_mod
+from Actions import gear as gear_mod
+from Actions import steering as steering_mod
+from Simulator.car import CarModel, GEAR_RATIOS
+from Simulator.server import encode_sensors
+from Simulator.track import get_track
+from log import logger
+
+EXAMPLE = os.path.join(ROOT, 'info', 'car_state_example.json')
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+# Frames per synthetic trace
+TRACE_TICKS = 400
+# Cars in the pack of the traffic trace, and their speed (km/h)
+TRAFFIC_CARS = 12
+TRAFFIC_SPEED = 90.0
+# Passes over each trace (the first, untimed, warms caches up)
+REPEAT = 5
+
+
+def _scripted_control(sensors, target_speed):
+    """Simple fixed controller used to drive the synthetic traces."""
+    steer = sensors['angle'] - sensors['trackPos'] * 0.5
+    speed = sensors['speedX']
+    accel = min(max((target_speed - speed) / 20.0, 0.0), 1.0)
+    brake = min(max((speed - target_speed) / 20.0, 0.0), 1.0)
+    gear = int(sensors['gear']) or 1
+    if sensors['rpm'] > 8500 and gear < max(GEAR_RATIOS):
+        gear += 1
+    elif sensors['rpm'] < 3000 and gear > 1:
+        gear -= 1
+    return {'accel': accel, 'brake': brake, 'gear': gear, 'steer': steer}
+
+
+def _trace(track, s, speed, gear, target_speed, ticks=TRACE_TICKS, traffic=0):
+    car = CarModel(get_track(track))
+    car.s, car.v, car.gear = s, speed, gear
+    # the pack: three abreast, 15 m between rows, starting 20 m ahead
+    others = []
+    for i in range(traffic):
+        other = CarModel(car.track)
+        other.s, other.d, other.v, other.gear = s + 20.0 + 15.0 * (i // 3), 3.0 * (i % 3 - 1), speed * 0.6, gear
+        others.append(other)
+    frames = []
+    for _ in range(ticks):
+        sensors = car.sensors(others)
+        frames.append(sensors)
+        car.step(_scripted_control(sensors, target_speed))
+        for other in others:
+            other.step(_scripted_control(other.sensors(), TRAFFIC_SPEED))
+    return frames
+
+
+def traces():
+    """{name: [sensor dicts]}: example packet, straight, hairpin approach, launch and traffic."""
+    with open(EXAMPLE) as f:
+        example = {k: np.asarray(v, dtype=float) if isinstance(v, list) else float(v) for k, v in json.load(f).items()}
+    return {
+        'example': [example],
+        'straight': _trace('oval', 20.0, 40.0, 4, 150.0),
+        'hairpin': _trace('hairpin', 420.0, 25.0, 3, 60.0),
+        'launch': _trace('oval', 0.0, 0.0, 1, 200.0),
+        'traffic': _trace('oval', 20.0, 40.0, 4, 150.0, traffic=TRAFFIC_CARS),
+    }
+
+
+def _stats(samples):
+    samples = np.asarray(samples) * 1e6
+    return {
+        'calls': int(len(samples)),
+        'mean_us': float(samples.mean()),
+        'p50_us': float(np.percentile(samples, 50)),
+        'p99_us': float(np.percentile(samples, 99)),
+    }
+
+
+def _time_calls(call, frames, repeat, prepare=None):
+    """Times call(frame) for every frame, `repeat` passes after one warm-up pass."""
+    samples = []
+    clock = time.perf_counter
+    for n in range(repeat + 1):
+        for i, frame in enumerate(frames):
+            if prepare is not None:
+                prepare(i)
+            start = clock()
+            call(frame)
+            elapsed = clock() - start
+            if n:
+                samples.append(elapsed)
+    return samples
+
+
+def _driver_states(driver_args, frames):
+    """Driver state before each model stage, from a reference run over the trace."""
+    driver = TorcsDriver(**driver_args)
+    states = []
+    for sensors in frames:
+        before = (driver.tick + 1, driver.gear, driver.steering)
+        driver.drive(sensors)
+        states.append(before + (driver._last_classification, driver._last_severity, driver._last_intention))
+    return states
+
+
+def run(repeat=REPEAT, compiled=True, analytic=False):
+    all_traces = traces()
+    messages = {name: [encode_sensors(_complete(f)) for f in frames] for name, frames in all_traces.items()}
+    # models measured without incremental evaluation: this is the compute() cost
+    driver_args = {'compiled': compiled, 'analytic': analytic, 'incremental': False}
+    client = TorcsClient(driver=TorcsDriver(**driver_args))
+    results = {}
+
+    def add(name, trace, samples):
+        results[f"{name}[{trace}]"] = dict(_stats(samples), benchmark=name, trace=trace)
+
+    for trace, frames in all_traces.items():
+        add('parse_server_message', trace, _time_calls(client.parse_server_message, messages[trace], repeat))
+        controls = [_scripted_control(_complete(f), 100.0) for f in frames]
+        add('format_control_command', trace, _time_calls(client.format_control_command, controls, repeat))
+        add('estimate_distance_to_turn', trace,
+            _time_calls(lambda f: features_mod.estimate_distance_to_turn(f['track'], f['angle']), frames, repeat))
+        add('track_features', trace,
+            _time_calls(lambda f: features_mod.extract(f['track'], f['angle']), frames, repeat))
+        # the tracker keeps the previous frame: start each pass from a fresh one
+        tracker = opponents_mod.OpponentTracker()
+        add('opponents', trace, _time_calls(tracker.update, frames, repeat,
+                                            lambda i: tracker.reset() if i == 0 else None))
+
+        driver = TorcsDriver(**driver_args)
+        states = _driver_states(driver_args, frames)
+
+        def prepare(i):
+            driver.tick, driver.gear, driver.steering, cls, sev, intention = states[i]
+            # features of the timed frame are computed before the stages, as in drive()
+            driver.features = features_mod.extract(frames[i]['track'], frames[i]['angle'], driver.tick)
+            driver._last_classification, driver._last_severity, driver._last_intention = cls, sev, intention
+            driver._last_gear_change_tick = -gear_mod.MIN_TICKS
+
+        stages = {
+            'turn_classifier': lambda f: track_mod.turn_classifier_controller(driver, f),
+            'intention': lambda f: intention_mod.intention_interpreter(driver, f),
+            'accel_brake': lambda f: accel_mod.accel_brake_controller(driver, f),
+            'gear': lambda f: gear_mod.gear_controller(driver, f),
+            'steering': lambda f: steering_mod.steering_controller(driver, f),
+        }
+        for stage, call in stages.items():
+            add(stage, trace, _time_calls(call, frames, repeat, prepare))
+
+        # full ticks as in a race: a fresh default driver (incremental evaluation on) per pass
+        samples = []
+        for n in range(repeat + 1):
+            driver = TorcsDriver(compiled=compiled, analytic=analytic)
+            for sensors in frames:
+                start = time.perf_counter()
+                driver.drive(sensors)
+                if n:
+                    samples.append(time.perf_counter() - start)
+        add('drive', trace, samples)
+    return results
+
+
+def _complete(sensors):
+    """The example packet lacks some fields the encoder needs: fill them like the simulator."""
+    if 'speedGlobalX' in sensors:
+        return sensors
+    filled = dict(sensors)
+    for key in ('speedGlobalX', 'speedGlobalY', 'x', 'y', 'roll', 'pitch', 'yaw'):
+        filled.setdefault(key, 0.0)
+    return filled
+
+
+def metadata():
+    return {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'machine': platform.machine(),
+        'processor': platform.processor(),
+    }
+
+
+def compare(results, baseline, threshold=None):
+    """Prints mean latency vs the baseline; returns the benchmarks slower than `threshold` (fraction)."""
+    regressions = []
+    width = max(len(name) for name in results)
+    print(f"{'benchmark':<{width}} {'mean':>10} {'p99':>10} {'baseline':>10} {'change':>8}")
+    for name, r in results.items():
+        base = baseline.get(name)
+        line = f"{name:<{width}} {r['mean_us']:9.2f}us {r['p99_us']:9.2f}us"
+        if base is not None:
+            change = r['mean_us'] / base['mean_us'] - 1.0 if base['mean_us'] > 0 else 0.0
+            line += f" {base['mean_us']:9.2f}us {change:+7.1%}"
+            if threshold is not None and change > threshold:
+                regressions.append(name)
+                line += '  SLOWER'
+        print(line)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Latency benchmarks of the parser, controllers and driver.")
+    parser.add_argument('--out', default=None, help="write the results as JSON")
+    parser.add_argument('--baseline', default=BASELINE, help="results to compare with")
+    parser.add_argument('--update-baseline', action='store_true', help="store these results as the baseline")
+    parser.add_argument('--threshold', type=float, default=None,
+                        help="exit with 1 if a mean is slower than the baseline by more than this fraction")
+    parser.add_argument('--repeat', type=int, default=REPEAT)
+    engine = parser.add_mutually_exclusive_group()
+    engine.add_argument('--skfuzzy', action='store_true', help="benchmark the skfuzzy models instead of compiled tables")
+    engine.add_argument('--analytic', action='store_true',
+                        help="benchmark the closed-form engine (Fuzzy/analytic.py) instead of compiled tables")
+    args = parser.parse_args()
+
+    # the example packet is off track (every range finder -1): the controllers
+    # warn on each call, which would only flood the output
+    logger.setLevel(logging.ERROR)
+    results = run(args.repeat, compiled=not args.skfuzzy, analytic=args.analytic)
+    document = {'meta': dict(metadata(), compiled=not args.skfuzzy, analytic=args.analytic, repeat=args.repeat),
+                'results': results}
+
+    baseline = {}
+    if os.path.exists(args.baseline) and not args.update_baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)['results']
+    regressions = compare(results, baseline, args.threshold)
+
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump(document, f, indent=2)
+    if args.update_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(document, f, indent=2)
+        print(f"baseline written to {args.baseline}")
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,169 @@
+# transport.py
+# Parse/format round-trip benchmark of the client transport path.
+#
+#   python benchmarks/transport.py [frames]
+#
+# A loopback "server" socket sends the example sensor packet, the client
+# side receives it, parses it, formats a reply and sends it back. The
+# legacy path (recvfrom + decode + token parser + f-string + encode +
+# sendto) is compared with the current one (connected socket, recv_into a
+# reusable buffer, in-place CarState.parse, table-based encoder) and with
+# the shared-memory transport (transports.py: the same frame as a binary
+# SENSOR_FRAME through a ShmChannel, CarState.unpack, CONTROL_FRAME reply).
+# Both ends run in this thread, so the figures are the per-frame cost of
+# each path without any waiting, i.e. the ceiling on ticks per second.
+
+import json
+import os
+import socket
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from car_state import CarState
+from control_command import encode_control_command, encode_control_frame
+
+EXAMPLE = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'info', 'car_state_example.json')
+
+
+def example_message():
+    with open(EXAMPLE) as f:
+        sensors = json.load(f)
+    return ''.join(
+        f"({k} {' '.join(str(v) for v in value) if isinstance(value, list) else value})"
+        for k, value in sensors.items()
+    ).encode()
+
+
+def legacy_parse(message):
+    """The original TorcsClient.parse_server_message, kept as the baseline."""
+    state = {}
+    parts = message.strip().replace(')(', ' ').replace('(', '').replace(')', '').split()
+    i = 0
+    while i < len(parts):
+        key = parts[i]
+        if i + 1 < len(parts) and not parts[i + 1].isalpha():
+            values = []
+            i += 1
+            while i < len(parts) and not parts[i].isalpha():
+                try:
+                    values.append(float(parts[i]))
+                except ValueError:
+                    break
+                i += 1
+            state[key] = values[0] if len(values) == 1 else values
+        else:
+            i += 1
+    return state
+
+
+CONTROL = {'accel': 0.41234567, 'brake': 0.0, 'gear': 3, 'steer': -0.1234567}
+
+
+def run_legacy(server, client, address, message, frames):
+    start = time.perf_counter()
+    for _ in range(frames):
+        server.sendto(message, client.getsockname())
+        data, _ = client.recvfrom(1024)
+        legacy_parse(data.decode())
+        c = CONTROL
+        command = f"(accel {c['accel']})(brake {c['brake']})(gear {c['gear']})(steer {c['steer']})"
+        client.sendto(command.encode(), address)
+        server.recv(1024)
+    return time.perf_counter() - start
+
+
+def run_current(server, client, address, message, frames):
+    client.connect(address)
+    buffer = bytearray(4096)
+    state = CarState()
+    start = time.perf_counter()
+    for _ in range(frames):
+        server.sendto(message, client.getsockname())
+        length = client.recv_into(buffer)
+        state.parse(buffer, length)
+        client.send(encode_control_command(CONTROL))
+        server.recv(1024)
+    return time.perf_counter() - start
+
+
+def example_frame():
+    """The example packet as a binary sensor frame (the simulator's field sizes)."""
+    # imported here: benchmarks/startup.py times importing this module for example_message()
+    from Simulator.server import pack_sensors
+
+    state = CarState().parse(example_message())
+    sensors = {key: state.get(key, 0.0) for key in state.keys()}
+    for key in ('speedGlobalX', 'speedGlobalY'):
+        sensors.setdefault(key, 0.0)
+    return pack_sensors(sensors)
+
+
+def run_shm(server, client, frame, frames):
+    from Simulator.server import decode_control_frame
+
+    buffer = bytearray(4096)
+    state = CarState()
+    control = {}
+    start = time.perf_counter()
+    for _ in range(frames):
+        server.sendto(frame)
+        length = client.recv_into(buffer)
+        state.unpack(buffer, length)
+        client.send(encode_control_frame(CONTROL))
+        control = decode_control_frame(server.recvfrom(1024)[0], control)
+    return time.perf_counter() - start
+
+
+def main(frames=20000):
+    from transports import ShmChannel, ShmEndpoint, ring_path
+
+    message = example_message()
+    results = {}
+    for name, run in (('legacy', run_legacy), ('current', run_current)):
+        server = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        server.bind(('127.0.0.1', 0))
+        client = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        client.bind(('127.0.0.1', 0))
+        try:
+            results[name] = run(server, client, server.getsockname(), message, frames) / frames * 1e6
+        finally:
+            server.close()
+            client.close()
+
+    path = ring_path(f"bench-{os.getpid()}", tempfile.gettempdir() if not os.path.isdir('/dev/shm') else '/dev/shm')
+    channel = ShmChannel(path, create=True)
+    try:
+        server = ShmEndpoint(channel, channel.to_server, channel.to_client)
+        client = ShmEndpoint(channel, channel.to_client, channel.to_server)
+        results['shared memory'] = run_shm(server, client, example_frame(), frames) / frames * 1e6
+    finally:
+        channel.close()
+
+    # the same work without the sockets: pure parse + format cost
+    state = CarState()
+    start = time.perf_counter()
+    for _ in range(frames):
+        legacy_parse(message.decode())
+        f"(accel {CONTROL['accel']})(brake {CONTROL['brake']})(gear {CONTROL['gear']})(steer {CONTROL['steer']})".encode()
+    results['legacy (no io)'] = (time.perf_counter() - start) / frames * 1e6
+    start = time.perf_counter()
+    for _ in range(frames):
+        state.parse(message)
+        encode_control_command(CONTROL)
+    results['current (no io)'] = (time.perf_counter() - start) / frames * 1e6
+    frame = example_frame()
+    start = time.perf_counter()
+    for _ in range(frames):
+        state.unpack(frame)
+        encode_control_frame(CONTROL)
+    results['binary (no io)'] = (time.perf_counter() - start) / frames * 1e6
+
+    for name, us in results.items():
+        print(f"{name:>16}: {us:8.2f} us/frame ({1e6 / us:9.0f} frames/s)")
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20000)
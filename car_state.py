@@ -0,0 +1,245 @@
+# car_state.py
+# Fixed-schema, single-pass parser for scr_server sensor messages.
+
+import re
+import struct
+from operator import itemgetter
+
+import numpy as np
+
+# Scalar sensors sent by scr_server (see info/car_state_example.json)
+SCALAR_FIELDS = (
+    'angle', 'curLapTime', 'damage', 'distFromStart', 'distRaced', 'fuel',
+    'gear', 'lastLapTime', 'racePos', 'rpm', 'speedX', 'speedY', 'speedZ',
+    'trackPos', 'z', 'x', 'y', 'roll', 'pitch', 'yaw', 'speedGlobalX',
+    'speedGlobalY',
+)
+
+# Vector sensors and their default sizes
+VECTOR_FIELDS = {
+    'track': 19,
+    'opponents': 36,
+    'focus': 5,
+    'wheelSpinVel': 4,
+}
+
+
+# Fixed binary sensor frame of the shared-memory transport (transports.py):
+# b'S', 7 pad bytes, then little-endian doubles, the SCALAR_FIELDS followed
+# by each vector of VECTOR_FIELDS at its default size, in that order
+SENSOR_FRAME_KIND = b'S'
+SENSOR_FRAME = struct.Struct('<c7x%dd' % (len(SCALAR_FIELDS) + sum(VECTOR_FIELDS.values())))
+
+
+class CarState:
+    """
+    Reusable car state filled in place by parse().
+
+    Scalars live in one preallocated list (`values`, positions in `index`)
+    and are exposed as attributes (`state.speedX`). Vector sensors are
+    preallocated NumPy arrays overwritten on every packet, so copy them if
+    you need to keep a frame. The object also behaves like the dict returned
+    by the old parser: `sensors.get('speedX', 0.0)` and `sensors['track']`
+    keep working. Keys outside the known schema are kept in a side dict.
+    """
+    __slots__ = ('values', 'index', 'track', 'opponents', 'focus', 'wheelSpinVel', '_extra', '_layout')
+
+    def __init__(self):
+        self.values = []
+        self.index = {}
+        for name, size in VECTOR_FIELDS.items():
+            setattr(self, name, np.zeros(size))
+        self._extra = {}
+        self._layout = None
+
+    # --- dict-compatible view ---
+    def get(self, key, default=None):
+        i = self.index.get(key)
+        if i is not None:
+            return self.values[i]
+        if key in VECTOR_FIELDS:
+            return getattr(self, key)
+        return self._extra.get(key, default)
+
+    def __getitem__(self, key):
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def __contains__(self, key):
+        return key in self.index or key in VECTOR_FIELDS or key in self._extra
+
+    def keys(self):
+        return list(self.index) + list(VECTOR_FIELDS) + list(self._extra)
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self):
+        return len(self.index) + len(VECTOR_FIELDS) + len(self._extra)
+
+    def items(self):
+        return [(k, self[k]) for k in self.keys()]
+
+    def to_dict(self):
+        """Detached copy (vectors as lists), same shape as the old parser output."""
+        return {k: (v.tolist() if isinstance(v, np.ndarray) else v) for k, v in self.items()}
+
+    # --- parsing ---
+    def parse(self, message, length=None):
+        """
+        Decodes a sensor message, e.g. b'(angle -0.0015)(track 1.2 3.4 ...)...',
+        into this object and returns it. Accepts bytes, str or a reusable
+        receive buffer (bytearray) together with the datagram `length`, in
+        which case the buffer is matched in place without copying it.
+
+        The key order of the first packet is compiled into a single regex,
+        so later packets are matched in one pass in C; all scalars are
+        converted by one map() into the preallocated list, and vector
+        sensors are only rewritten when their raw text changed. If the
+        layout ever changes, the generic path runs and relearns it.
+        """
+        if isinstance(message, str):
+            message = message.encode()
+        start, end = 0, len(message) if length is None else length
+        while end > start and message[end - 1] in _PADDING:
+            end -= 1
+        while start < end and message[start] in _PADDING:
+            start += 1
+
+        layout = self._layout
+        if layout is not None:
+            match = layout.pattern.fullmatch(message, start, end)
+            if match is not None:
+                groups = match.groups()
+                raw = layout.raw
+                try:
+                    # a scalar field that arrives with several values fails float() here
+                    self.values[:] = map(float, layout.scalar_groups(groups))
+                    for i, group, vector in layout.vectors:
+                        text = groups[group]
+                        if text != raw[i]:
+                            vector[:] = text.split()
+                            raw[i] = text
+                    return self
+                except ValueError:
+                    pass  # a vector sensor changed size, or a scalar became a list
+
+        self._parse_generic(bytes(message[start:end]))
+        return self
+
+    def load(self, scalars, vectors):
+        """
+        Fills the state from already decoded numbers instead of a message
+        (e.g. a telemetry record): `scalars` in SCALAR_FIELDS order and
+        `vectors` a dict name -> sequence. NaN scalars (fields that were
+        absent from the original message) are left out, like parse() does.
+        """
+        if any(v != v for v in scalars):
+            names = [name for name, v in zip(SCALAR_FIELDS, scalars) if v == v]
+            self.values = [v for v in scalars if v == v]
+            self.index = {name: i for i, name in enumerate(names)}
+        else:
+            self.values = list(scalars)
+            self.index = _SCHEMA_INDEX
+        for name, vector in vectors.items():
+            current = getattr(self, name)
+            if len(current) == len(vector):
+                current[:] = vector
+            else:
+                setattr(self, name, np.array(vector, dtype=float))
+        self._layout = None
+        return self
+
+    def unpack(self, frame, length=None):
+        """
+        Fills the state from a binary sensor frame (SENSOR_FRAME), e.g. a
+        receive buffer of the shared-memory transport, and returns it. No
+        text is involved: the doubles are copied straight into the scalar
+        list and the vector arrays.
+        """
+        if (len(frame) if length is None else length) < SENSOR_FRAME.size or frame[0] != SENSOR_FRAME_KIND[0]:
+            raise ValueError("not a binary sensor frame")
+        numbers = np.frombuffer(frame, '<f8', _FRAME_NUMBERS, _FRAME_OFFSET)
+        self.values = numbers[:len(SCALAR_FIELDS)].tolist()
+        self.index = _SCHEMA_INDEX
+        for name, start, stop in _FRAME_VECTORS:
+            vector = getattr(self, name)
+            if len(vector) != stop - start:
+                vector = np.zeros(stop - start)
+                setattr(self, name, vector)
+            vector[:] = numbers[start:stop]
+        self._layout = None
+        return self
+
+    def _parse_generic(self, message):
+        keys = []
+        values = []
+        index = {}
+        cacheable = True
+        for part in message[1:-1].split(b')('):
+            if not part:
+                continue
+            key, _, rest = part.partition(b' ')
+            name = key.decode()
+            numbers = [float(v) for v in rest.split()]
+            keys.append((key, name, len(numbers)))
+            if name in VECTOR_FIELDS:
+                vector = getattr(self, name)
+                if len(vector) != len(numbers):
+                    vector = np.zeros(len(numbers))
+                    setattr(self, name, vector)
+                vector[:] = numbers
+            elif len(numbers) == 1:
+                index[name] = len(values)
+                values.append(numbers[0])
+            elif numbers:
+                # unexpected list field: keep it, but don't cache a layout we can't fast-path
+                self._extra[name] = numbers
+                cacheable = False
+        self.values = values
+        self.index = index
+        self._layout = _Layout(self, keys) if cacheable else None
+
+
+class _Layout:
+    """Compiled key order of a sensor message (see CarState.parse)."""
+    __slots__ = ('pattern', 'scalar_groups', 'vectors', 'raw')
+
+    def __init__(self, state, keys):
+        self.pattern = re.compile(b''.join(rb'\(' + re.escape(key) + rb' ?([^)]*)\)' for key, _, _ in keys))
+        scalars = [i for i, (_, name, count) in enumerate(keys) if count == 1 and name not in VECTOR_FIELDS]
+        if len(scalars) == 1:
+            # itemgetter with a single index returns the item itself, not a tuple
+            self.scalar_groups = lambda groups: (groups[scalars[0]],)
+        else:
+            self.scalar_groups = itemgetter(*scalars) if scalars else (lambda groups: ())
+        vectors = [(i, name) for i, (_, name, _) in enumerate(keys) if name in VECTOR_FIELDS]
+        self.vectors = tuple((n, i, getattr(state, name)) for n, (i, name) in enumerate(vectors))
+        self.raw = [None] * len(self.vectors)
+
+
+_MISSING = object()
+_SCHEMA_INDEX = {name: i for i, name in enumerate(SCALAR_FIELDS)}
+# Doubles of a SENSOR_FRAME, where they start (after the kind byte and padding) and each vector's slice
+_FRAME_NUMBERS = len(SCALAR_FIELDS) + sum(VECTOR_FIELDS.values())
+_FRAME_OFFSET = SENSOR_FRAME.size - 8 * _FRAME_NUMBERS
+_FRAME_VECTORS = []
+_start = len(SCALAR_FIELDS)
+for _name, _size in VECTOR_FIELDS.items():
+    _FRAME_VECTORS.append((_name, _start, _start + _size))
+    _start += _size
+# Bytes ignored around a message (scr_server NUL-terminates its datagrams)
+_PADDING = frozenset(b' \x00\r\n')
+
+
+def _scalar_property(name):
+    def getter(self):
+        i = self.index.get(name)
+        return None if i is None else self.values[i]
+    return property(getter)
+
+
+for _name in SCALAR_FIELDS:
+    setattr(CarState, _name, _scalar_property(_name))
@@ -0,0 +1,60 @@
+# control_command.py
+# Fast encoder for the control reply sent to scr_server.
+
+import struct
+
+# accel/brake/steer are sent with 4 decimals; every value in [-1, 1] is
+# preformatted once so encoding a command is a table lookup per field.
+FLOAT_SCALE = 10000
+_FLOATS = tuple(('%.4f' % (i / FLOAT_SCALE)).encode() for i in range(-FLOAT_SCALE, FLOAT_SCALE + 1))
+_GEARS = {gear: b'%d' % gear for gear in range(-1, 8)}
+
+COMMAND_TEMPLATE = b'(accel %s)(brake %s)(gear %s)(steer %s)'
+
+
+def format_float(value):
+    """Bytes for a control value, quantized to 1e-4 and clipped to [-1, 1]."""
+    try:
+        i = int(value * FLOAT_SCALE + (FLOAT_SCALE + 0.5))
+    except (ValueError, OverflowError):  # NaN / inf
+        return b'0.0000'
+    if i < 0:
+        i = 0
+    elif i > 2 * FLOAT_SCALE:
+        i = 2 * FLOAT_SCALE
+    return _FLOATS[i]
+
+
+def encode_control_command(car_control):
+    """
+    Encodes {'accel', 'brake', 'gear', 'steer'} into the bytes sent to the
+    server, e.g. b'(accel 0.4000)(brake 0.0000)(gear 3)(steer -0.1235)'.
+    """
+    gear = car_control['gear']
+    return COMMAND_TEMPLATE % (
+        format_float(car_control['accel']),
+        format_float(car_control['brake']),
+        _GEARS.get(gear) or b'%d' % gear,
+        format_float(car_control['steer']),
+    )
+
+
+# Fixed binary control frame of the shared-memory transport (transports.py):
+# b'C', 3 pad bytes, gear and meta (int32), then accel, brake, steer (double)
+CONTROL_FRAME_KIND = b'C'
+CONTROL_FRAME = struct.Struct('<c3xiiddd')
+
+
+def _clip(value):
+    # same range as the text reply; NaN / inf become 0 like format_float does
+    if value != value or value in (float('inf'), float('-inf')):
+        return 0.0
+    return -1.0 if value < -1.0 else 1.0 if value > 1.0 else float(value)
+
+
+def encode_control_frame(car_control):
+    """Encodes {'accel', 'brake', 'gear', 'steer'} into a CONTROL_FRAME (no text, no rounding)."""
+    return CONTROL_FRAME.pack(
+        CONTROL_FRAME_KIND, int(car_control['gear']), int(car_control.get('meta', 0)),
+        _clip(car_control['accel']), _clip(car_control['brake']), _clip(car_control['steer']),
+    )
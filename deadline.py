@@ -0,0 +1,106 @@
+# deadline.py
+# Per-tick time budget for the control loop.
+#
+# scr_server waits a fixed time for each control reply; a reply that comes
+# later is not applied to that game tick. TickBudget tracks how much of the
+# budget is left while a tick is processed and tells the driver when a stage
+# should be replaced by its cheap fallback (see TorcsDriver.drive), and
+# counts the deadlines that were missed anyway and which stage missed them.
+
+import time
+
+# Seconds from receiving the sensors to sending the reply (scr_server's UDP timeout is 10 ms)
+TICK_BUDGET = 0.010
+# Seconds kept for the stages after the driver (format and send)
+RESERVE = 0.0005
+# Weight of the newest sample in each stage's running cost estimate
+ALPHA = 0.1
+
+
+class TickBudget:
+    """
+    Call start() when the sensors arrive, done(stage) after each stage and
+    finish() once the reply is sent. allow(stage) says whether the stage's
+    estimated cost (a moving average of its previous full runs) still fits
+    before the deadline, minus `reserve`; when it does not, the stage is
+    counted as a fallback and the caller uses its cheap alternative (and
+    the estimate decays, so the stage is tried again later).
+
+    A tick whose reply went out after the deadline is a missed deadline,
+    attributed to the stage that was running when the deadline passed.
+    """
+
+    def __init__(self, budget=TICK_BUDGET, reserve=RESERVE, alpha=ALPHA):
+        self.budget = budget
+        self.reserve = reserve
+        self.alpha = alpha
+        self.estimates = {}
+        self.ticks = 0
+        self.degraded = 0
+        self.missed = 0
+        self.missed_by_stage = {}
+        self.fallbacks = {}
+        self._deadline = 0.0
+        self._mark = 0.0
+        self._crossed = None
+        self._fell_back = False
+
+    def start(self, now=None, arrived=None):
+        """New tick at `now`; the budget runs from `arrived` (when the sensors came in) if given."""
+        now = time.perf_counter() if now is None else now
+        self._deadline = (now if arrived is None else arrived) + self.budget
+        self._mark = now
+        self._crossed = None
+        self._fell_back = False
+
+    def remaining(self):
+        return self._deadline - time.perf_counter()
+
+    def allow(self, stage):
+        estimate = self.estimates.get(stage, 0.0)
+        if time.perf_counter() + estimate + self.reserve <= self._deadline:
+            return True
+        self.fallbacks[stage] = self.fallbacks.get(stage, 0) + 1
+        self._fell_back = True
+        # the estimate only learns from full runs: let it decay while skipped,
+        # so one slow run (e.g. the first call) does not disable the stage for good
+        self.estimates[stage] = estimate * (1.0 - self.alpha)
+        return False
+
+    def done(self, stage, ran=True):
+        """Ends `stage`; only full runs (ran=True) update its cost estimate."""
+        now = time.perf_counter()
+        if ran:
+            cost = now - self._mark
+            estimate = self.estimates.get(stage)
+            self.estimates[stage] = cost if estimate is None else estimate + self.alpha * (cost - estimate)
+        if self._crossed is None and now > self._deadline:
+            self._crossed = stage
+        self._mark = now
+
+    def finish(self):
+        self.ticks += 1
+        if self._fell_back:
+            self.degraded += 1
+        if self._crossed is not None:
+            self.missed += 1
+            self.missed_by_stage[self._crossed] = self.missed_by_stage.get(self._crossed, 0) + 1
+
+    def snapshot(self):
+        return {
+            'ticks': self.ticks,
+            'degraded': self.degraded,
+            'missed': self.missed,
+            'missed_by_stage': dict(self.missed_by_stage),
+            'fallbacks': dict(self.fallbacks),
+        }
+
+    def summary(self):
+        ticks = max(self.ticks, 1)
+        missed = ' '.join(f"{stage}={n}" for stage, n in self.missed_by_stage.items()) or '-'
+        fallbacks = ' '.join(f"{stage}={n}" for stage, n in self.fallbacks.items()) or '-'
+        return (
+            f"budget {self.budget * 1e3:.1f}ms: {self.missed}/{self.ticks} missed "
+            f"({self.missed / ticks:.2%}) by stage: {missed} | "
+            f"{self.degraded} degraded ticks, fallbacks: {fallbacks}"
+        )
@@ -1,22 +1,185 @@
+import atexit
+import gzip
 import logging
+import logging.handlers
+import os
+import multiprocessing
+from multiprocessing import util as multiprocessing_util
+import queue
+import shutil
 import sys
 
+# Configuration (environment variables):
+#   LOG_LEVEL      minimum level recorded, default INFO (DEBUG logs every tick)
+#   LOG_MODE       'queue' (default): the control loop only enqueues records and a
+#                  background thread formats and writes them; 'sync' writes inline
+#   LOG_SAMPLING   per-module sampling, e.g. "steering=0.01,gear=0.1": keep that
+#                  fraction of each module's records below WARNING
+#   LOG_MAX_BYTES  app.log size that triggers a rotation (rotated files are gzipped)
+#   LOG_BACKUPS    rotated files kept
+# Worker processes (torcs_fleet, replay) write app-<pid>.log instead: two
+# RotatingFileHandlers on one file would both rotate it and lose records.
+LOG_FILE = "app.log"
+LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO").upper()
+LOG_MODE = os.environ.get("LOG_MODE", "queue")
+LOG_MAX_BYTES = int(os.environ.get("LOG_MAX_BYTES", 10 * 1024 * 1024))
+LOG_BACKUPS = int(os.environ.get("LOG_BACKUPS", 5))
+
 # Create logger
 logger = logging.getLogger("my_app")
-logger.setLevel(logging.DEBUG)  # Minimum level to capture
+logger.setLevel(LOG_LEVEL)  # Minimum level to capture
 
 # Formatter (shared for both handlers)
 formatter = logging.Formatter("%(asctime)s - %(levelname)s - %(message)s")
 
-# File handler
-file_handler = logging.FileHandler("app.log", mode="a")
-file_handler.setFormatter(formatter)
+
+def _gzip_namer(name):
+    return name + ".gz"
+
+
+def _gzip_rotator(source, dest):
+    with open(source, "rb") as f_in, gzip.open(dest, "wb") as f_out:
+        shutil.copyfileobj(f_in, f_out)
+    os.remove(source)
+
+
+def process_log_file(pid=None):
+    """app-<pid>.log: the file of a worker process."""
+    root, ext = os.path.splitext(LOG_FILE)
+    return f"{root}-{pid or os.getpid()}{ext}"
+
+
+def _file_handler(path, delay=False):
+    # rotates by size, older files compressed (app.log.1.gz, ...)
+    handler = logging.handlers.RotatingFileHandler(path, mode="a", maxBytes=LOG_MAX_BYTES,
+                                                   backupCount=LOG_BACKUPS, delay=delay)
+    handler.namer = _gzip_namer
+    handler.rotator = _gzip_rotator
+    handler.setFormatter(formatter)
+    return handler
+
+
+# File handler (a spawned worker imports this module again, already named, and
+# gets its own file too)
+if multiprocessing.current_process().name == "MainProcess":
+    file_handler = _file_handler(LOG_FILE)
+else:
+    file_handler = _file_handler(process_log_file(), delay=True)
 
 # Stdout handler
 stream_handler = logging.StreamHandler(sys.stdout)
 stream_handler.setFormatter(formatter)
 
+
+class SamplingFilter(logging.Filter):
+    """
+    Keeps 1 in round(1 / rate) records of each configured module (the
+    source file name, e.g. 'steering'). WARNING and above always pass.
+    Deterministic: a counter per module, no randomness.
+    """
+
+    def __init__(self, rates=None):
+        super().__init__()
+        self.every = {}
+        self.seen = {}
+        for module, rate in (rates or {}).items():
+            self.set_rate(module, rate)
+
+    def set_rate(self, module, rate):
+        if rate >= 1.0:
+            self.every.pop(module, None)
+        else:
+            self.every[module] = max(1, round(1.0 / rate)) if rate > 0 else 0
+
+    def filter(self, record):
+        every = self.every.get(record.module)
+        if every is None or record.levelno >= logging.WARNING:
+            return True
+        if every == 0:
+            return False
+        n = self.seen.get(record.module, 0)
+        self.seen[record.module] = n + 1
+        return n % every == 0
+
+
+def _parse_sampling(spec):
+    rates = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        module, _, rate = item.partition("=")
+        rates[module.strip()] = float(rate)
+    return rates
+
+
+sampling_filter = SamplingFilter(_parse_sampling(os.environ.get("LOG_SAMPLING", "")))
+
+
+def set_sampling(module, rate):
+    """Keep only `rate` (0..1) of `module`'s records below WARNING."""
+    sampling_filter.set_rate(module, rate)
+
+
+class _DeferredQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler that leaves all formatting to the listener thread: the
+    record (message template + args) is enqueued as is, so the caller
+    only pays for creating it. Pass values, not objects mutated later.
+    """
+
+    def prepare(self, record):
+        return record
+
+
+queue_handler = None
+listener = None
+
+
+def _use_process_file():
+    """In a forked child: leaves the parent's file to the parent and writes app-<pid>.log."""
+    global file_handler
+    # delay: a child that never logs leaves no file
+    inherited, file_handler = file_handler, _file_handler(process_log_file(), delay=True)
+    if inherited in logger.handlers:  # LOG_MODE=sync
+        file_handler.addFilter(sampling_filter)
+        logger.removeHandler(inherited)
+        logger.addHandler(file_handler)
+    inherited.close()
+
+
+def _start_listener():
+    """(Re)creates the queue and its listener thread (also in forked children)."""
+    global listener
+    queue_handler.queue = queue.SimpleQueue()
+    listener = logging.handlers.QueueListener(queue_handler.queue, file_handler, stream_handler,
+                                              respect_handler_level=True)
+    listener.start()
+
+
+def _stop_listener():
+    if listener is not None:
+        listener.stop()  # drains what is left in the queue
+
+
+def _drain_at_process_exit(handler):
+    # multiprocessing children leave through os._exit (no atexit): drain on
+    # their exit path instead
+    multiprocessing_util.Finalize(None, _stop_listener, exitpriority=0)
+
+
 # Avoid adding handlers multiple times if this file is imported repeatedly
 if not logger.hasHandlers():
-    logger.addHandler(file_handler)
-    logger.addHandler(stream_handler)
\ No newline at end of file
+    # runs before the listener restart below (fork hooks run in registration order)
+    os.register_at_fork(after_in_child=_use_process_file)
+    if LOG_MODE == "queue":
+        queue_handler = _DeferredQueueHandler(queue.SimpleQueue())
+        queue_handler.addFilter(sampling_filter)
+        logger.addHandler(queue_handler)
+        _start_listener()
+        atexit.register(_stop_listener)
+        # a forked worker (torcs_fleet, replay) does not inherit the listener thread
+        os.register_at_fork(after_in_child=_start_listener)
+        multiprocessing_util.register_after_fork(queue_handler, _drain_at_process_exit)
+    else:
+        file_handler.addFilter(sampling_filter)
+        stream_handler.addFilter(sampling_filter)
+        logger.addHandler(file_handler)
+        logger.addHandler(stream_handler)
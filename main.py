@@ -1,7 +1,14 @@
+import sys
+
 from torcs_client import TorcsClient
+from transports import ShmTransport, ring_path
+import profiler
 
 if __name__ == '__main__':
     # Create a client and start the driving loop
-    client = TorcsClient()
+    # (kill -USR1 <pid> captures a sampling profile of the live race, see profiler.py;
+    # --shm drives the headless simulator through its shared-memory ring instead of UDP)
+    transport = ShmTransport(ring_path(3001)) if '--shm' in sys.argv[1:] else None
+    client = TorcsClient(profiler=profiler.install(), transport=transport)
     client.connect()
     client.drive_loop()
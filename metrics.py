@@ -0,0 +1,200 @@
+# metrics.py
+# Latency bookkeeping for the control loop.
+
+import bisect
+import http.server
+import threading
+import time
+import urllib.parse
+from collections import deque
+
+# Histogram bucket upper bounds: 10 per decade from 1us to 1s (~26% wide)
+BUCKET_BOUNDS = tuple(1e-6 * 10 ** (i / 10) for i in range(61))
+
+
+class LatencyStats:
+    """Per-car tick latency (receive -> reply sent), in seconds."""
+
+    def __init__(self, window=4096):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.recent = deque(maxlen=window)
+
+    def add(self, seconds):
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+        self.recent.append(seconds)
+
+    def percentile(self, q):
+        if not self.recent:
+            return 0.0
+        ordered = sorted(self.recent)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    def summary(self):
+        mean = self.total / self.count if self.count else 0.0
+        return (
+            f"ticks={self.count} mean={mean * 1e6:.0f}us "
+            f"p50={self.percentile(0.5) * 1e6:.0f}us p99={self.percentile(0.99) * 1e6:.0f}us "
+            f"max={self.max * 1e6:.0f}us"
+        )
+
+    def snapshot(self):
+        """Plain-dict copy, cheap to send to another process."""
+        return {
+            'count': self.count,
+            'total': self.total,
+            'max': self.max,
+            'p50': self.percentile(0.5),
+            'p99': self.percentile(0.99),
+        }
+
+
+class LatencyHistogram:
+    """
+    Fixed-bucket latency histogram (seconds). add() is a bisect and an
+    increment, so it can run on every tick; percentiles are interpolated
+    inside the buckets, so they are accurate to a fraction of a bucket.
+    """
+    __slots__ = ('counts', 'count', 'total', 'max')
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKET_BOUNDS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, seconds):
+        self.counts[bisect.bisect_left(BUCKET_BOUNDS, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def merge(self, other):
+        for i, n in enumerate(other.counts):
+            self.counts[i] += n
+        self.count += other.count
+        self.total += other.total
+        self.max = max(self.max, other.max)
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else 0.0
+
+    def percentile(self, q):
+        if not self.count:
+            return 0.0
+        target = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            if n and seen + n >= target:
+                # interpolate linearly inside the bucket
+                lower = BUCKET_BOUNDS[i - 1] if i > 0 else 0.0
+                upper = BUCKET_BOUNDS[i] if i < len(BUCKET_BOUNDS) else self.max
+                return min(lower + (upper - lower) * (target - seen) / n, self.max)
+            seen += n
+        return self.max
+
+    def summary(self):
+        return (
+            f"n={self.count} mean={self.mean * 1e6:.1f}us p50={self.percentile(0.5) * 1e6:.1f}us "
+            f"p99={self.percentile(0.99) * 1e6:.1f}us max={self.max * 1e6:.1f}us"
+        )
+
+
+class StageTimer:
+    """
+    Per-stage latency histograms for a tick. Call start() at the beginning
+    of the tick and lap(stage) after each stage; each lap measures the time
+    since the previous mark. Stages are reported in first-seen order.
+    The readers below iterate a copy of `stages`, so a metrics thread can
+    call them while the control loop is still adding stages.
+    """
+
+    def __init__(self):
+        self.stages = {}
+        self._mark = 0.0
+
+    def start(self):
+        self._mark = time.perf_counter()
+
+    def lap(self, stage):
+        now = time.perf_counter()
+        histogram = self.stages.get(stage)
+        if histogram is None:
+            histogram = self.stages[stage] = LatencyHistogram()
+        histogram.add(now - self._mark)
+        self._mark = now
+
+    def merge(self, other):
+        for stage, histogram in other.items():
+            self.stages.setdefault(stage, LatencyHistogram()).merge(histogram)
+
+    def items(self):
+        return list(self.stages.items())
+
+    def means(self):
+        return {stage: h.mean for stage, h in self.items()}
+
+    def summary(self):
+        return ' '.join(f"{stage}={h.mean * 1e6:.1f}us" for stage, h in self.items())
+
+    def report(self):
+        """One line per stage: count, mean, p50, p99, max."""
+        items = self.items()
+        width = max((len(stage) for stage, _ in items), default=0)
+        return '\n'.join(f"{stage:<{width}} {h.summary()}" for stage, h in items)
+
+
+class MetricsServer:
+    """
+    Serves `render()` as text/plain on http://host:port/ from a daemon
+    thread (e.g. curl localhost:9001), for watching a live race.
+    `commands` maps other paths to callables taking the query string as a
+    dict and returning the text to answer (e.g. {'/profile': ...}).
+    A ValueError answers 400 and any other exception 500, so a failing
+    render never just drops the connection.
+    """
+
+    def __init__(self, render, port, host='127.0.0.1', commands=None):
+        commands = commands or {}
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def do_GET(self):
+                url = urllib.parse.urlsplit(self.path)
+                command = commands.get(url.path)
+                status = 200
+                try:
+                    if command is not None:
+                        body = command(dict(urllib.parse.parse_qsl(url.query)))
+                    else:
+                        body = render()
+                except ValueError as e:
+                    status, body = 400, f"{e}\n"
+                except Exception as e:
+                    status, body = 500, f"{type(e).__name__}: {e}\n"
+                body = body.encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'text/plain; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass  # keep request lines out of the race log
+
+        self.httpd = http.server.ThreadingHTTPServer((host, port), Handler)
+        self.httpd.daemon_threads = True
+        self.thread = threading.Thread(target=self.httpd.serve_forever, name=f"metrics-{port}", daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
@@ -0,0 +1,225 @@
+# profiler.py
+# On-demand sampling profiler for live races.
+#
+# Nothing runs until a capture is requested: no trace hook, no thread, no
+# timer. A capture (SIGUSR1, or GET /profile on the metrics port) arms a
+# SIGALRM interval timer: every `interval` seconds the handler records the
+# frame the main thread was interrupted in and the current stacks of the
+# other threads (sys._current_frames()). Taking the samples in the signal
+# handler, rather than on a sampling thread, matters: a thread only gets the
+# GIL when the running one blocks, so its samples all land in recv or
+# Condition.wait and miss the work in between. Samples are wall-clock: a
+# control thread waiting for the next frame shows up as waiting in
+# FrameMailbox.take. The files are written on a short-lived thread after the
+# capture, off the control loop.
+#
+# Each capture writes two files to PROFILE_DIR:
+#   profile-<pid>-<time>.collapsed  one 'thread;outer;...;inner count' line per
+#                                   stack, for flamegraph.pl / speedscope / inferno
+#   profile-<pid>-<time>.txt        inclusive/self totals of TorcsDriver.drive and the
+#                                   Actions, Interpretation and Fuzzy functions
+#
+#   kill -USR1 <pid>                              # PROFILE_SECONDS (10 s) capture
+#   curl 'localhost:9001/profile?seconds=5'       # with TorcsClient(metrics_port=9001)
+
+import os
+import signal
+import sys
+import threading
+import time
+from collections import Counter
+
+from log import logger
+
+# Seconds captured per request (PROFILE_SECONDS overrides)
+PROFILE_SECONDS = float(os.environ.get('PROFILE_SECONDS', 10.0))
+# Seconds between two samples
+SAMPLE_INTERVAL = 0.002
+# Where the captures are written (PROFILE_DIR overrides)
+PROFILE_DIR = os.environ.get('PROFILE_DIR', 'profiles')
+# Functions listed in the per-function totals (substrings of the frame labels)
+FOCUS = ('TorcsDriver.drive', 'Actions/', 'Interpretation/', 'Fuzzy/')
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+
+def _label(code):
+    """'Actions/gear.py:gear_controller' for repository files, 'threading.py:Condition.wait' otherwise."""
+    path = os.path.abspath(code.co_filename)
+    if path.startswith(ROOT + os.sep):
+        path = os.path.relpath(path, ROOT).replace(os.sep, '/')
+    else:
+        path = os.path.basename(path)
+    # co_qualname ('TorcsDriver.drive') is Python 3.11+; older versions only have the bare name
+    return f"{path}:{getattr(code, 'co_qualname', code.co_name)}"
+
+
+def totals(stacks):
+    """{function: (inclusive samples, self samples)} from {collapsed stack: samples}."""
+    inclusive = Counter()
+    own = Counter()
+    for stack, count in stacks.items():
+        frames = stack.split(';')[1:]  # the first entry is the thread name
+        for function in set(frames):
+            inclusive[function] += count
+        if frames:
+            own[frames[-1]] += count
+    return {function: (inclusive[function], own[function]) for function in inclusive}
+
+
+class SamplingProfiler:
+    """
+    Samples the stacks of every thread (or only `threads`, a set of idents)
+    while a capture runs. The SIGALRM handler has to be set from the main
+    thread (install() does it); after that start() can come from any
+    thread, e.g. the metrics server's, and returns False while a capture is
+    already running. `last` keeps the paths and sample count of the last
+    capture for the metrics report.
+    """
+
+    def __init__(self, interval=SAMPLE_INTERVAL, directory=None, threads=None):
+        self.interval = interval
+        self.directory = directory or PROFILE_DIR
+        self.threads = threads
+        self.captures = 0
+        self.last = None
+        self.active = False
+        self._armed = False
+        self._stacks = Counter()
+        self._rounds = 0
+        self._start = self._end = 0.0
+        self._writer = None
+
+    def arm(self):
+        """Sets the SIGALRM handler (main thread only); the timer stays off until start()."""
+        if not hasattr(signal, 'setitimer'):
+            raise RuntimeError("sampling needs signal.setitimer (not available on this platform)")
+        signal.signal(signal.SIGALRM, self._sample)
+        self._armed = True
+
+    def start(self, seconds=PROFILE_SECONDS):
+        if self.active:
+            return False
+        if not self._armed:
+            if threading.current_thread() is not threading.main_thread():
+                raise RuntimeError("call profiler.install() from the main thread before capturing")
+            self.arm()
+        logger.info(f"Profiling for {seconds:.1f}s (sample every {self.interval * 1e3:.1f}ms)")
+        self._stacks = Counter()
+        self._rounds = 0
+        self._start = time.perf_counter()
+        self._end = self._start + seconds
+        self.active = True
+        signal.setitimer(signal.ITIMER_REAL, self.interval, self.interval)
+        return True
+
+    def stop(self):
+        """Ends the running capture early and waits for its files."""
+        if self.active:
+            self._finish()
+        if self._writer is not None:
+            self._writer.join()
+
+    def _sample(self, signum, frame):
+        if not self.active:
+            return
+        main = threading.main_thread().ident
+        for ident, current in sys._current_frames().items():
+            if self.threads is not None and ident not in self.threads:
+                continue
+            # the main thread is running this handler: use the frame it was interrupted in
+            if ident == main:
+                current = frame
+            codes = []
+            while current is not None:
+                codes.append(current.f_code)
+                current = current.f_back
+            self._stacks[ident, tuple(codes)] += 1
+        current = None
+        self._rounds += 1
+        if time.perf_counter() >= self._end:
+            self._finish()
+
+    def _finish(self):
+        signal.setitimer(signal.ITIMER_REAL, 0.0)
+        self.active = False
+        elapsed = time.perf_counter() - self._start
+        names = {t.ident: t.name for t in threading.enumerate()}
+        self._writer = threading.Thread(target=self._save, args=(self._stacks, self._rounds, elapsed, names),
+                                        name='profiler-writer', daemon=True)
+        self._writer.start()
+
+    def _save(self, samples, rounds, elapsed, names):
+        labels = {}
+        stacks = Counter()
+        for (ident, codes), count in samples.items():
+            for code in codes:
+                if code not in labels:
+                    labels[code] = _label(code)
+            frames = [labels[code] for code in reversed(codes)]
+            stacks[';'.join([names.get(ident, str(ident))] + frames)] += count
+        try:
+            self.last = self._write(stacks, rounds, elapsed)
+        except OSError as e:
+            logger.error(f"Could not write the profile to {self.directory}: {e}")
+            return
+        self.captures += 1
+        logger.info(f"Profile written to {self.last['collapsed']} and {self.last['report']}")
+
+    def _write(self, stacks, rounds, elapsed):
+        os.makedirs(self.directory, exist_ok=True)
+        base = os.path.join(self.directory, f"profile-{os.getpid()}-{time.strftime('%Y%m%d-%H%M%S')}")
+        with open(base + '.collapsed', 'w') as f:
+            for stack, count in sorted(stacks.items()):
+                f.write(f"{stack} {count}\n")
+        with open(base + '.txt', 'w') as f:
+            f.write(self.report(stacks, rounds, elapsed))
+        return {'collapsed': base + '.collapsed', 'report': base + '.txt', 'rounds': rounds, 'elapsed': elapsed}
+
+    def report(self, stacks, rounds, elapsed):
+        """Per-function totals of the focus functions, as a share of the capture's wall time."""
+        per_round = elapsed / rounds if rounds else 0.0
+        lines = [
+            f"{rounds} samples over {elapsed:.2f}s ({per_round * 1e3:.2f}ms apart); "
+            f"% of wall time, summed over threads",
+            f"{'inclusive':>9} {'self':>7} {'incl ms':>9}  function",
+        ]
+        focused = [(function, counts) for function, counts in totals(stacks).items()
+                   if any(focus in function for focus in FOCUS)]
+        for function, (inclusive, own) in sorted(focused, key=lambda item: -item[1][0]):
+            lines.append(f"{inclusive / rounds:9.1%} {own / rounds:7.1%} {inclusive * per_round * 1e3:9.1f}  {function}")
+        return '\n'.join(lines) + '\n'
+
+    def summary(self):
+        if self.active:
+            return "capturing"
+        if self.last is None:
+            return "idle"
+        return f"captures={self.captures} last {self.last['collapsed']} ({self.last['rounds']} samples)"
+
+    def command(self, query):
+        """GET /profile?seconds=N on the metrics server."""
+        seconds = float(query.get('seconds', PROFILE_SECONDS))
+        try:
+            started = self.start(seconds)
+        except RuntimeError as e:
+            return f"{e}\n"
+        if not started:
+            return "a capture is already running\n"
+        return f"profiling for {seconds:.1f}s, files go to {os.path.abspath(self.directory)}\n"
+
+
+def install(profiler=None, signum=getattr(signal, 'SIGUSR1', None), seconds=PROFILE_SECONDS):
+    """
+    Sets up `profiler` (a new SamplingProfiler by default) and starts a
+    `seconds` capture whenever the process gets `signum`. Call from the
+    main thread. Without SIGUSR1/SIGALRM (Windows) it is returned unarmed
+    and captures report that they are unavailable.
+    """
+    profiler = profiler if profiler is not None else SamplingProfiler()
+    if not hasattr(signal, 'setitimer'):
+        return profiler
+    profiler.arm()
+    if signum is not None:
+        signal.signal(signum, lambda *_: profiler.start(seconds))
+    return profiler
@@ -0,0 +1,267 @@
+# receiver.py
+# Receiving thread, latest-frame mailbox and reply watchdog for the control loop.
+#
+# scr_server sends a sensor datagram every game tick whether or not the
+# previous reply has arrived. A loop that receives, drives and sends in
+# sequence falls behind after one slow tick: the datagrams queue up in the
+# kernel buffer and every later decision is made on an older frame.
+# Receiver drains the socket on its own thread into a FrameMailbox that
+# keeps only the newest frame (the ones it replaces are counted as
+# dropped), so the control thread always decides on the freshest state.
+# Server notices ('***identified***', '***restart***', ...) are queued and
+# never dropped. Watchdog resends the last command when no reply went out
+# within the budget after a frame arrived, so a slow tick repeats the
+# previous control instead of leaving the server without one. The server
+# reads one datagram per tick, so the slow tick's own reply is then dropped
+# (Watchdog.send): sent anyway, it would stay queued and every later control
+# would be applied one tick late.
+
+import socket
+import threading
+import time
+from collections import deque
+
+from log import logger
+
+# Size of each receive buffer (sensor datagrams are < 1 KiB)
+RECV_BUFFER_SIZE = 4096
+# Seconds the threads block before checking whether they should stop
+POLL_INTERVAL = 0.2
+# Seconds kept before the tick budget runs out for the watchdog's resend to reach the server
+WATCHDOG_MARGIN = 0.001
+
+
+class Frame:
+    """
+    One datagram: `data[:length]` with its arrival time (perf_counter) and
+    sequence number, or a server notice (`notice`, str) for the latter.
+    """
+    __slots__ = ('data', 'length', 'received', 'seq', 'notice')
+
+    def __init__(self, data=None, length=0, received=0.0, seq=0, notice=None):
+        self.data = data
+        self.length = length
+        self.received = received
+        self.seq = seq
+        self.notice = notice
+
+
+class FrameMailbox:
+    """
+    Single-slot mailbox between the receiving thread and the control thread.
+
+    put() leaves a frame for the control thread, replacing the one still
+    waiting there (counted in `dropped`); put_notice() queues a notice.
+    take() blocks until something is waiting and returns notices first,
+    then the newest frame; None once the mailbox is closed and empty.
+
+    Frames carry receive buffers from a small pool: the receiver gets one
+    with buffer(), and the control thread gives it back with release()
+    once the frame is parsed. A dropped frame's buffer goes back directly.
+    """
+
+    def __init__(self, buffer_size=RECV_BUFFER_SIZE, buffers=3):
+        self.cond = threading.Condition()
+        self.buffer_size = buffer_size
+        self._free = [bytearray(buffer_size) for _ in range(buffers)]
+        self._frame = None
+        self._notices = deque()
+        self.closed = False
+        self.seq = 0
+        self.last_received = 0.0
+        self.received = 0
+        self.dropped = 0
+
+    def buffer(self):
+        with self.cond:
+            if self._free:
+                return self._free.pop()
+        return bytearray(self.buffer_size)
+
+    def release(self, frame):
+        if frame.data is not None:
+            with self.cond:
+                self._free.append(frame.data)
+            frame.data = None
+
+    def put(self, data, length, received=None):
+        received = time.perf_counter() if received is None else received
+        with self.cond:
+            self.seq += 1
+            self.received += 1
+            self.last_received = received
+            if self._frame is not None:
+                self.dropped += 1
+                self._free.append(self._frame.data)
+            self._frame = Frame(data, length, received, self.seq)
+            self.cond.notify_all()
+
+    def put_notice(self, message):
+        with self.cond:
+            self._notices.append(Frame(received=time.perf_counter(), notice=message))
+            self.cond.notify_all()
+
+    def discard(self):
+        """Drops the frame still waiting, e.g. the last one of a race that just ended."""
+        with self.cond:
+            if self._frame is not None:
+                self._free.append(self._frame.data)
+                self._frame = None
+
+    def close(self):
+        with self.cond:
+            self.closed = True
+            self.cond.notify_all()
+
+    def take(self, timeout=None):
+        """Next notice or the newest frame; None on timeout or once closed and empty."""
+        end = None if timeout is None else time.perf_counter() + timeout
+        with self.cond:
+            while True:
+                if self._notices:
+                    return self._notices.popleft()
+                if self._frame is not None:
+                    frame, self._frame = self._frame, None
+                    return frame
+                if self.closed:
+                    return None
+                # short waits keep the control thread responsive to Ctrl+C
+                wait = POLL_INTERVAL if end is None else min(POLL_INTERVAL, end - time.perf_counter())
+                if wait <= 0.0:
+                    return None
+                self.cond.wait(wait)
+
+    def snapshot(self):
+        return {'received': self.received, 'dropped': self.dropped}
+
+
+class Receiver:
+    """
+    Daemon thread that reads `sock` into `mailbox` until stop(). Notices
+    (datagrams starting with '*') are queued as text. `on_refused` is called
+    (on this thread) when nothing listens on the server port yet, e.g. to
+    resend the init request; any other socket error closes the mailbox.
+    """
+
+    def __init__(self, sock, mailbox, on_refused=None, name='receiver'):
+        self.sock = sock
+        self.mailbox = mailbox
+        self.on_refused = on_refused
+        self.error = None
+        self._stop = threading.Event()
+        self.thread = threading.Thread(target=self._run, name=name, daemon=True)
+
+    def start(self):
+        self.sock.settimeout(POLL_INTERVAL)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self.thread.join()
+
+    def _run(self):
+        mailbox = self.mailbox
+        recv_into = self.sock.recv_into
+        clock = time.perf_counter
+        buffer = mailbox.buffer()
+        try:
+            while not self._stop.is_set():
+                try:
+                    length = recv_into(buffer)
+                except socket.timeout:
+                    continue
+                except ConnectionRefusedError:
+                    if self.on_refused is not None:
+                        self.on_refused()
+                    continue
+                received = clock()
+                if length and buffer[0] == ord('*'):
+                    mailbox.put_notice(bytes(buffer[:length]).strip(b' \x00\r\n').decode())
+                    continue
+                mailbox.put(buffer, length, received)
+                buffer = mailbox.buffer()
+        except OSError as e:
+            if not self._stop.is_set():
+                self.error = e
+                logger.error(f"Socket error: {e}")
+        finally:
+            mailbox.close()
+
+
+class Watchdog:
+    """
+    Daemon thread that resends the last command for a frame that got no
+    reply within `budget` seconds of arriving. The control thread sends
+    through send(command, seq), which drops (and counts in `late`) a reply
+    to a frame the watchdog already answered. A newer frame supersedes the
+    one being watched (the server has moved on to it).
+    """
+
+    def __init__(self, sock, mailbox, budget, name='watchdog'):
+        self.sock = sock
+        self.mailbox = mailbox
+        self.budget = budget
+        self.resent = 0
+        self.late = 0
+        self._command = None
+        self._replied = 0.0
+        # sequence number of the last frame answered by a resend
+        self._answered = 0
+        self._stop = False
+        self.thread = threading.Thread(target=self._run, name=name, daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        with self.mailbox.cond:
+            self._stop = True
+            self.mailbox.cond.notify_all()
+        self.thread.join()
+
+    def send(self, command, seq):
+        """
+        Sends the control thread's reply to frame `seq` and returns True, or
+        returns False if a resend already answered it (or a newer frame).
+        """
+        with self.mailbox.cond:
+            if self._answered >= seq:
+                self.late += 1
+                return False
+            self.sock.send(command)
+            self._command = command
+            self._replied = time.perf_counter()
+        return True
+
+    def forget(self):
+        """Stops resending the last command (it belongs to a race that ended)."""
+        with self.mailbox.cond:
+            self._command = None
+
+    def _run(self):
+        mailbox = self.mailbox
+        cond = mailbox.cond
+        watched = 0
+        with cond:
+            while not self._stop and not mailbox.closed:
+                if mailbox.seq == watched:
+                    cond.wait(POLL_INTERVAL)
+                    continue
+                watched = mailbox.seq
+                deadline = mailbox.last_received + self.budget
+                # wait for a reply sent after the frame arrived, a newer frame or the deadline
+                while not self._stop and mailbox.seq == watched and self._replied < mailbox.last_received:
+                    remaining = deadline - time.perf_counter()
+                    if remaining <= 0.0:
+                        if self._command is not None:
+                            try:
+                                self.sock.send(self._command)
+                            except OSError:
+                                return
+                            self.resent += 1
+                            self._answered = watched
+                            self._replied = time.perf_counter()
+                        break
+                    cond.wait(remaining)
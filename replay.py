@@ -0,0 +1,220 @@
+# replay.py
+# Offline replay of telemetry recordings through TorcsDriver.drive.
+#
+#   python replay.py telemetry/*.tel [--processes 4] [--skfuzzy] [--json out.json]
+#
+# Each recording (one race) is streamed from disk in chunks, fed frame by
+# frame to a driver and the produced controls are compared with the
+# recorded ones. The races of one recording session run in order on one
+# driver, with TorcsDriver.init() in between as in the client, and a race
+# that started with a closed track map starts from the map saved with it:
+# state carried over from earlier races changes the controls. Reports frames/s and the driver's per-stage timings, so
+# controller versions can be compared on identical input. Exits with 1
+# when a control differs from the recording by more than --tolerance.
+
+import argparse
+import json
+import multiprocessing
+import sys
+import time
+
+import numpy as np
+
+from car_state import CarState, SCALAR_FIELDS, VECTOR_FIELDS
+from metrics import StageTimer
+from telemetry import open_recording, read_meta, track_map_path
+from torcs_driver import TorcsDriver
+from log import logger
+
+# Frames read from disk at a time
+CHUNK_SIZE = 4096
+# Largest difference still counted as "same control"
+TOLERANCE = 1e-9
+CONTROL_FIELDS = ('accel', 'brake', 'gear', 'steer')
+
+
+def iter_chunks(path, chunk_size=CHUNK_SIZE):
+    """Yields consecutive in-memory slices of a recording, `chunk_size` frames each."""
+    frames = open_recording(path)
+    for lo in range(0, len(frames), chunk_size):
+        yield np.array(frames[lo:lo + chunk_size])
+
+
+class ReplayResult:
+    def __init__(self, path):
+        self.path = path
+        self.frames = 0
+        self.elapsed = 0.0
+        self.timer = StageTimer()
+        # per control field: max abs difference, frames over tolerance, first such tick
+        self.diffs = {field: {'max': 0.0, 'count': 0, 'first_tick': None} for field in CONTROL_FIELDS}
+
+    @property
+    def frames_per_second(self):
+        return self.frames / self.elapsed if self.elapsed > 0 else 0.0
+
+    @property
+    def mismatches(self):
+        return sum(d['count'] for d in self.diffs.values())
+
+    def merge(self, other):
+        self.frames += other.frames
+        self.elapsed += other.elapsed
+        self.timer.merge(other.timer)
+        for field, diff in other.diffs.items():
+            mine = self.diffs[field]
+            mine['max'] = max(mine['max'], diff['max'])
+            mine['count'] += diff['count']
+            if mine['first_tick'] is None:
+                mine['first_tick'] = diff['first_tick']
+
+    def to_dict(self):
+        return {
+            'path': self.path,
+            'frames': self.frames,
+            'elapsed': self.elapsed,
+            'frames_per_second': self.frames_per_second,
+            'stages_us': {stage: mean * 1e6 for stage, mean in self.timer.means().items()},
+            'diffs': self.diffs,
+        }
+
+    def summary(self):
+        diffs = ' '.join(
+            f"{field}: max={d['max']:.3g} n={d['count']}" + (f" from tick {d['first_tick']}" if d['count'] else '')
+            for field, d in self.diffs.items()
+        )
+        return (
+            f"{self.path}: {self.frames} frames in {self.elapsed:.2f}s ({self.frames_per_second:.0f} frames/s) | "
+            f"{self.timer.summary()} | {diffs}"
+        )
+
+
+def replay_file(path, driver=None, chunk_size=CHUNK_SIZE, tolerance=TOLERANCE):
+    """
+    Replays one recording through `driver`: a fresh one (e.g.
+    TorcsDriver(models=...)) for the first race of a session, or the one
+    that replayed the session's previous race (see replay_session()). The
+    track map saved with the recording, if any, replaces the driver's.
+    """
+    driver = driver if driver is not None else TorcsDriver()
+    map_path = track_map_path(path)
+    if map_path is not None and driver.track_map is not None and not driver.track_map.load(map_path):
+        logger.warning(f"{path}: track map {map_path} missing, the replay may differ from the recording")
+    result = ReplayResult(path)
+    driver.stage_timer = result.timer
+    state = CarState()
+    recorded_fields = [f'ctrl_{field}' for field in CONTROL_FIELDS]
+
+    start = time.perf_counter()
+    for chunk in iter_chunks(path, chunk_size):
+        n = len(chunk)
+        if result.frames == 0:
+            # recording may start mid-race (e.g. after a client restart)
+            driver.tick = int(chunk['tick'][0]) - 1
+        scalars = np.stack([chunk[name] for name in SCALAR_FIELDS], axis=1).tolist()
+        vectors = [(name, chunk[name]) for name in VECTOR_FIELDS]
+        produced = np.empty((n, len(CONTROL_FIELDS)))
+        for i in range(n):
+            state.load(scalars[i], {name: column[i] for name, column in vectors})
+            control = driver.drive(state)
+            produced[i] = (control['accel'], control['brake'], control['gear'], control['steer'])
+
+        recorded = np.stack([chunk[name] for name in recorded_fields], axis=1)
+        delta = np.abs(produced - recorded)
+        for j, field in enumerate(CONTROL_FIELDS):
+            diff = result.diffs[field]
+            diff['max'] = max(diff['max'], float(delta[:, j].max()))
+            over = np.nonzero(delta[:, j] > tolerance)[0]
+            if len(over):
+                diff['count'] += len(over)
+                if diff['first_tick'] is None:
+                    diff['first_tick'] = int(chunk['tick'][over[0]])
+        result.frames += n
+    result.elapsed = time.perf_counter() - start
+    driver.stage_timer = None
+    return result
+
+
+def sessions(paths):
+    """Groups recordings by recording session, each group in race order (older files stand alone)."""
+    groups = {}
+    for path in paths:
+        meta, _ = read_meta(path)
+        groups.setdefault(meta.get('session', path), []).append((meta.get('race', 0), path))
+    return [[path for _, path in sorted(group)] for group in groups.values()]
+
+
+def replay_session(paths, driver=None, **options):
+    """Replays the races of one session in order on one driver, calling init() between them."""
+    driver = driver if driver is not None else TorcsDriver()
+    results = []
+    for i, path in enumerate(paths):
+        if i:
+            driver.init()
+        results.append(replay_file(path, driver, **options))
+    return results
+
+
+# Models built by the parent before forking (see replay()), shared copy-on-write
+_shared_models = None
+_replay_options = {}
+
+
+def _replay_worker(paths):
+    return replay_session(paths, TorcsDriver(models=_shared_models), **_replay_options)
+
+
+def replay(paths, processes=1, compiled=True, chunk_size=CHUNK_SIZE, tolerance=TOLERANCE):
+    """
+    Replays every recording and returns (per-file results, combined result).
+    Sessions are independent, so with processes > 1 they are spread over a
+    forked pool that inherits the controllers built here once.
+    """
+    global _shared_models, _replay_options
+    template = TorcsDriver(compiled=compiled)
+    options = {'chunk_size': chunk_size, 'tolerance': tolerance}
+
+    start = time.perf_counter()
+    _shared_models = template.fuzzy_models()
+    _replay_options = options
+    groups = sessions(paths)
+    if processes > 1 and len(groups) > 1:
+        with multiprocessing.get_context('fork').Pool(processes) as pool:
+            grouped = pool.map(_replay_worker, groups)
+    else:
+        grouped = [_replay_worker(group) for group in groups]
+    wall = time.perf_counter() - start
+    # back in the order the paths were given
+    by_path = {result.path: result for results in grouped for result in results}
+    results = [by_path[path] for path in paths]
+
+    total = ReplayResult('total')
+    for result in results:
+        total.merge(result)
+    # wall-clock throughput across workers, not the sum of per-file times
+    total.elapsed = wall
+    return results, total
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay telemetry recordings through TorcsDriver.")
+    parser.add_argument('paths', nargs='+', help="telemetry .tel files")
+    parser.add_argument('--processes', type=int, default=1)
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+    parser.add_argument('--tolerance', type=float, default=TOLERANCE)
+    parser.add_argument('--skfuzzy', action='store_true', help="use the skfuzzy models instead of compiled tables")
+    parser.add_argument('--json', metavar='FILE', default=None, help="write the results as JSON")
+    args = parser.parse_args()
+
+    results, total = replay(args.paths, args.processes, not args.skfuzzy, args.chunk_size, args.tolerance)
+    for result in results:
+        logger.info(result.summary())
+    logger.info(total.summary())
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'files': [r.to_dict() for r in results], 'total': total.to_dict()}, f, indent=2)
+    sys.exit(1 if total.mismatches else 0)
+
+
+if __name__ == '__main__':
+    main()
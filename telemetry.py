@@ -0,0 +1,203 @@
+# telemetry.py
+# Binary per-tick telemetry: sensors, driver state and the control sent.
+#
+# A recording is a small header followed by fixed-size float64 records, so
+# it can be opened without copying as a NumPy structured array:
+#
+#   frames = open_recording('telemetry/car3001-20251016-120000-001.tel')
+#   frames['speedX'], frames['track'][:, 9], frames['ctrl_steer'] ...
+#
+# Records are appended in batches from a preallocated buffer and files are
+# rotated per race (TorcsDriver.init / on_shutdown).
+#
+# The header also names the recording session and race number, so replay.py
+# can run one session's races in order on one driver. When the driver's
+# track map was already closed at the start of the race, it is saved next
+# to the recording (<file>.map.npy), because the map changes the controls
+# and a replay has to start from the same one.
+
+import json
+import os
+import struct
+import time
+
+import numpy as np
+
+from car_state import SCALAR_FIELDS, VECTOR_FIELDS
+from log import logger
+
+MAGIC = b'TORCSTEL'
+VERSION = 1
+# Records buffered in memory between writes
+BATCH_SIZE = 512
+# Header (magic + version + JSON) is padded to this many bytes
+HEADER_ALIGN = 64
+
+# Turn classifications (driver._last_classification) stored as their index
+CLASSIFICATIONS = ('straight', 'long_turn', 'medium_turn', 'sharp_turn')
+
+# Every column is float64 (integers such as tick and gear are exact), so a
+# record is just a row of a (N, columns) float array
+TELEMETRY_DTYPE = np.dtype(
+    [('tick', 'f8'), ('time', 'f8')]
+    + [(name, 'f8') for name in SCALAR_FIELDS]
+    + [(name, 'f8', (size,)) for name, size in VECTOR_FIELDS.items()]
+    + [
+        ('drv_class', 'f8'), ('drv_severity', 'f8'), ('drv_intention', 'f8'),
+        ('drv_gear', 'f8'), ('drv_steering', 'f8'),
+        ('ctrl_accel', 'f8'), ('ctrl_brake', 'f8'), ('ctrl_gear', 'f8'), ('ctrl_steer', 'f8'),
+    ]
+)
+COLUMNS = TELEMETRY_DTYPE.itemsize // 8
+
+_RECORD = struct.Struct(f'<{COLUMNS}d')
+_MISSING_VECTORS = {name: [np.nan] * size for name, size in VECTOR_FIELDS.items()}
+_CLASS_CODES = {name: float(i) for i, name in enumerate(CLASSIFICATIONS)}
+
+
+def _header(dtype, **extra):
+    meta = json.dumps({'version': VERSION, 'descr': dtype.descr, **extra}).encode()
+    size = len(MAGIC) + 4 + len(meta)
+    meta += b' ' * (-size % HEADER_ALIGN)
+    return MAGIC + struct.pack('<I', len(meta)) + meta
+
+
+def read_meta(path):
+    """(header JSON, data offset) of a recording."""
+    with open(path, 'rb') as f:
+        prefix = f.read(len(MAGIC) + 4)
+        if prefix[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{path} is not a telemetry recording")
+        (length,) = struct.unpack('<I', prefix[len(MAGIC):])
+        meta = json.loads(f.read(length))
+    return meta, len(prefix) + length
+
+
+def read_header(path):
+    """(dtype, data offset) of a recording."""
+    meta, offset = read_meta(path)
+    descr = [tuple(field) if len(field) == 2 else (field[0], field[1], tuple(field[2])) for field in meta['descr']]
+    return np.dtype(descr), offset
+
+
+def track_map_path(path):
+    """Track map saved with a recording (None if the map was not ready when it started)."""
+    meta, _ = read_meta(path)
+    name = meta.get('track_map')
+    return os.path.join(os.path.dirname(path), name) if name else None
+
+
+def open_recording(path, mode='r'):
+    """
+    Memory-maps a recording as a structured array (one element per tick).
+    A partially written last record (crash mid-write) is ignored.
+    """
+    dtype, offset = read_header(path)
+    count = (os.path.getsize(path) - offset) // dtype.itemsize
+    if count == 0:
+        return np.zeros(0, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode=mode, offset=offset, shape=(count,))
+
+
+class TelemetryRecorder:
+    """
+    Appends one record per driver tick to `directory`/`prefix`-<start>-<race>.tel.
+
+    record() packs the numbers of one tick into a preallocated buffer of
+    BATCH_SIZE records (a single struct.pack_into); the buffer is written
+    with one write() when full, on flush(), and when the race file is
+    rotated or closed.
+    """
+
+    def __init__(self, directory='telemetry', prefix='race', batch_size=BATCH_SIZE):
+        self.directory = directory
+        self.prefix = prefix
+        self.started = time.strftime('%Y%m%d-%H%M%S')
+        self.race = 0
+        self.path = None
+        self.paths = []
+        self.records = 0
+        self._file = None
+        self._buffer = bytearray(batch_size * _RECORD.size)
+        self._capacity = batch_size
+        self._used = 0
+        self._t0 = 0.0
+        self._scalar_index = None
+        self._scalar_columns = None
+
+    def _open(self, driver):
+        os.makedirs(self.directory, exist_ok=True)
+        self.race += 1
+        self.path = os.path.join(self.directory, f"{self.prefix}-{self.started}-{self.race:03d}.tel")
+        track_map = getattr(driver, 'track_map', None)
+        map_name = None
+        if track_map is not None and track_map.ready:
+            map_name = os.path.basename(track_map.save(self.path + '.map.npy'))
+        self._file = open(self.path, 'wb')
+        self._file.write(_header(TELEMETRY_DTYPE, session=f"{self.prefix}-{self.started}", race=self.race,
+                                 track_map=map_name))
+        self.paths.append(self.path)
+        self.records = 0
+        self._t0 = time.perf_counter()
+        logger.info(f"Recording telemetry to {self.path}")
+
+    def _scalar_values(self, sensors):
+        index = getattr(sensors, 'index', None)
+        if index is not None:
+            if index is not self._scalar_index:
+                # new CarState layout: find where each schema field lives in sensors.values
+                self._scalar_index = index
+                positions = [index.get(name) for name in SCALAR_FIELDS]
+                contiguous = positions == list(range(len(SCALAR_FIELDS)))
+                self._scalar_columns = None if contiguous else positions
+            if self._scalar_columns is None:
+                return sensors.values[:len(SCALAR_FIELDS)]
+            values = sensors.values
+            return [np.nan if i is None else values[i] for i in self._scalar_columns]
+        # plain dict (old parser output, replays)
+        return [sensors.get(name, np.nan) for name in SCALAR_FIELDS]
+
+    def record(self, driver, sensors, control):
+        if self._file is None:
+            self._open(driver)
+        values = [driver.tick, time.perf_counter() - self._t0]
+        values += self._scalar_values(sensors)
+        for name, size in VECTOR_FIELDS.items():
+            vector = sensors.get(name)
+            if vector is not None and len(vector) == size:
+                values += vector.tolist() if isinstance(vector, np.ndarray) else vector
+            else:
+                values += _MISSING_VECTORS[name]
+        values += (
+            _CLASS_CODES.get(driver._last_classification, -1.0),
+            driver._last_severity,
+            driver._last_intention,
+            driver.gear,
+            driver.steering,
+            control['accel'],
+            control['brake'],
+            control['gear'],
+            control['steer'],
+        )
+        _RECORD.pack_into(self._buffer, self._used * _RECORD.size, *values)
+        self._used += 1
+        self.records += 1
+        if self._used == self._capacity:
+            self.flush()
+
+    def flush(self):
+        if self._used and self._file is not None:
+            self._file.write(memoryview(self._buffer)[:self._used * _RECORD.size])
+            self._file.flush()
+        self._used = 0
+
+    def rotate(self):
+        """Closes the current race file; the next record() starts a new one."""
+        if self._file is None:
+            return
+        self.flush()
+        self._file.close()
+        self._file = None
+        logger.info(f"Telemetry: {self.records} frames in {self.path}")
+
+    close = rotate
@@ -0,0 +1,8 @@
+# conftest.py
+# The modules live at the repository root and import each other by their
+# bare names (as main.py does), so the tests run with the root on sys.path.
+import os
+import sys
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
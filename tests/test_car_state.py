@@ -0,0 +1,80 @@
+import pytest
+
+from benchmarks.transport import example_message, legacy_parse
+from car_state import CarState, SCALAR_FIELDS, VECTOR_FIELDS
+from Simulator.car import CarModel
+from Simulator.server import encode_sensors, pack_sensors
+from Simulator.track import get_track
+
+
+def _check(state, message):
+    """Parses `message` into `state` and compares it with the original token parser."""
+    expected = legacy_parse(message.rstrip(b'\x00').decode())
+    assert state.parse(message).to_dict() == expected
+    return expected
+
+
+def _replace(message, key, text):
+    start = message.index(b'(' + key + b' ')
+    end = message.index(b')', start)
+    return message[:start] + b'(' + key + b' ' + text + message[end:]
+
+
+def test_example_packet_matches_baseline():
+    state = CarState()
+    message = example_message()
+    expected = _check(state, message)
+    assert isinstance(expected['track'], list) and len(expected['track']) == 19
+    assert state.speedX == expected['speedX']
+    # second time through the compiled layout, with changed scalars and vectors
+    message = _replace(message, b'speedX', b'12.5')
+    message = _replace(message, b'wheelSpinVel', b'1 2 3 4.5')
+    _check(state, message)
+    assert state.wheelSpinVel.tolist() == [1.0, 2.0, 3.0, 4.5]
+
+
+def test_simulator_packets_match_baseline():
+    state = CarState()
+    car = CarModel(get_track('oval'))
+    for _ in range(50):
+        _check(state, encode_sensors(car.sensors()))
+        car.step({'accel': 1.0, 'brake': 0.0, 'gear': 1, 'steer': 0.0})
+
+
+def test_vector_size_change_matches_baseline():
+    state = CarState()
+    message = example_message()
+    _check(state, message)
+    _check(state, _replace(message, b'track', b'1 2 3 4 5'))
+    assert len(state.track) == 5
+    _check(state, message)
+    assert len(state.track) == VECTOR_FIELDS['track']
+
+
+def test_scalar_sent_as_list_matches_baseline():
+    state = CarState()
+    message = example_message()
+    _check(state, message)
+    expected = _check(state, _replace(message, b'gear', b'3 4'))
+    assert expected['gear'] == [3.0, 4.0]
+    assert state['gear'] == [3.0, 4.0]
+
+
+def test_padded_receive_buffer():
+    message = example_message()
+    buffer = bytearray(4096)
+    buffer[:len(message) + 1] = message + b'\x00'
+    state = CarState()
+    for _ in range(2):
+        assert state.parse(buffer, len(message) + 1).to_dict() == legacy_parse(message.decode())
+
+
+def test_binary_frame_round_trip():
+    sensors = CarModel(get_track('oval')).sensors()
+    state = CarState().unpack(pack_sensors(sensors))
+    for key in SCALAR_FIELDS:
+        assert state[key] == sensors[key]
+    for key in VECTOR_FIELDS:
+        assert state[key].tolist() == list(sensors[key])
+    with pytest.raises(ValueError):
+        state.unpack(b'(angle 0.1)')
@@ -0,0 +1,48 @@
+import math
+
+import numpy as np
+import pytest
+
+from control_command import CONTROL_FRAME, FLOAT_SCALE, encode_control_command, encode_control_frame
+from Simulator.server import decode_control, decode_control_frame
+
+PREVIOUS = {'accel': 0.0, 'brake': 0.0, 'gear': 0, 'steer': 0.0, 'meta': 0}
+
+
+def _controls(n=500, seed=0):
+    rng = np.random.default_rng(seed)
+    for accel, brake, steer, gear in zip(rng.uniform(0, 1, n), rng.uniform(0, 1, n),
+                                         rng.uniform(-1, 1, n), rng.integers(-1, 8, n)):
+        yield {'accel': float(accel), 'brake': float(brake), 'gear': int(gear), 'steer': float(steer)}
+
+
+def test_text_command_round_trip():
+    for control in _controls():
+        decoded = decode_control(encode_control_command(control), PREVIOUS)
+        assert decoded['gear'] == control['gear']
+        for key in ('accel', 'brake', 'steer'):
+            assert decoded[key] == pytest.approx(control[key], abs=0.5 / FLOAT_SCALE + 1e-12)
+
+
+def test_text_command_format():
+    command = encode_control_command({'accel': 0.4, 'brake': 0.0, 'gear': 3, 'steer': -0.12346})
+    assert command == b'(accel 0.4000)(brake 0.0000)(gear 3)(steer -0.1235)'
+    # out of range, NaN and inf are clipped like the binary frame; unusual gears still encode
+    command = encode_control_command({'accel': 1.7, 'brake': math.nan, 'gear': 12, 'steer': -math.inf})
+    assert command == b'(accel 1.0000)(brake 0.0000)(gear 12)(steer 0.0000)'
+
+
+def test_binary_frame_round_trip():
+    for control in _controls():
+        frame = encode_control_frame(dict(control, meta=7))
+        assert len(frame) == CONTROL_FRAME.size
+        decoded = decode_control_frame(frame, PREVIOUS)
+        assert decoded == dict(control, meta=7)
+
+
+def test_binary_frame_clips_like_text():
+    control = {'accel': 1.7, 'brake': math.nan, 'gear': 2, 'steer': -math.inf}
+    decoded = decode_control_frame(encode_control_frame(control), PREVIOUS)
+    text = decode_control_frame(encode_control_command(control), PREVIOUS)
+    for key in ('accel', 'brake', 'gear', 'steer'):
+        assert decoded[key] == text[key]
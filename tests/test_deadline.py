@@ -0,0 +1,107 @@
+import logging
+import types
+
+import pytest
+
+import deadline
+from deadline import TickBudget
+from torcs_driver import TorcsDriver
+from Simulator.car import CarModel
+from Simulator.track import get_track
+
+
+class FakeClock:
+    """Stands in for time.perf_counter: moves only when advance() is called."""
+
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(deadline, 'time', types.SimpleNamespace(perf_counter=clock))
+    return clock
+
+
+def _tick(budget, clock, stage, cost, head=0.0):
+    """One tick: `head` seconds of features, then `stage` if allowed (taking `cost`)."""
+    budget.start(clock.now)
+    clock.advance(head)
+    budget.done('features')
+    ran = budget.allow(stage)
+    if ran:
+        clock.advance(cost)
+    budget.done(stage, ran)
+    budget.finish()
+    return ran
+
+
+def test_stage_over_budget_falls_back_then_is_retried(clock):
+    budget = TickBudget(budget=0.010, reserve=0.0005, alpha=0.1)
+    # first run is slow (8 ms): learnt as the stage's cost
+    assert _tick(budget, clock, 'gear', 0.008, head=0.002)
+    assert budget.estimates['gear'] == pytest.approx(0.008)
+
+    # 2 ms in, 8 ms estimated + 0.5 ms reserve no longer fits: fallback, and the estimate decays
+    assert not _tick(budget, clock, 'gear', 0.001, head=0.002)
+    assert budget.fallbacks == {'gear': 1}
+    assert budget.estimates['gear'] == pytest.approx(0.0072)
+
+    # 2 + 7.2 + 0.5 <= 10: tried again, and the cheap run brings the estimate down
+    assert _tick(budget, clock, 'gear', 0.001, head=0.002)
+    assert budget.estimates['gear'] == pytest.approx(0.0072 + 0.1 * (0.001 - 0.0072))
+    assert budget.snapshot()['degraded'] == 1
+    assert budget.missed == 0
+
+
+def test_missed_deadline_is_attributed_to_the_running_stage(clock):
+    budget = TickBudget(budget=0.010)
+    budget.start(clock.now)
+    clock.advance(0.004)
+    budget.done('features')
+    clock.advance(0.007)
+    budget.done('steering')
+    budget.finish()
+    assert budget.missed_by_stage == {'steering': 1}
+
+
+def test_driver_uses_fallback_until_decay_lets_the_stage_back(clock, caplog):
+    caplog.set_level(logging.ERROR, logger='my_app')
+    driver = TorcsDriver()
+    driver.deadline = TickBudget(budget=0.010, reserve=0.0005, alpha=0.1)
+    car = CarModel(get_track('oval'))
+
+    runs = []
+    gear_handler, gear_fallback = driver.gear_handler, driver.gear_fallback
+
+    def slow_first_gear(sensors):
+        runs.append(True)
+        clock.advance(0.012 if len(runs) == 1 else 0.001)
+        gear_handler(sensors)
+
+    def counted_fallback(sensors):
+        runs.append(False)
+        gear_fallback(sensors)
+
+    driver.gear_handler, driver.gear_fallback = slow_first_gear, counted_fallback
+
+    for _ in range(6):
+        driver.deadline.start(clock.now)
+        control = driver.drive(car.sensors())
+        driver.deadline.finish()
+        car.step(control)
+
+    # 12 ms learnt on tick 1; skipped while 12 -> 10.8 -> 9.72 ms decay past the 9.5 ms that fit,
+    # then retried at 8.75 ms
+    assert runs == [True, False, False, False, True, True]
+    # the slow first run also left no time for steering on tick 1
+    assert driver.deadline.fallbacks == {'gear': 3, 'steering': 1}
+    assert driver.deadline.degraded == 4
+    assert driver.deadline.missed_by_stage == {'gear': 1}
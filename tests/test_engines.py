@@ -0,0 +1,98 @@
+import logging
+
+import numpy as np
+import pytest
+
+from Fuzzy import compiled as compiled_mod
+from Fuzzy import rulebase as rulebase_mod
+from Fuzzy.analytic import AnalyticSimulation
+from Fuzzy.batched import BatchedSystem
+
+SAMPLES = 300
+# Closed-form engine vs skfuzzy (README: 1.2e-4, aggressiveness 4.4e-3 from the 91-point output universe)
+ANALYTIC_ERROR = 2e-4
+ANALYTIC_ERROR_BY_OUTPUT = {'aggressiveness': 5e-3}
+# Vectorized engine vs skfuzzy (README: ~1e-3)
+BATCHED_ERROR = 1e-3
+
+MODELS = rulebase_mod.load()
+
+
+@pytest.fixture(autouse=True)
+def quiet(caplog):
+    caplog.set_level(logging.ERROR, logger='my_app')
+
+
+def _rows(spec, seed=0):
+    """Random input dicts over each universe; gear_in is a whole gear, as the driver sends it."""
+    rng = np.random.default_rng(seed)
+    columns = {}
+    for label, variable in spec['inputs'].items():
+        low, high, _ = variable['universe']
+        if label == 'gear_in':
+            columns[label] = rng.integers(int(low), int(high) + 1, SAMPLES).astype(float)
+        else:
+            columns[label] = rng.uniform(low, high, SAMPLES)
+    return [dict(zip(columns, values)) for values in zip(*columns.values())]
+
+
+def _outputs(model, rows):
+    results = []
+    for row in rows:
+        for label, value in row.items():
+            model.input[label] = value
+        model.compute()
+        results.append(dict(model.output))
+    return results
+
+
+def _max_errors(results, reference):
+    """{output: max |error|}; an output defined on one side only fails the test."""
+    errors = {}
+    for got, want in zip(results, reference):
+        assert got.keys() == want.keys()
+        for label, value in want.items():
+            errors[label] = max(errors.get(label, 0.0), abs(got[label] - value))
+    return errors
+
+
+@pytest.fixture(scope='module')
+def reference():
+    return {name: _outputs(rulebase_mod.build_simulation(spec), _rows(spec)) for name, spec in MODELS.items()}
+
+
+@pytest.mark.parametrize('name', list(MODELS))
+def test_analytic_matches_skfuzzy(name, reference):
+    spec = MODELS[name]
+    errors = _max_errors(_outputs(AnalyticSimulation(spec), _rows(spec)), reference[name])
+    for label, error in errors.items():
+        assert error <= ANALYTIC_ERROR_BY_OUTPUT.get(label, ANALYTIC_ERROR), label
+
+
+@pytest.mark.parametrize('name', list(MODELS))
+def test_batched_matches_skfuzzy(name, reference):
+    spec = MODELS[name]
+    rows = _rows(spec)
+    batched = BatchedSystem(rulebase_mod.build_simulation(spec))
+    columns = batched.evaluate_columns({label: [row[label] for row in rows] for label in batched.labels})
+    results = [{label: float(values[i]) for label, values in columns.items() if values[i] == values[i]}
+               for i in range(len(rows))]
+    for label, error in _max_errors(results, reference[name]).items():
+        assert error <= BATCHED_ERROR, label
+
+
+def test_compiled_tables_within_stated_error(reference):
+    built = rulebase_mod.build_models(MODELS, compiled=True, cache=False)
+    for name, model in built.items():
+        if not isinstance(model, compiled_mod.CompiledSimulation):
+            continue
+        assert max(model.error.values()) <= compiled_mod.MAX_ERROR
+        results = _outputs(model, _rows(MODELS[name]))
+        for label in model.tables:
+            errors = [abs(got[label] - want[label]) for got, want in zip(results, reference[name]) if label in want]
+            # interpolation only misses near the edges where a rule starts firing
+            assert np.quantile(errors, compiled_mod.ERROR_QUANTILE) <= compiled_mod.MAX_ERROR, name
+            assert max(errors) <= model.max_error[label] + 0.05, name
+    # the five-input gear table is too coarse: it runs on the closed-form engine
+    assert isinstance(built['gear_ctrl'], AnalyticSimulation)
+    assert isinstance(built['turn_classifier'], compiled_mod.CompiledSimulation)
@@ -0,0 +1,53 @@
+import urllib.error
+import urllib.request
+
+from metrics import LatencyHistogram, MetricsServer, StageTimer
+
+
+class IntrudingHistogram(LatencyHistogram):
+    """Adds a stage to its timer while being reported, like the control thread would."""
+
+    def __init__(self, timer):
+        super().__init__()
+        self.timer = timer
+
+    def summary(self):
+        self.timer.lap('late_stage')
+        return super().summary()
+
+
+def test_report_survives_stages_added_meanwhile():
+    timer = StageTimer()
+    timer.start()
+    timer.lap('parse')
+    timer.stages['intruder'] = IntrudingHistogram(timer)
+    report = timer.report()
+    assert report.splitlines()[0].startswith('parse ')
+    assert 'late_stage' in timer.stages
+
+
+def _get(port, path='/'):
+    try:
+        with urllib.request.urlopen(f"http://127.0.0.1:{port}{path}", timeout=5) as response:
+            return response.status, response.read().decode()
+    except urllib.error.HTTPError as e:
+        return e.code, e.read().decode()
+
+
+def test_server_answers_500_when_render_fails():
+    def render():
+        raise RuntimeError('dictionary changed size during iteration')
+
+    def bad_query(query):
+        raise ValueError('bad query')
+
+    server = MetricsServer(render, 0, commands={'/profile': bad_query})
+    port = server.httpd.server_address[1]
+    server.start()
+    try:
+        status, body = _get(port)
+        assert status == 500
+        assert 'RuntimeError' in body
+        assert _get(port, '/profile')[0] == 400
+    finally:
+        server.stop()
@@ -0,0 +1,27 @@
+import numpy as np
+import pytest
+
+from Interpretation.opponents import DT, OPPONENT_RANGE, SECTORS, OpponentTracker
+
+AHEAD = SECTORS // 2  # the sector straight ahead
+
+
+def _sensors(distance):
+    opponents = np.full(SECTORS, OPPONENT_RANGE)
+    opponents[AHEAD] = distance
+    return {'opponents': opponents.tolist(), 'trackPos': 0.0}
+
+
+def test_closing_rate_per_tick():
+    tracker = OpponentTracker()
+    tracker.update(_sensors(50.0), tick=1)
+    traffic = tracker.update(_sensors(49.5), tick=2)
+    assert traffic.closing == pytest.approx(0.5 / DT)
+
+
+def test_closing_rate_spans_skipped_ticks():
+    tracker = OpponentTracker()
+    tracker.update(_sensors(50.0), tick=1)
+    # ticks 2 and 3 skipped by the deadline: the 0.5 m were covered over three ticks
+    traffic = tracker.update(_sensors(49.5), tick=4)
+    assert traffic.closing == pytest.approx(0.5 / (3 * DT))
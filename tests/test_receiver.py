@@ -0,0 +1,60 @@
+import threading
+import time
+from collections import Counter
+
+from receiver import FrameMailbox, Watchdog
+
+BUDGET = 0.02
+
+
+class OneReplyPerTickServer:
+    """Socket stand-in that counts the datagrams arriving while each frame is the current one."""
+
+    def __init__(self):
+        self.frame = 0
+        self.replies = Counter()
+        self.got = threading.Event()
+
+    def send(self, data):
+        self.replies[self.frame] += 1
+        self.got.set()
+        return len(data)
+
+
+def _control(mailbox, watchdog, stalls, done):
+    while not done.is_set():
+        frame = mailbox.take(0.05)
+        if frame is None or frame.notice is not None:
+            continue
+        if frame.seq in stalls:
+            time.sleep(1.5 * BUDGET)
+        watchdog.send(b'(accel 1)', frame.seq)
+        mailbox.release(frame)
+
+
+def test_stalled_tick_gets_exactly_one_datagram():
+    server = OneReplyPerTickServer()
+    mailbox = FrameMailbox()
+    watchdog = Watchdog(server, mailbox, BUDGET).start()
+    done = threading.Event()
+    control = threading.Thread(target=_control, args=(mailbox, watchdog, {5, 12}, done), daemon=True)
+    control.start()
+    frames = 20
+    try:
+        for seq in range(1, frames + 1):
+            server.frame = seq
+            server.got.clear()
+            mailbox.put(mailbox.buffer(), 1)
+            assert server.got.wait(1.0), f"frame {seq} got no reply"
+            # the server reads one datagram per tick: anything sent after it belongs to the next frame
+            time.sleep(0.002)
+    finally:
+        done.set()
+        control.join()
+        mailbox.close()
+        watchdog.stop()
+
+    assert server.replies == Counter({seq: 1 for seq in range(1, frames + 1)})
+    assert watchdog.resent >= 2
+    assert watchdog.late == watchdog.resent
+
@@ -0,0 +1,37 @@
+import logging
+
+from replay import replay
+from telemetry import TelemetryRecorder
+from torcs_driver import TorcsDriver
+from Simulator.car import CarModel
+from Simulator.track import get_track
+
+TICKS = 1800  # a lap of the oval and a bit: the track map closes during the first race
+
+
+def _record_session(directory, races=2):
+    """Races on one driver the way TorcsClient runs a session (init() on every restart)."""
+    driver = TorcsDriver()
+    driver.recorder = TelemetryRecorder(str(directory))
+    for race in range(races):
+        if race:
+            driver.init()
+        car = CarModel(get_track('oval'))
+        for _ in range(TICKS):
+            car.step(driver.drive(car.sensors()))
+    driver.on_shutdown()
+    assert driver.track_map.ready
+    return driver.recorder.paths
+
+
+def test_session_replays_exactly(tmp_path, caplog):
+    caplog.set_level(logging.ERROR, logger='my_app')
+    paths = _record_session(tmp_path)
+
+    results, total = replay(paths)
+    assert [r.frames for r in results] == [TICKS, TICKS]
+    assert total.mismatches == 0
+
+    # the second race starts from the map saved with it, also on its own
+    _, alone = replay(paths[1:])
+    assert alone.mismatches == 0
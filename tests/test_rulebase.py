@@ -0,0 +1,61 @@
+import json
+
+import pytest
+
+from Fuzzy import rulebase as rulebase_mod
+from torcs_driver import TorcsDriver
+
+
+@pytest.fixture
+def rules_file(tmp_path):
+    path = tmp_path / 'rules.json'
+    path.write_text(json.dumps(rulebase_mod.load()))
+    return path
+
+
+def _edit(path, name, term, params):
+    models = json.loads(path.read_text())
+    variable, term = term.split('.')
+    (function, _), = models[name]['outputs'][variable]['terms'][term].items()
+    models[name]['outputs'][variable]['terms'][term] = {function: params}
+    path.write_text(json.dumps(models))
+
+
+def test_driver_skipping_generations_gets_every_change(rules_file):
+    watcher = rulebase_mod.RuleWatcher(str(rules_file), analytic=True)
+    driver = TorcsDriver(rules=str(rules_file), analytic=True, watch_rules=watcher)
+    first = driver.turn_classifier.model
+    second = driver.gear_ctrl.model
+
+    _edit(rules_file, 'turn_classifier', 'turn_severity.straight', [0.0, 0.0, 0.3])
+    assert watcher.reload()
+    _edit(rules_file, 'gear_ctrl', 'gear_adj.keep', [-0.2, 0.0, 0.2])
+    assert watcher.reload()
+
+    assert driver.apply_rules()
+    assert driver.turn_classifier.model is not first
+    assert driver.gear_ctrl.model is not second
+    assert not driver.apply_rules()
+
+
+def test_driver_sharing_older_models_catches_up(rules_file):
+    watcher = rulebase_mod.RuleWatcher(str(rules_file), analytic=True)
+    template = TorcsDriver(rules=str(rules_file), analytic=True, watch_rules=watcher)
+    models = template.fuzzy_models()
+    _edit(rules_file, 'turn_classifier', 'turn_severity.straight', [0.0, 0.0, 0.3])
+    assert watcher.reload()
+
+    # built from the template's models, which predate the reload
+    car = TorcsDriver(models=models, watch_rules=watcher)
+    assert car.apply_rules()
+    assert car.turn_classifier.model is not models['turn_classifier']
+
+
+def test_reload_history_is_bounded(rules_file):
+    watcher = rulebase_mod.RuleWatcher(str(rules_file), analytic=True)
+    for i in range(rulebase_mod.HISTORY + 5):
+        _edit(rules_file, 'turn_classifier', 'turn_severity.straight', [0.0, 0.0, 0.3 + i * 1e-3])
+        assert watcher.reload()
+        watcher.swapped(0)
+    assert len(watcher.compile_times) == rulebase_mod.HISTORY
+    assert len(watcher.latencies) == rulebase_mod.HISTORY
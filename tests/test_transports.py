@@ -0,0 +1,108 @@
+import platform
+import socket
+import threading
+
+import pytest
+
+import transports
+from transports import SLOTS, ShmChannel, ShmEndpoint, ShmRing
+
+
+def _ring(slots=SLOTS, slot_size=64):
+    ring = ShmRing(memoryview(bytearray(ShmRing.size(slots, slot_size))), 0, slots, slot_size)
+    ring.reset()
+    return ring
+
+
+def _frame(i):
+    return b'S%d' % i + b'.' * (i % 7)
+
+
+def test_ring_wraps_around_in_order():
+    ring = _ring()
+    target = bytearray(ring.capacity)
+    sent = received = 0
+    # uneven batches so reads and writes cross the end of the ring at different slots
+    for batch in (3, SLOTS, 5, 1, SLOTS - 1, 7) * 4:
+        for _ in range(batch):
+            assert ring.put(_frame(sent), timeout=0)
+            sent += 1
+        assert ring.pending() == batch
+        for _ in range(batch):
+            length = ring.get_into(target)
+            assert bytes(target[:length]) == _frame(received)
+            received += 1
+        assert ring.get_into(target) is None
+    assert received > 3 * SLOTS
+
+
+def test_put_on_full_ring_times_out_until_read():
+    ring = _ring()
+    for i in range(SLOTS):
+        assert ring.put(_frame(i), timeout=0)
+    assert not ring.put(b'overflow', timeout=0.01)
+    assert ring.pending() == SLOTS
+
+    target = bytearray(ring.capacity)
+    length = ring.get_into(target)
+    assert bytes(target[:length]) == _frame(0)
+    assert ring.put(b'after', timeout=0)
+    # the rejected frame was never written
+    frames = [bytes(target[:ring.get_into(target)]) for _ in range(SLOTS)]
+    assert frames == [_frame(i) for i in range(1, SLOTS)] + [b'after']
+
+
+def test_put_waits_for_the_consumer():
+    ring = _ring()
+    for i in range(SLOTS):
+        ring.put(_frame(i))
+    target = bytearray(ring.capacity)
+    reader = threading.Timer(0.02, ring.get_into, (target,))
+    reader.start()
+    assert ring.put(b'late', timeout=5.0)
+    reader.join()
+
+
+def test_oversized_frame_is_rejected():
+    ring = _ring(slot_size=64)
+    with pytest.raises(ValueError):
+        ring.put(b'x' * (ring.capacity + 1))
+
+
+def test_channel_between_threads(tmp_path):
+    path = str(tmp_path / 'test.ring')
+    server = ShmChannel(path, create=True)
+    client = ShmChannel(path)
+    frames = 5 * SLOTS + 3
+    try:
+        server_end = ShmEndpoint(server, server.to_server, server.to_client)
+        client_end = ShmEndpoint(client, client.to_client, client.to_server)
+        server_end.settimeout(5.0)
+        client_end.settimeout(5.0)
+
+        def produce():
+            for i in range(frames):
+                server_end.sendto(_frame(i))
+
+        producer = threading.Thread(target=produce)
+        producer.start()
+        buffer = bytearray(client.to_client.capacity)
+        for i in range(frames):
+            length = client_end.recv_into(buffer)
+            assert bytes(buffer[:length]) == _frame(i)
+        producer.join()
+
+        client_end.settimeout(0.01)
+        with pytest.raises(socket.timeout):
+            client_end.recv_into(buffer)
+    finally:
+        client.close()
+        server.close()
+
+
+def test_channel_refused_off_x86(tmp_path, monkeypatch):
+    monkeypatch.setattr(platform, 'machine', lambda: 'aarch64')
+    with pytest.raises(RuntimeError):
+        ShmChannel(str(tmp_path / 'test.ring'), create=True)
+    with pytest.raises(RuntimeError):
+        transports.ShmTransport(str(tmp_path / 'test.ring')).connect()
@@ -0,0 +1,178 @@
+# torcs_async.py
+# asyncio client driving several scr_server cars (ports 3001..300N) from one process.
+
+import argparse
+import asyncio
+import time
+
+from torcs_driver import TorcsDriver
+from torcs_client import build_init_request
+from car_state import CarState
+from control_command import encode_control_command
+from metrics import LatencyStats
+from telemetry import TelemetryRecorder
+import profiler
+from log import logger
+
+# Seconds between init requests until the server identifies the car
+INIT_RETRY = 1.0
+# Seconds between per-car latency reports
+STATS_EVERY = 10.0
+
+
+class CarProtocol(asyncio.DatagramProtocol):
+    """
+    One car: its own TorcsDriver, CarState, init/identified handshake and
+    shutdown/restart handling, on a socket connected to its scr_server port.
+    """
+
+    def __init__(self, port, driver):
+        self.port = port
+        self.driver = driver
+        self.state = CarState()
+        self.stats = LatencyStats()
+        self.transport = None
+        self.identified = False
+        self.done = asyncio.get_running_loop().create_future()
+        self._init_handle = None
+
+    def connection_made(self, transport):
+        self.transport = transport
+        self.send_init_request()
+
+    def send_init_request(self):
+        self.transport.sendto(build_init_request())
+        # scr_server ignores us until its race is up: keep asking until identified
+        self._init_handle = asyncio.get_running_loop().call_later(INIT_RETRY, self._retry_init)
+
+    def _retry_init(self):
+        if not self.identified and not self.transport.is_closing():
+            self.send_init_request()
+
+    def _identified(self):
+        self.identified = True
+        if self._init_handle is not None:
+            self._init_handle.cancel()
+            self._init_handle = None
+
+    def datagram_received(self, data, addr):
+        start = time.perf_counter()
+        if data[:1] == b'*':
+            self.handle_notice(data.strip(b' \x00\r\n').decode())
+            return
+        if not self.identified:
+            self._identified()
+
+        car_state = self.state.parse(data)
+        car_control = self.driver.drive(car_state)
+        self.transport.sendto(encode_control_command(car_control))
+        self.stats.add(time.perf_counter() - start)
+
+    def handle_notice(self, message):
+        if message == "***identified***":
+            logger.info(f"[{self.port}] Server message: {message}")
+            self._identified()
+        elif message == "***restart***":
+            # New race on the same server: reset the race state and re-run the handshake
+            logger.info(f"[{self.port}] Server message: {message}. Restarting.")
+            self.driver.init()
+            self.identified = False
+            self.send_init_request()
+        elif message == "***shutdown***":
+            logger.info(f"[{self.port}] Server message: {message}. Closing.")
+            self.driver.on_shutdown()
+            self.transport.close()
+        else:
+            logger.info(f"[{self.port}] Server message: {message}")
+
+    def error_received(self, exc):
+        # ICMP port unreachable while the server is not up; the init retry handles it
+        logger.debug(f"[{self.port}] Socket error: {exc}")
+
+    def connection_lost(self, exc):
+        if self._init_handle is not None:
+            self._init_handle.cancel()
+        if not self.done.done():
+            self.done.set_result(self.stats)
+
+
+class MultiCarClient:
+    """
+    Serves `cars` scr_server ports (base_port, base_port + 1, ...) from a single
+    event loop. The fuzzy models are built once and shared by every driver.
+    With `record_dir`, each car records its telemetry there (car<port>-*.tel).
+    With `watch_rules`, edits to the rule file (Fuzzy/rules.json) are
+    recompiled in the background and swapped into every car between ticks.
+    """
+
+    def __init__(self, host='localhost', base_port=3001, cars=1, stats_every=STATS_EVERY, record_dir=None,
+                 watch_rules=False):
+        self.host = host
+        self.base_port = base_port
+        self.cars = cars
+        self.stats_every = stats_every
+        self.record_dir = record_dir
+        self.watch_rules = watch_rules
+        self.protocols = []
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        template = TorcsDriver(watch_rules=self.watch_rules)
+        models = template.fuzzy_models()
+
+        for i in range(self.cars):
+            port = self.base_port + i
+            # one watcher compiles the new rules; each car swaps them in at its own tick boundary
+            driver = template if i == 0 else TorcsDriver(models=models, watch_rules=template.rule_watcher)
+            if self.record_dir is not None:
+                driver.recorder = TelemetryRecorder(self.record_dir, prefix=f"car{port}")
+            _, protocol = await loop.create_datagram_endpoint(
+                lambda port=port, driver=driver: CarProtocol(port, driver),
+                remote_addr=(self.host, port),
+            )
+            self.protocols.append(protocol)
+        logger.info(f"Driving {self.cars} car(s) on {self.host}:{self.base_port}..{self.base_port + self.cars - 1}")
+
+        reporter = asyncio.ensure_future(self._report_periodically())
+        try:
+            await asyncio.gather(*(p.done for p in self.protocols))
+        finally:
+            reporter.cancel()
+            for p in self.protocols:
+                p.transport.close()
+                p.driver.on_shutdown()
+            self.report()
+
+    async def _report_periodically(self):
+        while True:
+            await asyncio.sleep(self.stats_every)
+            self.report()
+
+    def report(self):
+        for p in self.protocols:
+            logger.info(f"[{p.port}] {p.stats.summary()}")
+        if self.protocols and self.protocols[0].driver.rule_watcher is not None:
+            logger.info(f"rules {self.protocols[0].driver.rule_watcher.summary()}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Drive several scr_server cars from one process.")
+    parser.add_argument('--host', default='localhost')
+    parser.add_argument('--port', type=int, default=3001, help="first scr_server port")
+    parser.add_argument('--cars', type=int, default=1)
+    parser.add_argument('--record', metavar='DIR', default=None, help="record per-tick telemetry into DIR")
+    parser.add_argument('--watch-rules', action='store_true',
+                        help="reload the fuzzy rule bases (Fuzzy/rules.json) when the file changes")
+    args = parser.parse_args()
+
+    # kill -USR1 <pid> captures a sampling profile of the event loop (profiler.py)
+    profiler.install()
+    try:
+        asyncio.run(MultiCarClient(args.host, args.port, args.cars, record_dir=args.record,
+                                   watch_rules=args.watch_rules).run())
+    except KeyboardInterrupt:
+        logger.info("User interrupted. Shutting down.")
+
+
+if __name__ == '__main__':
+    main()
@@ -6,104 +6,280 @@
 import socket
 import sys
 import time
+from collections import deque
 from torcs_driver import TorcsDriver
+from car_state import CarState
+from control_command import encode_control_command
+from metrics import LatencyStats, StageTimer, MetricsServer
+from deadline import TickBudget, TICK_BUDGET
+from receiver import FrameMailbox, Receiver, Watchdog, WATCHDOG_MARGIN
+from transports import UdpTransport
 from log import logger
 
+# Seconds to wait before re-sending the init request while scr_server is not up
+RECONNECT_DELAY = 1.0
+# Seconds without an answer before re-sending the init request until identified
+INIT_RETRY = 1.0
+# Seconds between stage latency dumps to the log
+STATS_EVERY = 10.0
+# Ticks slower than this (parse -> send, seconds) are kept as spikes, with the track position
+SPIKE_THRESHOLD = 0.005
+# How many recent spikes to keep
+SPIKE_HISTORY = 50
+
+
+def build_init_request():
+    """
+    The init string must define the angles for the car's sensors.
+    A standard set of 19 sensors, from -90 to +90 degrees.
+    """
+    angles = ' '.join(str(i) for i in range(-90, 91, 10))
+    return f"SCR(init {angles})".encode()
+
+
 class TorcsClient:
     """
     Client to connect to a TORCS scr_server and control a car.
+    Pass `driver` to reuse one built elsewhere (e.g. sharing fuzzy models),
+    and `recorder` (telemetry.TelemetryRecorder) to record every tick.
+
+    Every tick is timed per stage (receive, parse, the driver's stages,
+    format, send) into histograms that are logged every `stats_every`
+    seconds and, with `metrics_port`, served as text on that local port.
+
+    Each tick has `tick_budget` seconds from receiving the sensors to
+    sending the reply (None disables it): driver stages that no longer fit
+    use their cheap fallback, and missed deadlines are counted per stage.
+
+    Datagrams are received on a separate thread (receiver.py): the loop
+    always decides on the newest frame, superseded ones are dropped and
+    counted, and with `watchdog` the last command is resent when a frame
+    got no reply before the tick budget ran out.
+
+    With `session` (the default) a '***restart***' from the server starts
+    the next race in the same process: the driver resets its per-race state
+    (TorcsDriver.init) and the init handshake runs again, while the
+    compiled controllers, caches, track map, socket and threads stay warm.
+    Without it the loop ends on restart, as on '***shutdown***'.
+
+    With `profiler` (profiler.SamplingProfiler), GET /profile?seconds=N on
+    the metrics port starts a capture of the running process.
+
+    `transport` (transports.py) carries the frames: scr_server's UDP text
+    protocol by default, or transports.ShmTransport(path) for binary frames
+    through the shared-memory ring of a simulator on this machine.
     """
-    def __init__(self, host='localhost', port=3001):
+    def __init__(self, host='localhost', port=3001, driver=None, recorder=None,
+                 metrics_port=None, stats_every=STATS_EVERY, tick_budget=TICK_BUDGET, watchdog=True,
+                 session=True, profiler=None, transport=None):
         self.host = host
         self.port = port
+        self.transport = transport if transport is not None else UdpTransport(host, port)
         self.sock = None
-        self.driver = TorcsDriver()
+        self.driver = driver if driver is not None else TorcsDriver()
+        if recorder is not None:
+            self.driver.recorder = recorder
+        self.state = CarState()
+        self.stats = LatencyStats()
+        self.timer = StageTimer()
+        self.driver.stage_timer = self.timer
+        self.deadline = TickBudget(tick_budget) if tick_budget is not None else None
+        self.driver.deadline = self.deadline
+        self.spikes = deque(maxlen=SPIKE_HISTORY)
+        self.metrics_port = metrics_port
+        self.stats_every = stats_every
+        # frame age (arrival -> reply sent) and the receiving side, set up by drive_loop()
+        self.frame_age = LatencyStats()
+        self.watchdog_budget = (tick_budget or TICK_BUDGET) - WATCHDOG_MARGIN if watchdog else None
+        self.mailbox = None
+        self.watchdog = None
+        # races driven in this session, and the time from '***restart***' to the next race's first command
+        self.session = session
+        self.race = 1
+        self.restart_latency = LatencyStats()
+        self.profiler = profiler
         self.log_car_state_count = 0
         self.log_car_control_count = 0
         self.steer_count = 0
 
     def connect(self):
-        """Creates a UDP socket and connects to the server."""
+        """Opens the transport (a connected UDP socket by default) to the server."""
         try:
-            self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            self.sock = self.transport.connect()
         except socket.error as msg:
             logger.error(f"Error: could not create socket: {msg}")
             sys.exit(1)
         
         # The scr_server doesn't send a confirmation, so we just assume connection.
-        logger.info(f"Socket created. Ready to send to {self.host}:{self.port}")
+        logger.info(f"Socket created. Ready to send to {self.transport}")
 
     def send_init_request(self):
         """Sends a correctly formatted initialization string to the server."""
-        # The init string must define the angles for the car's sensors.
-        # A standard set of 19 sensors, from -90 to +90 degrees.
-        angles = ' '.join(str(i) for i in range(-90, 91, 10))
-        init_str = f"SCR(init {angles})"
-        
         try:
-            self.sock.sendto(init_str.encode(), (self.host, self.port))
+            self.sock.send(build_init_request())
             logger.info("Initialization request sent.")
         except socket.error as msg:
             logger.error(f"Error: failed to send init request: {msg}")
             sys.exit(1)
 
     def parse_server_message(self, message):
-        """Parses a string of sensor data from the server."""
-        state = {}
-        # The message is a string of key-value pairs in parentheses
-        # e.g., (angle -0.00152959)(trackPos 0.001223)...
-        parts = message.strip().replace(')(', ' ').replace('(', '').replace(')', '').split()
-        
-        # This creates a dictionary like {'angle': -0.0015, 'trackPos': 0.0012, ...}
-        # It handles lists like 'track' and 'opponents' by creating sub-lists.
-        i = 0
-        while i < len(parts):
-            key = parts[i]
-            # Check if the next part is a value or another key (for lists)
-            if i + 1 < len(parts) and not parts[i+1].isalpha():
-                values = []
-                i += 1
-                while i < len(parts) and not parts[i].isalpha():
-                    try:
-                        values.append(float(parts[i]))
-                    except ValueError:
-                        break # Not a float, must be the next key
-                    i += 1
-                state[key] = values[0] if len(values) == 1 else values
-            else:
-                i += 1 # Key with no value
-        return state
+        """
+        Parses a string of sensor data from the server.
+
+        The sensors are decoded in place into self.state (a CarState), which
+        is reused across packets and behaves like the old dict
+        ({'angle': -0.0015, 'track': [...], ...}).
+        """
+        return self.state.parse(message)
 
     def format_control_command(self, car_control):
         """Formats driving commands into a string for the server."""
-        return f"(accel {car_control['accel']})(brake {car_control['brake']})(gear {car_control['gear']})(steer {car_control['steer']})"
+        return encode_control_command(car_control).decode()
     
+    def metrics_report(self):
+        """Text report of the tick latency, per-stage histograms and recent spikes."""
+        lines = [
+            f"car {self.host}:{self.port} tick {self.driver.tick}",
+            f"tick (parse -> send) {self.stats.summary()}",
+        ]
+        if self.deadline is not None:
+            lines.append(f"deadline {self.deadline.summary()}")
+        if self.mailbox is not None:
+            resent, late = (self.watchdog.resent, self.watchdog.late) if self.watchdog is not None else (0, 0)
+            lines.append(f"frames ({self.transport}) received={self.mailbox.received} dropped={self.mailbox.dropped} "
+                         f"resent={resent} late={late} | age at reply {self.frame_age.summary()}")
+        if self.race > 1:
+            lines.append(f"session race {self.race} | restart -> first command {self.restart_latency.summary()}")
+        if self.driver.incremental_counts():
+            lines.append(f"incremental evaluation {self.driver.incremental_summary()}")
+        if getattr(self.driver, 'rule_watcher', None) is not None:
+            lines.append(f"rules {self.driver.rule_watcher.summary()}")
+        if getattr(self.driver, 'opponent_tracker', None) is not None:
+            lines.append(f"opponents {self.driver.opponent_tracker.summary()}")
+        if self.profiler is not None:
+            lines.append(f"profiler {self.profiler.summary()}")
+        lines += [
+            "stages (receive includes waiting for the server):",
+            self.timer.report(),
+            f"spikes > {SPIKE_THRESHOLD * 1e3:.0f}ms (tick, distFromStart, ms):",
+        ]
+        lines += [f"  {tick} {dist:.1f} {elapsed * 1e3:.2f}" for tick, dist, elapsed in list(self.spikes)]
+        return '\n'.join(lines) + '\n'
+
+    def _server_unreachable(self):
+        # Nothing listening on the port yet (called on the receiving thread): retry the handshake
+        logger.info(f"scr_server not reachable on {self.host}:{self.port}, retrying...")
+        time.sleep(RECONNECT_DELAY)
+        self.send_init_request()
+
     def drive_loop(self):
-        """The main loop that receives data, decides action, and sends command."""
+        """
+        The main loop: takes the newest frame from the receiving thread,
+        decides the action and sends the command.
+        """
         logger.info("Starting drive loop. Press Ctrl+C to exit.")
         self.send_init_request()
-        
+
+        metrics_server = None
+        if self.metrics_port is not None:
+            commands = {'/profile': self.profiler.command} if self.profiler is not None else None
+            metrics_server = MetricsServer(self.metrics_report, self.metrics_port, commands=commands).start()
+            logger.info(f"Serving latency metrics on http://127.0.0.1:{self.metrics_port}/")
+
+        mailbox = self.mailbox = FrameMailbox()
+        receiver = Receiver(self.sock, mailbox, self._server_unreachable, name=f"receiver-{self.port}").start()
+        watchdog = None
+        if self.watchdog_budget is not None:
+            watchdog = Watchdog(self.sock, mailbox, self.watchdog_budget, name=f"watchdog-{self.port}").start()
+        self.watchdog = watchdog
+
+        timer = self.timer
+        deadline = self.deadline
+        next_dump = time.perf_counter() + self.stats_every
+        identified = False
+        restarted = None  # when the last '***restart***' arrived, until the new race's first command
         while True:
             try:
-                # Receive data from the server
-                message, addr = self.sock.recvfrom(1024)
-                message = message.decode()
-
-                # print(f"Server response: {message}")
+                # Wait for the newest frame (older ones still waiting were dropped)
+                timer.start()
+                frame = mailbox.take(None if identified else INIT_RETRY)
+                if frame is None:
+                    if mailbox.closed:
+                        break  # the receiving thread hit a socket error
+                    if not identified:
+                        self.send_init_request()  # the server may have missed it while (re)starting the race
+                    continue
+                start = time.perf_counter()
+                timer.lap('receive')
+                if deadline is not None:
+                    # the server's clock started when the datagram arrived, not when it was taken
+                    deadline.start(start, arrived=frame.received)
 
-                # The server sends '***shutdown***' or '***restart***' to end the race
-                if message == "***shutdown***" or message == "***restart***":
-                    logger.info(f"Server message: {message}. Exiting.")
-                    break
+                # Server notices ('***identified***', '***shutdown***', '***restart***')
+                if frame.notice is not None:
+                    message = frame.notice
+                    if message == "***identified***":
+                        identified = True
+                    elif message == "***restart***" and self.session:
+                        # Next race: reset only the per-race state and redo the handshake
+                        logger.info(f"Server message: {message}. Race {self.race} done, starting the next one.")
+                        logger.info(f"Latency [{self.port}]:\n{self.metrics_report()}")
+                        self.driver.init()
+                        mailbox.discard()  # a frame left over from the race that ended
+                        if watchdog is not None:
+                            watchdog.forget()
+                        self.race += 1
+                        identified = False
+                        restarted = start
+                        self.send_init_request()
+                        continue
+                    # The server sends '***shutdown***' or '***restart***' to end the race
+                    elif message == "***shutdown***" or message == "***restart***":
+                        logger.info(f"Server message: {message}. Exiting.")
+                        break
+                    logger.info(f"Server message: {message}")
+                    continue
+                identified = True
 
-                # Parse the sensor data
-                car_state = self.parse_server_message(message)
+                # Parse the sensor data in place, then give the buffer back to the receiver
+                car_state = self.transport.parse(self.state, frame.data, frame.length)
+                mailbox.release(frame)
+                timer.lap('parse')
+                if deadline is not None:
+                    deadline.done('parse')
 
+                # The driver laps its own stages (turn_classifier ... steering) on the same timer
                 car_control = self.driver.drive(car_state)
 
                 # Format and send the command
-                command = self.format_control_command(car_control)
-                self.sock.sendto(command.encode(), (self.host, self.port))
+                command = self.transport.encode(car_control)
+                timer.lap('format')
+                if deadline is not None:
+                    deadline.done('format')
+                if watchdog is None:
+                    self.sock.send(command)
+                else:
+                    # dropped if the watchdog already answered this frame (counted as late)
+                    watchdog.send(command, frame.seq)
+                end = time.perf_counter()
+                timer.lap('send')
+                if deadline is not None:
+                    deadline.done('send')
+                    deadline.finish()
+
+                if restarted is not None:
+                    self.restart_latency.add(end - restarted)
+                    logger.info(f"Race {self.race} started {(end - restarted) * 1e3:.1f}ms after the restart")
+                    restarted = None
+
+                elapsed = end - start
+                self.stats.add(elapsed)
+                self.frame_age.add(end - frame.received)
+                if elapsed > SPIKE_THRESHOLD:
+                    self.spikes.append((self.driver.tick, car_state.get('distFromStart', 0.0), elapsed))
+                if end >= next_dump:
+                    next_dump = end + self.stats_every
+                    logger.info(f"Latency [{self.port}]:\n{self.metrics_report()}")
 
             except socket.error as msg:
                 logger.error(f"Socket error: {msg}")
@@ -111,6 +287,13 @@ class TorcsClient:
             except KeyboardInterrupt:
                 logger.info("User interrupted. Shutting down.")
                 break
-        
+
+        receiver.stop()
+        if watchdog is not None:
+            watchdog.stop()
         self.sock.close()
-        logger.info("Connection closed.")
\ No newline at end of file
+        self.driver.on_shutdown()
+        if metrics_server is not None:
+            metrics_server.stop()
+        logger.info(f"Latency [{self.port}]:\n{self.metrics_report()}")
+        logger.info("Connection closed.")
@@ -6,22 +6,40 @@ from log import logger
 # Importando os módulos de Interpretation e Actions.
 # Ajuste os caminhos de import caso você tenha os pacotes montados (por exemplo: Interpretation.track)
 try:
+    from Interpretation import features as features_mod
     from Interpretation import track as track_mod
+    from Interpretation import track_map as track_map_mod
+    from Interpretation import opponents as opponents_mod
     from Interpretation import intention as intention_mod
     from Actions import accelaration as accel_mod
     from Actions import gear as gear_mod
     from Actions import steering as steering_mod
+    from Fuzzy import compiled as compiled_mod
+    from Fuzzy import incremental as incremental_mod
+    from Fuzzy import rulebase as rulebase_mod
 except Exception:
     # Fallback caso os módulos estejam no mesmo diretório (ou durante testes)
+    import features as features_mod
     import track as track_mod
+    import track_map as track_map_mod
+    import opponents as opponents_mod
     import intention as intention_mod
     import accelaration as accel_mod
     import gear as gear_mod
     import steering as steering_mod
+    import compiled as compiled_mod
+    import incremental as incremental_mod
+    import rulebase as rulebase_mod
 
 
 class TorcsDriver:
-    def __init__(self):
+    # Modelos fuzzy anexados ao driver que podem ser trocados pela versão compilada
+    FUZZY_MODELS = ('turn_classifier', 'accel_brake_ctrl', 'gear_ctrl', 'steering_aggressiveness_ctrl')
+
+    def __init__(self, compiled=True, resolution=compiled_mod.DEFAULT_RESOLUTION, models=None, cache=True,
+                 incremental=True, epsilons=None, max_staleness=incremental_mod.MAX_STALENESS, mfs=None,
+                 track_map=True, track_name=None, opponents=True, rules=None, watch_rules=False,
+                 analytic=False):
         self.name = "PilotoNebuloso"
         self.author = "Rafael | Kaio"
         self.version = "1.1"
@@ -39,25 +57,175 @@ class TorcsDriver:
         self._last_classification = None
         self._last_severity = 0.0 # Classificação da 'severidade' da curva
         self._last_intention = 0.0 # Classificação da 'intenção' aumentar ou diminuir a velocidade
+        # Características da pista do tick atual (Interpretation/features.py), lidas por todos os controladores
+        self.features = None
+        self._dist_to_turn = features_mod.SENSOR_RANGE
 
         # Parâmetros de largada
         self.LAUNCH_DIST_THRESHOLD = 5.0
         self.LAUNCH_MAX_SPEED = 5.0
         self.LAUNCH_STEER_AGGRESSIVENESS = 0.25
+        # Agressividade do steering fora da largada. None deixaria o fuzzy de
+        # agressividade (speed, severity, dist_to_turn) decidir, mas ele reduz o
+        # steer perto das curvas, onde o controlador por medianas mais precisa:
+        # no simulador o carro sai de traçado (oval: 1978 m em vez de 3531 m em 4000 ticks)
+        self.STEER_AGGRESSIVENESS = 1.0
+
+        # Gravador de telemetria opcional (telemetry.TelemetryRecorder), um registro por tick
+        self.recorder = None
+        # Cronômetro opcional por etapa do drive() (metrics.StageTimer)
+        self.stage_timer = None
+        # Orçamento de tempo opcional do tick (deadline.TickBudget): etapas que
+        # não cabem no tempo restante usam a alternativa barata (ver drive())
+        self.deadline = None
+
+        # Mapa da pista por distFromStart (Interpretation/track_map.py), gravado na
+        # primeira volta; com track_name é salvo em disco e reaberto nas próximas corridas
+        self.track_map = track_map_mod.TrackMap(track_name) if track_map else None
+        # Tráfego (Interpretation/opponents.py): ultrapassagem no steering e frenagem no accel/brake
+        self.opponent_tracker = opponents_mod.OpponentTracker() if opponents else None
+        self.traffic = opponents_mod.Traffic()
+
+        self.compiled_max_error = {}
+        # Arquivo das bases de regras (Fuzzy/rules.json por padrão, ver Fuzzy/rulebase.py)
+        self.rules_path = rules or rulebase_mod.RULES_PATH
+        # analytic: inferência em forma fechada (Fuzzy/analytic.py) em vez de tabelas/skfuzzy
+        self.analytic = analytic
+        self._build_models(compiled, resolution, models, cache, mfs or {})
+
+        # Recarga das regras sem reiniciar: watch_rules=True observa o arquivo numa
+        # thread que recompila os modelos quando ele muda, e drive() troca os
+        # controladores entre dois ticks (apply_rules()). Um RuleWatcher já criado
+        # pode ser compartilhado entre drivers (watch_rules=outro_driver.rule_watcher)
+        if watch_rules is True:
+            watch_rules = rulebase_mod.RuleWatcher(self.rules_path, compiled, resolution, mfs, cache, analytic).start()
+        self.rule_watcher = watch_rules or None
+        # modelos recebidos prontos podem ser anteriores às recargas já feitas: começa da
+        # geração 0 e o primeiro apply_rules() traz tudo o que o watcher recompilou
+        self._rules_generation = 0
+        if self.rule_watcher is not None and models is None:
+            self._rules_generation = self.rule_watcher.latest[0]
+
+        # Avaliação incremental: cada modelo só é recalculado quando suas entradas
+        # mudam mais que o epsilon (ou a saída fica velha demais), ver Fuzzy/incremental.py
+        if incremental:
+            for attr in self.FUZZY_MODELS:
+                if hasattr(self, attr):
+                    setattr(self, attr, incremental_mod.IncrementalSimulation(
+                        getattr(self, attr), epsilons, max_staleness))
+        self._lap_counts = self.incremental_counts()
+        self._cur_lap_time = 0.0
+
+    def _build_models(self, compiled, resolution, models, cache, mfs):
+        if models is not None:
+            # Reutiliza modelos já construídos por outro driver (ex.: vários carros
+            # no mesmo processo): tabelas compartilhadas, mas input/output de cada
+            # driver, já que os carros de um worker rodam em threads (rulebase.instance)
+            for attr, model in models.items():
+                setattr(self, attr, rulebase_mod.instance(model))
+            return
 
-        # Construir modelos fuzzy nos módulos
-        # Cada módulo adiciona atributos ao objeto (ex.: self.turn_classifier, self.accel_brake_ctrl...)
-        track_mod.turn_classifier_model(self)
-        accel_mod.accel_brake_model(self)
-        gear_mod.build_gear_model(self)
-        # steering não precisa de modelo, é calculo direto
+        # Construir os modelos fuzzy a partir do arquivo de regras: self.turn_classifier,
+        # self.accel_brake_ctrl, ... (a agressividade do steering também, e não no primeiro tick)
+        # mfs: {modelo: {'variável.termo': [a, b, c]}} troca vértices das funções de pertinência (tuning.py)
+        # Com compiled, os ControlSystemSimulation viram tabelas de interpolação pré-calculadas;
+        # com cache, tabelas já compiladas em disco (Fuzzy/cache.py) são carregadas sem nem importar o skfuzzy
+        built = rulebase_mod.build_models(rulebase_mod.load(self.rules_path), compiled, resolution, mfs, cache,
+                                          self.analytic)
+        for attr, model in built.items():
+            setattr(self, attr, model)
+            if isinstance(model, compiled_mod.CompiledSimulation):
+                self.compiled_max_error[attr] = model.max_error
+
+    def fuzzy_models(self):
+        """Modelos fuzzy deste driver, para compartilhar com TorcsDriver(models=...)."""
+        models = {}
+        for attr in self.FUZZY_MODELS:
+            if hasattr(self, attr):
+                model = getattr(self, attr)
+                # o estado incremental é de cada carro: compartilha só o modelo envolvido
+                if isinstance(model, incremental_mod.IncrementalSimulation):
+                    model = model.model
+                models[attr] = model
+        return models
+
+    def apply_rules(self):
+        """
+        Troca os controladores pelos que o RuleWatcher recompilou, se houver
+        uma geração nova; chamado no começo de drive(), entre dois ticks.
+        """
+        generation, models, mtime = self.rule_watcher.latest
+        if generation == self._rules_generation:
+            return False
+        self._rules_generation = generation
+        for attr, model in models.items():
+            # o RuleWatcher pode ser compartilhado entre drivers: cada um com seu input/output
+            model = rulebase_mod.instance(model)
+            current = getattr(self, attr, None)
+            if isinstance(current, incremental_mod.IncrementalSimulation):
+                # mantém os contadores da avaliação incremental; a saída guardada é do modelo antigo
+                current.model = model
+                current.reset()
+            else:
+                setattr(self, attr, model)
+            if isinstance(model, compiled_mod.CompiledSimulation):
+                self.compiled_max_error[attr] = model.max_error
+        self.rule_watcher.swapped(mtime)
+        logger.info(f"Controladores trocados no tick {self.tick} (regras, geração {generation}): "
+                    f"{self.rule_watcher.summary()}")
+        return True
+
+    def incremental_counts(self):
+        """{modelo: (avaliações, reaproveitamentos)} desde o início (avaliação incremental)."""
+        return {
+            attr: (model.computes, model.skips)
+            for attr, model in ((attr, getattr(self, attr, None)) for attr in self.FUZZY_MODELS)
+            if isinstance(model, incremental_mod.IncrementalSimulation)
+        }
+
+    def incremental_summary(self, since=None):
+        since = since or {}
+        parts = []
+        for attr, (computes, skips) in self.incremental_counts().items():
+            computes -= since.get(attr, (0, 0))[0]
+            skips -= since.get(attr, (0, 0))[1]
+            total = computes + skips
+            parts.append(f"{attr}={skips}/{total} ({skips / total if total else 0.0:.0%})")
+        return "skipped " + ' '.join(parts)
 
     def init(self):
+        """
+        Nova corrida (***restart***): zera só o estado da corrida. Modelos
+        compilados, caches e o mapa da pista continuam carregados.
+        """
         self.gear = 1
         self.accel = 0.0
         self.brake = 0.0
         self.steering = 0.0
+        self.last_steer = 0
         self.tick = 0
+        # a histerese da marcha conta ticks, que recomeçam do zero
+        self._last_gear_change_tick = -gear_mod.MIN_TICKS
+        self._last_classification = None
+        self._last_severity = 0.0
+        self._last_intention = 0.0
+        self.features = None
+        self._dist_to_turn = features_mod.SENSOR_RANGE
+        if self.track_map is not None:
+            self.track_map.reset()
+        if self.opponent_tracker is not None:
+            self.opponent_tracker.reset()
+        self.traffic = opponents_mod.Traffic()
+        # saídas reaproveitadas da corrida anterior não valem mais
+        for attr in self.FUZZY_MODELS:
+            model = getattr(self, attr, None)
+            if isinstance(model, incremental_mod.IncrementalSimulation):
+                model.reset()
+        self._lap_counts = self.incremental_counts()
+        self._cur_lap_time = 0.0
+        # nova corrida: a telemetria vai para um novo arquivo
+        if self.recorder is not None:
+            self.recorder.rotate()
 
     def is_launch(self, sensors):
         try:
@@ -69,7 +237,7 @@ class TorcsDriver:
             if speed <= self.LAUNCH_MAX_SPEED and rpm > 1500:
                 return True
         except Exception as e:
-            logger.debug(f"is_launch heuristics error: {e}")
+            logger.debug("is_launch heuristics error: %s", e)
         return False
 
     # Handlers que chamam os módulos Actions
@@ -78,7 +246,7 @@ class TorcsDriver:
             steer = steering_mod.steering_controller(self, sensors, aggressiveness)
             self.steering = float(np.clip(steer, -1.0, 1.0))
         except Exception as e:
-            logger.warning(f"steering_handler error: {e}")
+            logger.warning("steering_handler error: %s", e)
             # mantém ultimo valor
             self.steering = float(np.clip(self.steering, -1.0, 1.0))
 
@@ -87,9 +255,9 @@ class TorcsDriver:
             accel, brake = accel_mod.accel_brake_controller(self, sensors)
             self.accel = float(np.clip(accel, 0.0, 1.0))
             self.brake = float(np.clip(brake, 0.0, 1.0))
-            logger.debug(f"[ACCEL] intention={self._last_intention:.2f} -> accel={self.accel:.2f} brake={self.brake:.2f}")
+            logger.debug("[ACCEL] intention=%.2f -> accel=%.2f brake=%.2f", self._last_intention, self.accel, self.brake)
         except Exception as e:
-            logger.warning(f"accel_brake_handler error: {e}")
+            logger.warning("accel_brake_handler error: %s", e)
             self.accel = 0.0
             self.brake = 0.0
 
@@ -105,37 +273,120 @@ class TorcsDriver:
             if suggested is not None:
                 self.gear = int(suggested)
         except Exception as e:
-            logger.warning(f"gear_handler error: {e}")
+            logger.warning("gear_handler error: %s", e)
+
+    # Alternativas baratas, usadas quando o orçamento do tick não comporta a etapa
+    def accel_brake_fallback(self, sensors):
+        # sem o fuzzy: converte direto a intenção já interpretada neste tick
+        intention = self._last_intention
+        self.accel = float(np.clip(intention, 0.0, 1.0))
+        self.brake = float(np.clip(-intention, 0.0, 1.0))
+
+    def gear_fallback(self, sensors):
+        if self.is_launch(sensors):
+            self.gear = 1
+            return
+        try:
+            self.gear = int(gear_mod.gear_by_rpm(self, sensors))
+        except Exception as e:
+            logger.warning("gear_fallback error: %s", e)
+
+    def steering_fallback(self, sensors):
+        # mantém a última direção calculada (como nos ticks entre atualizações do steering_controller)
+        self.steering = float(np.clip(self.steering, -1.0, 1.0))
+
+    def _run(self, stage):
+        # True se a etapa cabe no orçamento do tick (ou se não há orçamento)
+        return self.deadline is None or self.deadline.allow(stage)
+
+    def _lap(self, stage, ran=True):
+        if self.stage_timer is not None:
+            self.stage_timer.lap(stage)
+        if self.deadline is not None:
+            self.deadline.done(stage, ran)
 
     # Orquestração principal
     def drive(self, sensors):
+        # regras recompiladas: troca antes de começar o tick, nunca no meio dele
+        if self.rule_watcher is not None:
+            self.apply_rules()
         self.tick += 1
+        # volta completada (curLapTime recomeça): quanto a avaliação incremental economizou nela
+        lap_time = sensors.get('curLapTime', 0.0)
+        if lap_time < self._cur_lap_time and self._lap_counts:
+            logger.info("Lap done, incremental evaluation %s", self.incremental_summary(self._lap_counts))
+            self._lap_counts = self.incremental_counts()
+        self._cur_lap_time = lap_time
+        if self.stage_timer is not None:
+            self.stage_timer.start()
 
-        # 1) interpretar pista
+        # 0) características da pista, uma vez por tick (sempre roda: os controladores dependem dela)
         try:
-            cls, sev = track_mod.turn_classifier_controller(self, sensors)
-            # armazenar
-            self._last_classification = cls
-            self._last_severity = float(sev)
+            features_mod.track_features(self, sensors)
         except Exception as e:
-            logger.warning(f"track interpretation error: {e}")
-            self._last_classification, self._last_severity = 'straight', 0.0
+            logger.warning("track features error: %s", e)
+            self.features = features_mod.TrackFeatures(self.tick)
+        self._lap('features')
 
-        # 2) interpretar intenção (baseado em classificação e severidade)
-        try:
-            intention_mod.intention_interpreter(self, sensors)
-            # intention_interpreter guarda em self._last_intention
-        except Exception as e:
-            logger.warning(f"intention interpretation error: {e}")
-            self._last_intention = 0.0
+        # adversários (sem tempo: mantém a leitura do tick anterior)
+        if self.opponent_tracker is not None:
+            ran = self._run('opponents')
+            if ran:
+                try:
+                    room = opponents_mod.passing_room(self, sensors)
+                    self.traffic = self.opponent_tracker.update(sensors, self.tick, room)
+                except Exception as e:
+                    logger.warning("opponents error: %s", e)
+                    self.traffic = opponents_mod.Traffic(self.tick)
+            self._lap('opponents', ran)
+
+        # 1) interpretar pista (sem tempo: mantém a classificação anterior)
+        ran = self._run('turn_classifier')
+        if ran:
+            try:
+                cls, sev = track_mod.turn_classifier_controller(self, sensors)
+                # armazenar
+                self._last_classification = cls
+                self._last_severity = float(sev)
+            except Exception as e:
+                logger.warning("track interpretation error: %s", e)
+                self._last_classification, self._last_severity = 'straight', 0.0
+        if self.track_map is not None and not self.track_map.ready:
+            self.track_map.observe(sensors, self.features, self._last_severity)
+        self._lap('turn_classifier', ran)
+
+        # 2) interpretar intenção (baseado em classificação e severidade; sem tempo: mantém a anterior)
+        ran = self._run('intention')
+        if ran:
+            try:
+                intention_mod.intention_interpreter(self, sensors)
+                # intention_interpreter guarda em self._last_intention
+            except Exception as e:
+                logger.warning("intention interpretation error: %s", e)
+                self._last_intention = 0.0
+        self._lap('intention', ran)
 
         # 3) actions: accel/brake, gear, steering
         is_launch = self.is_launch(sensors)
-        aggress = self.LAUNCH_STEER_AGGRESSIVENESS if is_launch else 1.0
+        aggress = self.LAUNCH_STEER_AGGRESSIVENESS if is_launch else self.STEER_AGGRESSIVENESS
 
-        self.accel_brake_handler(sensors)
-        self.gear_handler(sensors)
-        self.steering_handler(sensors, aggressiveness=aggress)
+        ran = self._run('accel_brake')
+        if ran:
+            self.accel_brake_handler(sensors)
+        else:
+            self.accel_brake_fallback(sensors)
+        self._lap('accel_brake', ran)
+        ran = self._run('gear')
+        if ran:
+            self.gear_handler(sensors)
+        else:
+            self.gear_fallback(sensors)
+        self._lap('gear', ran)
+        ran = self._run('steering')
+        if ran:
+            self.steering_handler(sensors, aggressiveness=aggress)
+        else:
+            self.steering_fallback(sensors)
         
         actual_steer = self.last_steer * 0.5 + self.steering * 0.5
 
@@ -147,8 +398,13 @@ class TorcsDriver:
         }
         
         self.last_steer = actual_steer
-        
+        self._lap('steering', ran)
+
+        if self.recorder is not None:
+            self.recorder.record(self, sensors, control)
+
         return control
 
     def on_shutdown(self):
-        pass
+        if self.recorder is not None:
+            self.recorder.close()
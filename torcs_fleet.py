@@ -0,0 +1,246 @@
+# torcs_fleet.py
+# Multi-process fleet runner: the fuzzy controllers are built once in the parent
+# and inherited copy-on-write by forked workers, each driving a set of ports.
+
+import argparse
+import gc
+import multiprocessing
+import os
+import queue
+import signal
+import sys
+import threading
+import time
+
+from torcs_driver import TorcsDriver
+from torcs_client import TorcsClient
+from telemetry import TelemetryRecorder
+import profiler
+from log import logger
+
+# Seconds between stats messages sent by each worker (and fleet reports)
+STATS_EVERY = 10.0
+# How often workers and the supervisor wake up to check on their children
+POLL_INTERVAL = 0.2
+# Seconds to wait before restarting a crashed worker
+RESTART_DELAY = 1.0
+# Restarts allowed per worker before it is given up
+MAX_RESTARTS = 5
+
+
+def assign_ports(ports, workers):
+    """Splits `ports` round-robin into at most `workers` non-empty groups."""
+    workers = max(1, min(workers, len(ports)))
+    return [list(ports[i::workers]) for i in range(workers)]
+
+
+def _worker_main(worker_id, host, ports, models, stats_queue, stats_every, record_dir=None):
+    """
+    Worker process body: one TorcsClient.drive_loop per port (a thread each,
+    they spend their time blocked in recv), all sharing the parent's model
+    tables (each driver gets its own input/output, see rulebase.instance).
+    Exits 0 when every race ended, 1 if any client crashed.
+    """
+    # Ctrl+C reaches the whole process group; the parent stops the workers
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    # kill -USR1 <worker pid> profiles this worker's cars (profiler.py)
+    profiler.install()
+
+    clients = [
+        TorcsClient(
+            host, port, driver=TorcsDriver(models=models),
+            recorder=TelemetryRecorder(record_dir, prefix=f"car{port}") if record_dir else None,
+        )
+        for port in ports
+    ]
+    failed = []
+
+    def run(client):
+        try:
+            client.connect()
+            client.drive_loop()
+        except BaseException:
+            logger.exception(f"[worker {worker_id}] Client on port {client.port} crashed")
+            failed.append(client.port)
+
+    threads = [threading.Thread(target=run, args=(c,), name=f"car-{c.port}", daemon=True) for c in clients]
+    for t in threads:
+        t.start()
+
+    def report():
+        stats_queue.put((worker_id, {c.port: c.stats.snapshot() for c in clients}))
+
+    last_report = time.monotonic()
+    while not failed and any(t.is_alive() for t in threads):
+        time.sleep(POLL_INTERVAL)
+        if time.monotonic() - last_report >= stats_every:
+            report()
+            last_report = time.monotonic()
+    report()
+    # daemon threads of the other cars die with the process
+    sys.exit(1 if failed else 0)
+
+
+class FleetRunner:
+    """
+    Drives many scr_server ports from a pool of forked processes.
+
+    The TorcsDriver models (compiled fuzzy tables) are built once, before
+    forking, and the GC is frozen so the workers share those pages with the
+    parent instead of each one paying the ~3s startup and its own copy.
+    The parent supervises the workers: a worker that exits with an error is
+    restarted (up to `max_restarts` times), one that exits cleanly is done.
+    Per-car latency snapshots are aggregated into fleet throughput/latency.
+    """
+
+    def __init__(self, host='localhost', ports=(3001,), workers=None,
+                 stats_every=STATS_EVERY, max_restarts=MAX_RESTARTS, record_dir=None):
+        self.host = host
+        self.record_dir = record_dir
+        self.ports = list(ports)
+        self.groups = assign_ports(self.ports, workers or os.cpu_count() or 1)
+        self.stats_every = stats_every
+        self.max_restarts = max_restarts
+        self.models = None
+        self.processes = {}
+        self.restarts = {i: 0 for i in range(len(self.groups))}
+        # latest snapshot per port, and counts carried over from dead workers
+        self.latest = {}
+        self.retired = {}
+        self._last_total = 0
+        self._last_time = None
+
+    def prewarm(self):
+        """Builds the shared controllers in the parent (done once, before forking)."""
+        if self.models is None:
+            start = time.perf_counter()
+            self.models = TorcsDriver().fuzzy_models()
+            logger.info(f"Fleet controllers built in {time.perf_counter() - start:.2f}s")
+        return self.models
+
+    def start_worker(self, worker_id):
+        process = self._context.Process(
+            target=_worker_main,
+            args=(worker_id, self.host, self.groups[worker_id], self.models, self._queue, self.stats_every,
+                  self.record_dir),
+            name=f"torcs-worker-{worker_id}",
+        )
+        process.start()
+        self.processes[worker_id] = process
+        logger.info(f"Worker {worker_id} (pid {process.pid}) driving ports {self.groups[worker_id]}")
+
+    def run(self):
+        # fork, not spawn: the children must inherit the prebuilt models
+        self._context = multiprocessing.get_context('fork')
+        self._queue = self._context.Queue()
+        self.prewarm()
+        # move everything built so far out of the GC's reach: collections in
+        # the children would otherwise write to (and copy) the shared pages
+        gc.freeze()
+
+        for worker_id in range(len(self.groups)):
+            self.start_worker(worker_id)
+        self._last_time = time.monotonic()
+
+        pending = {}  # worker_id -> time at which to restart it
+        try:
+            while self.processes or pending:
+                self._drain(POLL_INTERVAL)
+                now = time.monotonic()
+                for worker_id, process in list(self.processes.items()):
+                    if process.is_alive():
+                        continue
+                    process.join()
+                    del self.processes[worker_id]
+                    self._drain(0)
+                    self._retire(worker_id)
+                    if process.exitcode == 0:
+                        logger.info(f"Worker {worker_id} finished")
+                    elif self.restarts[worker_id] < self.max_restarts:
+                        self.restarts[worker_id] += 1
+                        logger.warning(
+                            f"Worker {worker_id} died (exit code {process.exitcode}), "
+                            f"restart {self.restarts[worker_id]}/{self.max_restarts}"
+                        )
+                        pending[worker_id] = now + RESTART_DELAY
+                    else:
+                        logger.error(f"Worker {worker_id} died (exit code {process.exitcode}), giving up")
+                for worker_id, when in list(pending.items()):
+                    if now >= when:
+                        del pending[worker_id]
+                        self.start_worker(worker_id)
+                if now - self._last_time >= self.stats_every:
+                    self.report()
+        except KeyboardInterrupt:
+            logger.info("User interrupted. Stopping workers.")
+        finally:
+            for process in self.processes.values():
+                process.terminate()
+            for process in self.processes.values():
+                process.join()
+            self._drain(0)
+            gc.unfreeze()
+            self.report()
+
+    def _drain(self, timeout):
+        """Reads worker snapshots, blocking at most `timeout` for the first one."""
+        try:
+            while True:
+                _, snapshots = self._queue.get(timeout=timeout) if timeout else self._queue.get_nowait()
+                self.latest.update(snapshots)
+                timeout = 0
+        except queue.Empty:
+            pass
+
+    def _retire(self, worker_id):
+        # a restarted worker starts its stats from zero: keep what it had done
+        for port in self.groups[worker_id]:
+            snapshot = self.latest.pop(port, None)
+            if snapshot is None:
+                continue
+            carried = self.retired.setdefault(port, {'count': 0, 'total': 0.0, 'max': 0.0, 'p50': 0.0, 'p99': 0.0})
+            carried['count'] += snapshot['count']
+            carried['total'] += snapshot['total']
+            for key in ('max', 'p50', 'p99'):
+                carried[key] = max(carried[key], snapshot[key])
+
+    def totals(self):
+        """Fleet-wide counts: ticks, mean/max latency and the worst car's p50/p99."""
+        snapshots = list(self.latest.values()) + list(self.retired.values())
+        count = sum(s['count'] for s in snapshots)
+        total = sum(s['total'] for s in snapshots)
+        worst = {key: max((s[key] for s in snapshots), default=0.0) for key in ('max', 'p50', 'p99')}
+        return dict(worst, ticks=count, mean=total / count if count else 0.0)
+
+    def report(self):
+        totals = self.totals()
+        now = time.monotonic()
+        elapsed = now - self._last_time if self._last_time is not None else 0.0
+        rate = (totals['ticks'] - self._last_total) / elapsed if elapsed > 0 else 0.0
+        self._last_total = totals['ticks']
+        self._last_time = now
+        logger.info(
+            f"Fleet: {len(self.processes)}/{len(self.groups)} workers alive, {len(self.ports)} cars, "
+            f"{rate:.0f} ticks/s, ticks={totals['ticks']} mean={totals['mean'] * 1e6:.0f}us "
+            f"worst p50={totals['p50'] * 1e6:.0f}us worst p99={totals['p99'] * 1e6:.0f}us "
+            f"max={totals['max'] * 1e6:.0f}us"
+        )
+        return totals
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Drive several scr_server cars from a pool of processes.")
+    parser.add_argument('--host', default='localhost')
+    parser.add_argument('--port', type=int, default=3001, help="first scr_server port")
+    parser.add_argument('--cars', type=int, default=1)
+    parser.add_argument('--workers', type=int, default=None, help="processes (default: one per CPU)")
+    parser.add_argument('--max-restarts', type=int, default=MAX_RESTARTS)
+    parser.add_argument('--record', metavar='DIR', default=None, help="record per-tick telemetry into DIR")
+    args = parser.parse_args()
+
+    ports = range(args.port, args.port + args.cars)
+    FleetRunner(args.host, ports, args.workers, max_restarts=args.max_restarts, record_dir=args.record).run()
+
+
+if __name__ == '__main__':
+    main()
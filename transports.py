@@ -0,0 +1,303 @@
+# transports.py
+# How TorcsClient exchanges frames with the server: scr_server's text
+# datagrams over UDP, or binary frames through a shared-memory ring pair
+# for a simulator on the same machine (Simulator/server.py --shm).
+#
+# A transport's connect() returns a socket-like endpoint (send, recv_into,
+# settimeout, close) that the receiving thread, the watchdog and the drive
+# loop use unchanged, and the transport turns frames into a CarState
+# (parse) and controls into frames (encode).
+#
+# The shared-memory file holds two single-producer single-consumer rings,
+# one per direction, of SLOTS fixed-size slots:
+#
+#   ring header   write count (u64) | 56 pad | read count (u64) | 56 pad
+#   slot          length (u32) | 4 pad | payload (SLOT_SIZE - 8 bytes)
+#
+# The producer copies the payload into slot write % SLOTS and then bumps
+# the write count; the consumer copies it out and bumps the read count. No
+# system call is made per frame while both sides keep up: an idle side
+# spins on the counter (on several cores), then yields the CPU
+# (sched_yield) and finally sleeps IDLE_SLEEP between checks, so a paused
+# race does not burn a core. Payloads are the fixed binary layouts
+# car_state.SENSOR_FRAME (b'S...') and control_command.CONTROL_FRAME
+# (b'C...'); the init request and the server notices ('***identified***',
+# ...) stay text, so the receiving thread tells them apart by the first
+# byte as with UDP.
+#
+# The counters are written after the payload and read before it, with no
+# fence: Python has none to offer. The consumer relies on the CPU making
+# one core's stores visible to another in program order, which x86 (total
+# store order) guarantees and ARM or POWER do not: there a consumer could
+# see the new count before the payload. ShmChannel therefore refuses other
+# architectures (ORDERED_MACHINES); use the UDP transport on them.
+
+import mmap
+import os
+import platform
+import socket
+import struct
+import threading
+import time
+
+from control_command import encode_control_command, encode_control_frame
+from log import logger
+
+# Slots per ring and bytes per slot (8-byte slot header + payload)
+SLOTS = 8
+SLOT_SIZE = 1024
+# Counter checks before an idle side starts yielding (none on a single core: the
+# other side can only run once this one gives the CPU up), and seconds idle
+# before it sleeps between checks
+SPIN = 200 if len(os.sched_getaffinity(0) if hasattr(os, 'sched_getaffinity') else range(os.cpu_count() or 1)) > 1 else 0
+IDLE_AFTER = 0.001
+# Seconds slept between checks once idle
+IDLE_SLEEP = 0.0002
+# Seconds between checks while waiting for the simulator to create the ring file
+OPEN_RETRY = 0.5
+# platform.machine() of the CPUs whose store ordering the rings rely on (x86)
+ORDERED_MACHINES = ('x86_64', 'amd64', 'i386', 'i686', 'x86')
+
+_COUNT = struct.Struct('<Q')
+_read_count = _COUNT.unpack_from
+_write_count = _COUNT.pack_into
+_LENGTH = struct.Struct('<I')
+_READ_OFFSET = 64
+_RING_HEADER = 128
+_SLOT_HEADER = 8
+
+
+def ring_path(port, directory='/dev/shm'):
+    """Default ring file of a simulator port (the directory must be on a RAM-backed filesystem to avoid disk I/O)."""
+    if not os.path.isdir(directory):
+        directory = os.environ.get('TMPDIR', '/tmp')
+    return os.path.join(directory, f"torcs-{port}.ring")
+
+
+def require_ordered_stores():
+    """Raises RuntimeError unless this CPU keeps stores in order (see the ordering note at the top)."""
+    machine = platform.machine()
+    if machine.lower() not in ORDERED_MACHINES:
+        raise RuntimeError(f"shared-memory rings need x86 store ordering, not available on {machine!r}: "
+                           f"use the UDP transport")
+
+
+class ShmRing:
+    """
+    One direction of a ShmChannel: put() from one thread or process,
+    get_into() from one other. put() returns False when the ring stayed
+    full for `timeout` seconds (the consumer is gone or stuck).
+    """
+
+    def __init__(self, buffer, offset, slots=SLOTS, slot_size=SLOT_SIZE):
+        self.buffer = buffer
+        self.write_at = offset
+        self.read_at = offset + _READ_OFFSET
+        self.slots_at = offset + _RING_HEADER
+        self.slots = slots
+        self.slot_size = slot_size
+        self.capacity = slot_size - _SLOT_HEADER
+
+    @classmethod
+    def size(cls, slots=SLOTS, slot_size=SLOT_SIZE):
+        return _RING_HEADER + slots * slot_size
+
+    def reset(self):
+        _COUNT.pack_into(self.buffer, self.write_at, 0)
+        _COUNT.pack_into(self.buffer, self.read_at, 0)
+
+    def pending(self):
+        return _read_count(self.buffer, self.write_at)[0] - _read_count(self.buffer, self.read_at)[0]
+
+    def put(self, data, timeout=None):
+        length = len(data)
+        if length > self.capacity:
+            raise ValueError(f"frame of {length} bytes does not fit a {self.slot_size}-byte slot")
+        buffer = self.buffer
+        written = _read_count(buffer, self.write_at)[0]
+        if written - _read_count(buffer, self.read_at)[0] >= self.slots:
+            if not wait_until(lambda: written - _read_count(buffer, self.read_at)[0] < self.slots, timeout):
+                return False
+        slot = self.slots_at + (written % self.slots) * self.slot_size
+        buffer[slot + _SLOT_HEADER:slot + _SLOT_HEADER + length] = data
+        _LENGTH.pack_into(buffer, slot, length)
+        _write_count(buffer, self.write_at, written + 1)
+        return True
+
+    def get_into(self, target):
+        """Copies the oldest frame into `target` and returns its length, or None if the ring is empty."""
+        buffer = self.buffer
+        read = _read_count(buffer, self.read_at)[0]
+        if _read_count(buffer, self.write_at)[0] == read:
+            return None
+        slot = self.slots_at + (read % self.slots) * self.slot_size
+        length = _LENGTH.unpack_from(buffer, slot)[0]
+        start = slot + _SLOT_HEADER
+        target[:length] = buffer[start:start + length]
+        _write_count(buffer, self.read_at, read + 1)
+        return length
+
+
+_yield = getattr(os, 'sched_yield', lambda: time.sleep(0.0))
+
+
+def wait_until(ready, timeout=None):
+    """Polls ready() without system calls at first, then yielding, then sleeping; False on timeout."""
+    clock = time.perf_counter
+    start = clock()
+    spins = 0
+    while not ready():
+        spins += 1
+        if spins < SPIN:
+            continue
+        now = clock()
+        if timeout is not None and now - start >= timeout:
+            return False
+        if now - start < IDLE_AFTER:
+            _yield()
+        else:
+            time.sleep(IDLE_SLEEP)
+    return True
+
+
+class ShmChannel:
+    """
+    The memory-mapped ring file shared by a simulator and one client:
+    `to_client` carries sensor frames and notices, `to_server` the init
+    request and the controls. The simulator creates (and resets) it with
+    create=True and removes it on close(); the client maps the existing file.
+    Raises RuntimeError off x86 (see the ordering note at the top).
+    """
+
+    def __init__(self, path, create=False, slots=SLOTS, slot_size=SLOT_SIZE):
+        require_ordered_stores()
+        self.path = path
+        self.owner = create
+        size = 2 * ShmRing.size(slots, slot_size)
+        fd = os.open(path, os.O_RDWR | (os.O_CREAT if create else 0), 0o600)
+        try:
+            if create:
+                os.ftruncate(fd, size)
+            elif os.fstat(fd).st_size != size:
+                raise OSError(f"{path} is not a ring of {slots} x {slot_size} bytes")
+            self.mm = mmap.mmap(fd, size)
+        finally:
+            os.close(fd)
+        # slices of a memoryview copy once (into the receive buffer), slices of the mmap twice
+        self.view = memoryview(self.mm)
+        self.to_client = ShmRing(self.view, 0, slots, slot_size)
+        self.to_server = ShmRing(self.view, ShmRing.size(slots, slot_size), slots, slot_size)
+        if create:
+            self.to_client.reset()
+            self.to_server.reset()
+
+    def close(self):
+        self.view.release()
+        self.mm.close()
+        if self.owner:
+            try:
+                os.unlink(self.path)
+            except OSError:
+                pass
+
+
+class ShmEndpoint:
+    """
+    Socket-like end of a ShmChannel: send()/recv_into() for the client,
+    sendto()/recvfrom() for the simulator (the address is ignored). A
+    receive with nothing to read raises socket.timeout after the timeout
+    set with settimeout(), like a socket. send() is locked so the drive
+    loop and the watchdog can both send on the single-producer ring.
+    """
+
+    def __init__(self, channel, inbox, outbox):
+        self.channel = channel
+        self.inbox = inbox
+        self.outbox = outbox
+        self.timeout = None
+        self._lock = threading.Lock()
+
+    def settimeout(self, timeout):
+        self.timeout = timeout
+
+    def send(self, data):
+        with self._lock:
+            if not self.outbox.put(data, self.timeout):
+                raise socket.timeout("shared-memory ring full")
+        return len(data)
+
+    def sendto(self, data, address=None):
+        return self.send(data)
+
+    def recv_into(self, buffer, nbytes=0):
+        inbox = self.inbox
+        length = inbox.get_into(buffer)
+        if length is None:
+            if not wait_until(lambda: inbox.pending() > 0, self.timeout):
+                raise socket.timeout("timed out")
+            length = inbox.get_into(buffer)
+        return length
+
+    def recvfrom(self, size):
+        buffer = bytearray(self.inbox.capacity)
+        length = self.recv_into(buffer)
+        return bytes(buffer[:length]), None
+
+    def close(self):
+        self.channel.close()
+
+
+class UdpTransport:
+    """scr_server's protocol: text datagrams on a connected UDP socket."""
+
+    def __init__(self, host='localhost', port=3001):
+        self.host = host
+        self.port = port
+
+    def __str__(self):
+        return f"udp {self.host}:{self.port}"
+
+    def connect(self):
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        # A connected UDP socket lets us use send/recv_into without passing
+        # (and resolving) the address on every tick.
+        sock.connect((self.host, self.port))
+        return sock
+
+    def parse(self, state, data, length):
+        return state.parse(data, length)
+
+    def encode(self, car_control):
+        return encode_control_command(car_control)
+
+
+class ShmTransport:
+    """
+    Binary frames through the shared-memory ring of a simulator on this
+    machine (Simulator/server.py --shm PATH). connect() waits for the
+    simulator to create the file.
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+    def __str__(self):
+        return f"shm {self.path}"
+
+    def connect(self):
+        # before waiting: off x86 the simulator will not create the file either
+        require_ordered_stores()
+        logged = False
+        while not os.path.exists(self.path):
+            if not logged:
+                logger.info(f"Waiting for the simulator to create {self.path}...")
+                logged = True
+            time.sleep(OPEN_RETRY)
+        channel = ShmChannel(self.path)
+        return ShmEndpoint(channel, channel.to_client, channel.to_server)
+
+    def parse(self, state, data, length):
+        return state.unpack(data, length)
+
+    def encode(self, car_control):
+        return encode_control_frame(car_control)
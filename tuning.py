@@ -0,0 +1,365 @@
+# tuning.py
+# Parallel search over the controllers' membership functions and thresholds.
+#
+#   python tuning.py --generations 40 [--population 24] [--processes 8]
+#                    [--tracks oval,technical,hairpin] [--max-ticks 3000]
+#                    [--checkpoint tuning.json] [--resume] [--out best.json]
+#
+# The parameter vector is every trimf breakpoint of the turn_classifier,
+# accel_brake_ctrl and gear_ctrl rule bases (read from Fuzzy/rules.json, so it
+# follows the file)
+# plus the scalar thresholds UP_THRESH, DOWN_THRESH, MIN_TICKS (Actions/gear)
+# and UPDATE_EVERY (Actions/steering). Breakpoints on the edge of their
+# universe are kept fixed so shoulders stay shoulders.
+#
+# Each candidate is scored by headless races on the simulator's tracks (a
+# CarModel driven in-process, no sockets) in a forked process pool, and the
+# search is a separable CMA-ES. The optimizer state is checkpointed after
+# every generation; --resume continues from the checkpoint.
+#
+# Use the result with:
+#   best = json.load(open('best.json'))
+#   tuning.apply_scalars(best['scalars'])
+#   driver = TorcsDriver(mfs=best['mfs'])
+
+import argparse
+import json
+import logging
+import math
+import multiprocessing
+import os
+import time
+
+import numpy as np
+
+from log import logger
+from torcs_driver import TorcsDriver
+from Actions import gear as gear_mod
+from Actions import steering as steering_mod
+from Fuzzy import rulebase as rulebase_mod
+from Fuzzy import compiled as compiled_mod
+from Simulator.car import CarModel, DT
+from Simulator.track import get_track, TRACKS
+
+# Models whose trimf breakpoints are tuned (driver attribute names)
+TUNED_MODELS = ('turn_classifier', 'accel_brake_ctrl', 'gear_ctrl')
+# Scalar parameters: name -> (module, attribute, low, high, integer)
+SCALARS = {
+    'gear.UP_THRESH': (gear_mod, 'UP_THRESH', 0.1, 0.9, False),
+    'gear.DOWN_THRESH': (gear_mod, 'DOWN_THRESH', -0.9, -0.1, False),
+    'gear.MIN_TICKS': (gear_mod, 'MIN_TICKS', 5, 60, True),
+    'steering.UPDATE_EVERY': (steering_mod, 'UPDATE_EVERY', 1, 6, True),
+}
+TUNING_TRACKS = ('oval', 'technical', 'hairpin')
+# Ticks per race (60 s of simulated time)
+MAX_TICKS = 3000
+# Meters of progress lost for every off-track recovery
+RECOVERY_PENALTY = 200.0
+# Initial step size, as a fraction of each parameter's range
+SIGMA0 = 0.1
+CHECKPOINT = 'tuning.json'
+
+
+class Param:
+    def __init__(self, name, low, high, default, integer=False):
+        self.name = name
+        self.low = float(low)
+        self.high = float(high)
+        self.default = default
+        self.integer = integer
+
+    def value(self, x):
+        v = self.low + min(max(x, 0.0), 1.0) * (self.high - self.low)
+        return int(round(v)) if self.integer else round(float(v), 6)
+
+    def normalize(self, v):
+        return (v - self.low) / (self.high - self.low)
+
+
+def breakpoints(model):
+    """[(key, default points, universe low, high)] of the trimf terms of a model in the rule file."""
+    return rulebase_mod.breakpoints(rulebase_mod.load(), model)
+
+
+class ParameterSpace:
+    """
+    Maps a vector in [0, 1]^n to (mfs, scalars): TorcsDriver(mfs=...) overrides
+    and module constants. The distinct inner values of each trimf are
+    separate parameters; a decoded triangle is sorted so a <= b <= c.
+    """
+
+    def __init__(self, models=TUNED_MODELS, scalars=SCALARS):
+        self.params = []
+        self.triangles = []  # (model, key, template of indices/fixed values)
+        for model in models:
+            for key, points, low, high in breakpoints(model):
+                template = []
+                for p in points:
+                    if p in (low, high):
+                        template.append(('fixed', p))
+                        continue
+                    name = f"{model}:{key}={p:g}"
+                    if not self.params or self.params[-1].name != name:
+                        self.params.append(Param(name, low, high, p))
+                    template.append(('param', len(self.params) - 1))
+                self.triangles.append((model, key, template))
+        self.scalars = scalars
+        for name, (module, attr, low, high, integer) in scalars.items():
+            self.params.append(Param(name, low, high, getattr(module, attr), integer))
+
+    @property
+    def names(self):
+        return [p.name for p in self.params]
+
+    def defaults(self):
+        return np.array([p.normalize(p.default) for p in self.params])
+
+    def decode(self, x):
+        values = [p.value(v) for p, v in zip(self.params, x)]
+        mfs = {}
+        for model, key, template in self.triangles:
+            points = sorted(values[ref] if kind == 'param' else ref for kind, ref in template)
+            mfs.setdefault(model, {})[key] = points
+        scalars = {p.name: v for p, v in zip(self.params, values) if p.name in self.scalars}
+        return mfs, scalars
+
+
+def apply_scalars(scalars):
+    """Sets the tuned module constants (UP_THRESH, MIN_TICKS, ...) in this process."""
+    for name, value in scalars.items():
+        module, attr = SCALARS[name][:2]
+        setattr(module, attr, value)
+
+
+def build_models(mfs, resolution=compiled_mod.DEFAULT_RESOLUTION):
+    """
+    Models for a candidate, without touching the on-disk cache. The tables are
+    validated like the driver's: one too far from skfuzzy (the gear model's)
+    runs on the closed-form engine instead, so the gear thresholds are tuned
+    against the real gear_adj.
+    """
+    return rulebase_mod.build_models(rulebase_mod.load(), True, resolution, mfs, cache=False)
+
+
+def race(models, track, max_ticks=MAX_TICKS):
+    """Headless race: (meters driven, off-track recoveries) after max_ticks ticks."""
+    driver = TorcsDriver(models=models)
+    car = CarModel(get_track(track))
+    for _ in range(max_ticks):
+        car.step(driver.drive(car.sensors()))
+    return float(car.s), car.recoveries
+
+
+def score(mfs, scalars, tracks=TUNING_TRACKS, max_ticks=MAX_TICKS, resolution=compiled_mod.DEFAULT_RESOLUTION):
+    """
+    Mean speed in km/h over the tracks, counting RECOVERY_PENALTY meters
+    less per recovery (higher is better), and the per-track results.
+    """
+    apply_scalars(scalars)
+    models = build_models(mfs, resolution)
+    results = {}
+    for track in tracks:
+        distance, recoveries = race(models, track, max_ticks)
+        results[track] = {'distance': distance, 'recoveries': recoveries}
+    progress = sum(r['distance'] - RECOVERY_PENALTY * r['recoveries'] for r in results.values())
+    return progress / (len(tracks) * max_ticks * DT) * 3.6, results
+
+
+class SepCMA:
+    """
+    Separable CMA-ES (diagonal covariance) minimizing over [0, 1]^n: ask()
+    samples a population, tell() takes their costs. Samples are clipped to
+    the box. State round-trips through to_dict()/from_dict() for checkpoints.
+    """
+
+    def __init__(self, mean, sigma=SIGMA0, population=None, seed=0):
+        n = len(mean)
+        self.n = n
+        self.mean = np.asarray(mean, dtype=float)
+        self.sigma = float(sigma)
+        self.population = population or 4 + int(3 * math.log(n))
+        self.variance = np.ones(n)
+        self.path = np.zeros(n)
+        self.rng = np.random.default_rng(seed)
+        self.generation = 0
+        self._setup()
+
+    def _setup(self):
+        n, lam = self.n, self.population
+        mu = lam // 2
+        weights = math.log(mu + 0.5) - np.log(np.arange(1, mu + 1))
+        self.weights = weights / weights.sum()
+        self.mu_eff = 1.0 / np.sum(self.weights ** 2)
+        self.c_sigma = (self.mu_eff + 2.0) / (n + self.mu_eff + 5.0)
+        self.d_sigma = 1.0 + 2.0 * max(0.0, math.sqrt((self.mu_eff - 1.0) / (n + 1.0)) - 1.0) + self.c_sigma
+        # rank-mu learning rate, scaled up for the diagonal model (sep-CMA)
+        self.c_mu = min(1.0, (n + 2.0) / 3.0 * 2.0 * (self.mu_eff - 2.0 + 1.0 / self.mu_eff)
+                        / ((n + 2.0) ** 2 + self.mu_eff))
+        self.chi_n = math.sqrt(n) * (1.0 - 1.0 / (4.0 * n) + 1.0 / (21.0 * n * n))
+
+    def ask(self):
+        z = self.rng.standard_normal((self.population, self.n))
+        return np.clip(self.mean + self.sigma * np.sqrt(self.variance) * z, 0.0, 1.0)
+
+    def tell(self, samples, costs):
+        order = np.argsort(costs)
+        selected = np.asarray(samples)[order[:len(self.weights)]]
+        steps = (selected - self.mean) / self.sigma
+        step = self.weights @ steps
+        self.mean = self.mean + self.sigma * step
+        self.path = ((1.0 - self.c_sigma) * self.path
+                     + math.sqrt(self.c_sigma * (2.0 - self.c_sigma) * self.mu_eff) * step / np.sqrt(self.variance))
+        self.variance = (1.0 - self.c_mu) * self.variance + self.c_mu * (self.weights @ steps ** 2)
+        self.sigma *= math.exp(self.c_sigma / self.d_sigma * (np.linalg.norm(self.path) / self.chi_n - 1.0))
+        self.sigma = min(self.sigma, 0.5)
+        self.generation += 1
+
+    def to_dict(self):
+        return {
+            'mean': self.mean.tolist(), 'sigma': self.sigma, 'population': self.population,
+            'variance': self.variance.tolist(), 'path': self.path.tolist(),
+            'generation': self.generation, 'rng': self.rng.bit_generator.state,
+        }
+
+    @classmethod
+    def from_dict(cls, state):
+        opt = cls(state['mean'], state['sigma'], state['population'])
+        opt.variance = np.asarray(state['variance'])
+        opt.path = np.asarray(state['path'])
+        opt.generation = state['generation']
+        opt.rng.bit_generator.state = state['rng']
+        return opt
+
+
+# Set in the parent before the pool forks (see Tuner.run)
+_space = None
+_race_options = {}
+
+
+def _init_worker():
+    # fuzzy warnings for inputs no rule covers would flood the output
+    logger.setLevel(logging.ERROR)
+
+
+def _evaluate(task):
+    index, x = task
+    mfs, scalars = _space.decode(x)
+    try:
+        value, results = score(mfs, scalars, **_race_options)
+    except Exception as e:  # e.g. a triangle the skfuzzy rules can not use
+        return index, float('-inf'), {'error': str(e)}
+    return index, value, results
+
+
+class Tuner:
+    def __init__(self, space, population=None, processes=None, tracks=TUNING_TRACKS, max_ticks=MAX_TICKS,
+                 resolution=compiled_mod.DEFAULT_RESOLUTION, sigma=SIGMA0, seed=0, checkpoint=CHECKPOINT):
+        self.space = space
+        self.processes = processes or os.cpu_count()
+        self.race_options = {'tracks': tuple(tracks), 'max_ticks': max_ticks, 'resolution': resolution}
+        self.checkpoint = checkpoint
+        self.optimizer = SepCMA(space.defaults(), sigma, population, seed)
+        self.best = None
+        self.history = []
+
+    def save(self):
+        state = {
+            'params': self.space.names,
+            'race_options': dict(self.race_options, tracks=list(self.race_options['tracks'])),
+            'optimizer': self.optimizer.to_dict(),
+            'best': self.best,
+            'history': self.history,
+        }
+        # written next to the checkpoint and renamed: an interrupted save keeps the previous one
+        temp = f"{self.checkpoint}.tmp"
+        with open(temp, 'w') as f:
+            json.dump(state, f, indent=1)
+        os.replace(temp, self.checkpoint)
+
+    def resume(self):
+        with open(self.checkpoint) as f:
+            state = json.load(f)
+        if state['params'] != self.space.names:
+            raise ValueError(f"{self.checkpoint} was written for a different parameter set")
+        self.race_options = dict(state['race_options'], tracks=tuple(state['race_options']['tracks']))
+        self.optimizer = SepCMA.from_dict(state['optimizer'])
+        self.best = state['best']
+        self.history = state['history']
+        logger.info(f"Resuming {self.checkpoint} at generation {self.optimizer.generation}")
+
+    def _record(self, x, value, results):
+        if self.best is None or value > self.best['score']:
+            mfs, scalars = self.space.decode(x)
+            self.best = {'score': value, 'vector': list(map(float, x)), 'mfs': mfs, 'scalars': scalars,
+                         'results': results}
+
+    def run(self, generations):
+        global _space, _race_options
+        _space = self.space
+        _race_options = self.race_options
+        context = multiprocessing.get_context('fork')
+        with context.Pool(self.processes, initializer=_init_worker) as pool:
+            if self.best is None:
+                # the hand-tuned defaults, as the reference score
+                _, value, results = pool.apply(_evaluate, ((0, self.space.defaults()),))
+                self._record(self.space.defaults(), value, results)
+                logger.info(f"Defaults: {value:.2f} km/h {results}")
+
+            opt = self.optimizer
+            while opt.generation < generations:
+                start = time.perf_counter()
+                samples = opt.ask()
+                values = np.empty(len(samples))
+                for index, value, results in pool.imap_unordered(_evaluate, enumerate(samples)):
+                    values[index] = value
+                    self._record(samples[index], value, results)
+                finite = values[np.isfinite(values)]
+                opt.tell(samples, np.where(np.isfinite(values), -values, np.inf))
+                self.history.append({
+                    'generation': opt.generation,
+                    'best': float(values.max()),
+                    'median': float(np.median(finite)) if len(finite) else None,
+                    'failed': int(len(values) - len(finite)),
+                    'sigma': opt.sigma,
+                    'elapsed': time.perf_counter() - start,
+                })
+                self.save()
+                entry = self.history[-1]
+                logger.info(
+                    f"Generation {opt.generation}/{generations}: best {entry['best']:.2f} km/h, "
+                    f"median {entry['median'] or float('nan'):.2f}, overall best {self.best['score']:.2f}, "
+                    f"sigma {opt.sigma:.3f}, {len(samples)} candidates in {entry['elapsed']:.1f}s"
+                )
+        return self.best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tune membership functions and thresholds with headless races.")
+    parser.add_argument('--generations', type=int, default=40)
+    parser.add_argument('--population', type=int, default=None, help="candidates per generation")
+    parser.add_argument('--processes', type=int, default=None, help="worker processes (default: every core)")
+    parser.add_argument('--tracks', default=','.join(TUNING_TRACKS), help=f"from {sorted(TRACKS)}")
+    parser.add_argument('--max-ticks', type=int, default=MAX_TICKS, help="ticks per race")
+    parser.add_argument('--resolution', type=int, default=compiled_mod.DEFAULT_RESOLUTION)
+    parser.add_argument('--sigma', type=float, default=SIGMA0)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--checkpoint', default=CHECKPOINT)
+    parser.add_argument('--resume', action='store_true', help="continue from --checkpoint")
+    parser.add_argument('--out', default='best.json', help="best parameters found")
+    args = parser.parse_args()
+
+    space = ParameterSpace()
+    tuner = Tuner(space, args.population, args.processes, args.tracks.split(','), args.max_ticks,
+                  args.resolution, args.sigma, args.seed, args.checkpoint)
+    if args.resume:
+        tuner.resume()
+    logger.info(f"Tuning {len(space.params)} parameters, {tuner.optimizer.population} candidates "
+                f"per generation on {tuner.processes} processes")
+    best = tuner.run(args.generations)
+    with open(args.out, 'w') as f:
+        json.dump({key: best[key] for key in ('score', 'mfs', 'scalars', 'results')}, f, indent=2)
+    logger.info(f"Best: {best['score']:.2f} km/h, written to {args.out}")
+
+
+if __name__ == '__main__':
+    main()